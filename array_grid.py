@@ -0,0 +1,628 @@
+"""
+Module contains the Array_Grid class, a NumPy backed alternative to
+ bubble.Bubble_Grid. Colors are stored as a 2-D int8 array of palette indices
+ (-1 for an empty spot) and fixed row indices as a 1-D int array, so match
+ detection, flood erasing and connectivity run as whole array operations.
+Requires the numpy package.
+"""
+
+import random
+
+import numpy as np
+
+from bubble import Bubble_Row, Grid_Bubble, Dropper, Dropper_List, \
+                   random_row_colors, nearest_column, column_band, \
+                   pack_colors, unpack_colors, GRID_SPACING, FIRST_COLUMN_X, \
+                   GRID_HEADER
+from dist import distance, first_contact
+from sprites import draw_bubbles
+from config import INITIAL_BUBBLE_VELOCITY, HEIGHT, BUBBLE_DIAMETER, \
+                   MATCH_LENGTH, BUBBLE_PADDING, BOARD_WIDTH, GRID_ROWS
+
+EMPTY = -1 # Palette index of a spot with no bubble
+# Scan the whole grid for matches once 1 in 1000 spots are dirty, a whole
+# array pass costs about as much as finding the runs through a few spots
+DENSE_DIRTY = 1000
+# x position of every grid column in pix
+COLUMN_X = FIRST_COLUMN_X + GRID_SPACING*np.arange(BOARD_WIDTH)
+
+def run_ends(cells, length, seed=None):
+    """
+    Given a 2-D array of palette indices, find runs of at least length equal
+     colors along each row. If a 2-D boolean array seed is given, only runs
+     containing a seed cell count. Returns row and column index arrays of the
+     cell where each run first reaches length, in row major order.
+    """
+    width = cells.shape[1] - length + 1
+    if width <= 0:
+        return np.nonzero(np.zeros((0, 0), bool))
+
+    # same[:, k] is True when cell k+1 continues the color of cell k
+    same = (cells[:, 1:] == cells[:, :-1]) & (cells[:, 1:] != EMPTY)
+    window = cells[:, :width] != EMPTY # A run of length starts at each True
+    for k in range(length-1):
+        window &= same[:, k:k+width]
+    window[:, 1:] &= ~same[:, :width-1] # Only count each run once
+
+    i, j = np.nonzero(window)
+    if seed is not None:
+        starts = np.ones(cells.shape, bool)
+        starts[:, 1:] = ~same
+        labels = np.cumsum(starts.ravel()).reshape(cells.shape) # Run ids
+        seeded = np.zeros(np.count_nonzero(starts) + 1, bool)
+        seeded[labels[seed]] = True
+        keep = seeded[labels[i, j]]
+        i, j = i[keep], j[keep]
+    return i, j + length - 1
+
+def fill_segments(mask, seed):
+    """
+    Given 2-D boolean arrays mask and seed, return every cell of mask lying in
+     a horizontal segment of consecutive mask cells which contains a seed.
+    """
+    starts = mask.copy()
+    starts[:, 1:] &= ~mask[:, :-1]
+    labels = np.cumsum(starts.ravel()).reshape(mask.shape) # Segment ids
+    labels[~mask] = 0 # Label 0 is never seeded
+    seeded = np.zeros(np.count_nonzero(starts) + 1, bool)
+    seeded[labels[seed & mask]] = True
+    seeded[0] = False
+    return seeded[labels]
+
+def flood(mask, seed):
+    """
+    Given 2-D boolean arrays mask and seed, return the cells of mask
+     reachable from a seed through the 4 cardinal neighbors. Alternates row and
+     column segment fills until the reached area stops growing.
+    """
+    reach = fill_segments(mask, seed)
+    while True:
+        grown = fill_segments(mask.T, reach.T).T
+        grown = fill_segments(mask, grown)
+        if (grown == reach).all():
+            return reach
+        reach = grown
+
+def last_bullet(combo, flags, i, j):
+    """
+    Given 2-D boolean arrays of a combo's cells and of the bullet flags and
+     the i, j match it was erased from, walk the combo depth first from the
+     match in the order Bubble_Grid.erase_matches() does. Returns the i, j of
+     the last bullet walked, where the combo's alert goes, or None.
+    """
+    left = combo.copy() # Cells not walked yet
+    rows, columns = combo.shape
+    found = None
+    path = [(i, j)] # Stack to walk the combo
+    while path:
+        r, c = path.pop()
+        if not left[r, c]:
+            continue
+        left[r, c] = False
+        if flags[r, c]:
+            found = (r, c)
+        for n in ((r+1, c), (r-1, c), (r, c+1), (r, c-1)):
+            if 0 <= n[0] < rows and 0 <= n[1] < columns and left[n]:
+                path.append(n)
+    return found
+
+class Array_Grid(object):
+    """
+    Represents the grid of bubbles falling slowly from the top of the screen
+     with the same interface as bubble.Bubble_Grid. Row 0 is the bottom row.
+    colors: list of RGB colors to make new grid bubbles
+    velocity: speed of bubble generation from screen top
+    rng: random number generator for new row colors, random module by default
+    cells: int8 array of palette indices, rows x BOARD_WIDTH
+    flags: bool array marking bubbles which came from a Bullet
+    index: int array of the fixed index of each row, counting upward
+    scroll: y position in pix of the row with index 0
+    prev_scroll: scroll before the last move, for interpolated drawing
+    num_rows: number of rows of the arrays in use
+    speed_rows: number of rows to speed out at level begining
+    check_loose: bool, bubbles were removed since the last drop_loose_bubbles
+    dirty: bool array marking spots colored since the last erase_matches
+    lowest: list of the fixed index of the lowest row holding a bubble in each
+            column, None for an empty column
+    """
+
+    def __init__(self, colors, velocity=None, rng=random):
+        if velocity:
+            self.velocity = velocity
+        else:
+            self.velocity = INITIAL_BUBBLE_VELOCITY
+
+        self.colors = colors
+        self.rng = rng
+        self.cells = np.full((GRID_ROWS, BOARD_WIDTH), EMPTY, np.int8)
+        self.flags = np.zeros(self.cells.shape, bool)
+        self.dirty = np.zeros(self.cells.shape, bool)
+        self.index = np.zeros(len(self.cells), np.int64)
+        self.scroll = 0
+        self.prev_scroll = 0
+        self.num_rows = 0
+        self.speed_rows = MATCH_LENGTH
+        self.check_loose = False
+        self.lowest = [None] * BOARD_WIDTH
+
+    def __str__(self):
+        """
+        Returns a formatted string for printing
+        """
+        if self.num_rows:
+            s = 'Array Grid:\n     y pos   palette indices'
+            for i in range(self.num_rows):
+                s += f'\n{self.row_y(i):10.2f}   '
+                s += ' '.join(f'{c:2}' for c in self.cells[i])
+        else:
+            s = 'Empty Array Grid:'
+        return s
+
+    def __len__(self):
+        return self.num_rows
+
+    def __getitem__(self, key):
+        """
+        Returns a copy of row key as a Bubble_Row of Grid_Bubble objects
+        """
+        i = range(self.num_rows)[key]
+        row = Bubble_Row(self, int(self.index[i]))
+        for j, c in enumerate(self.cells[i].tolist()):
+            row += Grid_Bubble(j, row, self.colors[c] if c != EMPTY else None,
+                               bool(self.flags[i, j]))
+        return row
+
+    def __iter__(self):
+        return (self[i] for i in range(self.num_rows))
+
+    def row_y(self, i):
+        """
+        Returns the y position in pix of row i
+        """
+        return self.scroll - int(self.index[i]) * GRID_SPACING
+
+    def nearest_row(self, y):
+        """
+        Returns the row nearest to y, which may be outside range(num_rows)
+        """
+        return round((self.scroll - y) / GRID_SPACING) - int(self.index[0])
+
+    def row_band(self, y, reach):
+        """
+        Returns the range of rows whose y can be within reach pix of y
+        """
+        if not self.num_rows:
+            return range(0)
+        return range(max(self.nearest_row(y + reach), 0),
+                     min(self.nearest_row(y - reach) + 1, self.num_rows))
+
+    def snapshot(self):
+        """
+        Returns the grid as bytes in the format of Bubble_Grid.snapshot()
+        """
+        n = self.num_rows
+        header = GRID_HEADER.pack(self.scroll, self.prev_scroll, self.velocity,
+                                  self.speed_rows, n,
+                                  int(self.index[0]) if n else 0,
+                                  len(self.colors), self.check_loose)
+        return (header + pack_colors(self.colors)
+                + (self.cells[:n] + 1).astype(np.uint8).tobytes()
+                + self.flags[:n].tobytes() + self.dirty[:n].tobytes())
+
+    def restore(self, data):
+        """
+        Given bytes from snapshot() of this or any other grid class, replace
+         the grid's state with the one saved
+        """
+        (self.scroll, self.prev_scroll, self.velocity, self.speed_rows, n,
+         bottom, num_colors, self.check_loose) = GRID_HEADER.unpack_from(data)
+        k = GRID_HEADER.size + 3*num_colors
+        self.colors = unpack_colors(data[GRID_HEADER.size:k])
+        while len(self.cells) < n:
+            self.grow()
+        spots = np.frombuffer(data, np.uint8, 3 * n * BOARD_WIDTH, k)
+        cells, flags, dirty = spots.reshape(3, n, BOARD_WIDTH)
+        self.cells[:n] = cells
+        self.cells[:n] -= 1 # Back to palette indices, 0 becomes EMPTY
+        self.cells[n:] = EMPTY
+        self.flags[:n] = flags
+        self.flags[n:] = False
+        self.dirty[:n] = dirty
+        self.dirty[n:] = False
+        self.index[:n] = np.arange(bottom, bottom + n)
+        self.num_rows = n
+        self.find_lowest()
+
+    def find_lowest(self):
+        """
+        Looks up the lowest row holding a bubble in every column for
+         self.lowest
+        """
+        if not self.num_rows:
+            self.lowest = [None] * BOARD_WIDTH
+            return
+        occupied = self.cells[:self.num_rows] != EMPTY
+        index = self.index[occupied.argmax(axis=0)].tolist()
+        self.lowest = [i if any_ else None for i, any_
+                       in zip(index, occupied.any(axis=0).tolist())]
+
+    def row_ys(self):
+        """
+        Returns a float array of the y position in pix of every row
+        """
+        return self.scroll - self.index[:self.num_rows] * GRID_SPACING
+
+    def mark_all_dirty(self):
+        """
+        Flags every grid position for match detection by the next
+         erase_matches()
+        """
+        self.dirty[:self.num_rows] = True
+
+    def lerp_scroll(self, alpha):
+        """
+        Returns the scroll offset alpha of the way along the last move
+        """
+        return self.prev_scroll + alpha * (self.scroll - self.prev_scroll)
+
+    def row_colors(self):
+        """
+        Returns a dict of each row's fixed index to a tuple of its colors, None
+         for an empty spot
+        """
+        palette = self.colors + [None] # Index -1 is EMPTY
+        n = self.num_rows
+        return {i: tuple(palette[c] for c in row) for i, row
+                in zip(self.index[:n].tolist(), self.cells[:n].tolist())}
+
+    def draw(self, screen, alpha=1):
+        """
+        Given a PGZero screen object, draw every grid bubble alpha of the way
+         along the grid's last move in one batch of cached sprites
+        """
+        cells = self.cells[:self.num_rows]
+        ys = (self.row_ys() + (self.lerp_scroll(alpha) - self.scroll)).tolist()
+        xs = COLUMN_X.tolist()
+        i, j = np.nonzero(cells != EMPTY)
+        draw_bubbles(screen, [(xs[jj], ys[ii], self.colors[c]) for ii, jj, c
+                              in zip(i.tolist(), j.tolist(), cells[i, j].tolist())])
+
+    def grow(self):
+        """
+        Doubles the number of rows the arrays can hold
+        """
+        extra = len(self.cells)
+        self.cells = np.vstack((self.cells,
+                                np.full((extra, BOARD_WIDTH), EMPTY, np.int8)))
+        self.flags = np.vstack((self.flags, np.zeros((extra, BOARD_WIDTH),
+                                                     bool)))
+        self.dirty = np.vstack((self.dirty, np.zeros((extra, BOARD_WIDTH),
+                                                     bool)))
+        self.index = np.concatenate((self.index, np.zeros(extra, np.int64)))
+
+    def addBottomRow(self):
+        """
+        Adds a new empty bottom row at bottom of screen in position 0
+        """
+        n = self.num_rows
+        if n == len(self.cells):
+            self.grow()
+
+        self.cells[1:n+1] = self.cells[:n] # Shift rows up one position
+        self.flags[1:n+1] = self.flags[:n]
+        self.dirty[1:n+1] = self.dirty[:n]
+        self.index[1:n+1] = self.index[:n]
+        self.cells[0] = EMPTY
+        self.flags[0] = False
+        self.dirty[0] = False
+        self.index[0] = self.index[1] - 1
+        self.num_rows += 1
+
+    def addTopRow(self):
+        """
+        Adds a new top row with no horizontal matches.
+        Decrements self.speed_rows if > 0.
+        """
+        n = self.num_rows
+        # Check if there's space at top of screen for new row.
+        if n and self.row_y(n-1) < BUBBLE_DIAMETER//2 + BUBBLE_PADDING:
+            return
+
+        if n == len(self.cells):
+            self.grow()
+
+        # Place the new row one index above the one below it.
+        if not n:
+            self.index[n] = 0
+            self.scroll = -BUBBLE_DIAMETER // 2 # Barely off the screen
+            self.prev_scroll = self.scroll
+        else:
+            self.index[n] = self.index[n-1] + 1
+
+        self.cells[n] = [self.colors.index(c)
+                         for c in random_row_colors(self.colors, self.rng)]
+        self.flags[n] = False
+        self.dirty[n] = True # New colors may complete vertical matches
+        self.num_rows += 1
+        index = int(self.index[n])
+        self.lowest = [index if low is None else low for low in self.lowest]
+
+        if self.speed_rows:
+            self.speed_rows -= 1
+
+    def bullet_collide(self, bullet):
+        """
+        Function takes a Bullet object and returns true if the bullet colides
+         with any Bubble in the grid, adding the bullet to the grid at the
+         nearest spot to the closest bubble it struck. Only the 3x3 spots of
+         the lattice around the bullet are checked.
+        """
+        n = self.num_rows
+        if not n:
+            return False
+
+        x, y = bullet.x, bullet.y
+        i0 = self.nearest_row(y)
+        j0 = nearest_column(x)
+        close_bubble = None #(i,j,dist)
+        for i in range(max(i0-1, 0), min(i0+2, n)):
+            row_y = self.row_y(i)
+            for j in range(max(j0-1, 0), min(j0+2, BOARD_WIDTH)):
+                if self.cells[i, j] != EMPTY:
+                    d = distance(x, y, int(COLUMN_X[j]), row_y)
+                    # find the closest bubble if multiple in range
+                    if d < BUBBLE_DIAMETER and (not close_bubble
+                                                or d < close_bubble[2]):
+                        close_bubble = (i,j,d)
+
+        if close_bubble: # collided with this grid bubble
+            n = self.findNearestSpot(x, y, close_bubble[0], close_bubble[1])
+            self.addGridBubble(*n, bullet.color)
+            return True
+
+        return False
+
+    def bullet_sweep(self, bullet):
+        """
+        Swept version of bullet_collide() for a Bullet that moved from
+         (prev_x, prev_y) to (x, y) since the last update. Adds the bullet to
+         the grid at the point it first touched a grid bubble on that path.
+        Returns true for collision and False otherwise.
+        """
+        n = self.num_rows
+        if not n:
+            return False
+
+        x0, y0, x1, y1 = bullet.prev_x, bullet.prev_y, bullet.x, bullet.y
+        ia, ib = sorted((self.nearest_row(y0), self.nearest_row(y1)))
+        ja, jb = sorted((nearest_column(x0), nearest_column(x1)))
+        contact = None #(t,i,j)
+        for i in range(max(ia-1, 0), min(ib+2, n)):
+            row_y = self.row_y(i)
+            for j in range(max(ja-1, 0), min(jb+2, BOARD_WIDTH)):
+                if self.cells[i, j] != EMPTY:
+                    t = first_contact(x0, y0, x1, y1, int(COLUMN_X[j]), row_y,
+                                      BUBBLE_DIAMETER)
+                    if t is not None and (not contact or t < contact[0]):
+                        contact = (t,i,j)
+
+        if not contact:
+            return False
+
+        t, i, j = contact
+        bullet.x, bullet.y = x0 + t*(x1-x0), y0 + t*(y1-y0)
+        if not t: # Overlapping from the start, use the nearest bubble
+            return self.bullet_collide(bullet)
+        self.addGridBubble(*self.findNearestSpot(bullet.x, bullet.y, i, j),
+                           bullet.color)
+        return True
+
+    def findNearestSpot(self, x, y, i, j):
+        """
+        Given x, y position and grid location i, j, return the available spot
+         nearest the position and a bool to indicate if this position requires
+         a new row be added to the grid: (i, j, newRowFlag)
+        """
+        n_list = [] #[(dist, (i,j), newRowFlag)...up, down, left, right]
+        cells, y_of = self.cells, self.row_y
+
+        if i+1 < self.num_rows and cells[i+1, j] == EMPTY: #up
+            n_list.append((distance(x, y, COLUMN_X[j], y_of(i+1)), (i+1,j),
+                           False))
+
+        if j+1 < BOARD_WIDTH and cells[i, j+1] == EMPTY: #right
+            n_list.append((distance(x, y, COLUMN_X[j+1], y_of(i)), (i,j+1),
+                           False))
+
+        if j-1 >= 0 and cells[i, j-1] == EMPTY: #left
+            n_list.append((distance(x, y, COLUMN_X[j-1], y_of(i)), (i,j-1),
+                           False))
+
+        if i == 0: #new bottom row
+            n_list.append((distance(x, y, COLUMN_X[j], y_of(0) + GRID_SPACING), (0, j),
+                           True))
+
+        elif cells[i-1, j] == EMPTY: # down
+            n_list.append((distance(x, y, COLUMN_X[j], y_of(i-1)), (i-1,j),
+                           False))
+
+        nearest = min(n_list) # min distance is closest
+
+        return nearest[1][0], nearest[1][1], nearest[2] # i, j, newRowFlag
+
+    def addGridBubble(self, i, j, new_row_flag, c):
+        """
+        Given an i, j location and a color, add a Bubble to the grid creating a
+         new row if required by flag. Set the bullet flag on this bubble for
+         scoring purposes.
+        """
+        if new_row_flag: # Add new row if neccessary
+            self.addBottomRow()
+
+        self.cells[i, j] = self.colors.index(c)
+        # Player added this bubble so can score points
+        self.flags[i, j] = True
+        self.dirty[i, j] = True
+        index = int(self.index[i])
+        if self.lowest[j] is None or index < self.lowest[j]:
+            self.lowest[j] = index
+
+    def drop_loose_bubbles(self):
+        """
+        Flood the grid from every bubble in the top row. Any grid bubbles not
+         reached are removed from the grid and returned in a Dropper_List.
+        Skipped unless bubbles were removed since the last call.
+        """
+        n = self.num_rows
+        newDroppers = Dropper_List()
+        if not (n and self.check_loose):
+            return newDroppers
+        self.check_loose = False
+
+        occupied = self.cells[:n] != EMPTY
+        top = np.zeros(occupied.shape, bool)
+        top[n-1] = True
+        loose = occupied & ~flood(occupied, top)
+
+        for i, j in zip(*(a.tolist() for a in np.nonzero(loose))):
+            newDroppers += Dropper(int(COLUMN_X[j]), self.row_y(i),
+                                   self.colors[self.cells[i, j]],
+                                   self.velocity, j)
+        self.cells[:n][loose] = EMPTY
+        if len(newDroppers):
+            self.find_lowest()
+
+        return newDroppers
+
+    def get_matches(self):
+        """
+        Check for consecutive colors horizontally and vertically of the length
+         perscribed in the MATCH_LENGTH constant. Return a list of tuples
+         containing grid positions of matches: [(i,j), ...]
+        """
+        cells = self.cells[:self.num_rows]
+        matches = list(zip(*(a.tolist()
+                             for a in run_ends(cells, MATCH_LENGTH))))
+        j, i = run_ends(cells.T, MATCH_LENGTH) # Vertical runs by column
+        matches.extend(zip(i.tolist(), j.tolist()))
+        return matches
+
+    def get_dirty_matches(self):
+        """
+        Like get_matches() but only checks the runs of color through each
+         position in self.dirty, in the rows and columns holding one. Any new
+         match must contain a newly colored bubble, so these are the only
+         places a match can appear, and the matches and their order are the
+         same as get_matches(). When many spots are dirty get_matches() is
+         faster, and is used instead.
+        """
+        n = self.num_rows
+        dirty = self.dirty[:n]
+        if np.count_nonzero(dirty) * DENSE_DIRTY >= n * BOARD_WIDTH:
+            return self.get_matches()
+
+        cells = self.cells[:n]
+        rows = np.flatnonzero(dirty.any(axis=1))
+        i, j = run_ends(cells[rows], MATCH_LENGTH, dirty[rows])
+        matches = list(zip(rows[i].tolist(), j.tolist()))
+        columns = np.flatnonzero(dirty.any(axis=0)) # Vertical runs by column
+        j, i = run_ends(cells[:, columns].T, MATCH_LENGTH, dirty[:, columns].T)
+        matches.extend(zip(i.tolist(), columns[j].tolist()))
+        return matches
+
+    def prune_bottom_row(self):
+        """
+        Removes the bottom row if it's off the bottom of screen
+        """
+        n = self.num_rows
+        if n and self.row_y(0) > HEIGHT + BUBBLE_DIAMETER//2: # fell off screen
+            self.cells[:n-1] = self.cells[1:n]
+            self.flags[:n-1] = self.flags[1:n]
+            self.dirty[:n-1] = self.dirty[1:n]
+            self.index[:n-1] = self.index[1:n]
+            self.num_rows -= 1
+            self.check_loose = True
+            self.find_lowest()
+
+    def collide(self, x, y, radius):
+        """
+        Given an x, y location and radius of a circular object, return True if
+         any Bubble in the grid collides with the object and False otherwise.
+         Only the band of rows and columns within the strike zone is tested.
+        """
+        strike_zone = BUBBLE_DIAMETER//2 + radius
+        rows = self.row_band(y, strike_zone)
+        columns = column_band(x, strike_zone)
+        if not rows or not columns:
+            return False
+        i, j = slice(rows.start, rows.stop), slice(columns.start, columns.stop)
+        d = ((COLUMN_X[j] - x)**2 + (self.row_ys()[i, None] - y)**2)**.5
+        return bool(((d <= strike_zone) & (self.cells[i, j] != EMPTY)).any())
+
+    def move(self, time_delta):
+        """
+        Given the time in ms since last update, scroll the grid down at self
+         .velocity pix/ms. If self.speed_rows > 0, rows fall 16 times faster.
+        """
+        delta_y = self.velocity * time_delta
+        if self.speed_rows:
+            delta_y *= 16
+        self.prev_scroll = self.scroll
+        self.scroll += delta_y
+
+    def erase_matches(self):
+        """
+        Erase the same colored area connected to each match from
+         get_dirty_matches(). Returns a list of ((x,y),pts) tuples, one for each
+         combo containing at least one player bullet.
+        """
+        combos = [] #[((x,y),pts), ...]
+        if not self.dirty.any(): # Nothing colored since the last call
+            return combos
+        matches = self.get_dirty_matches()
+        self.dirty[:] = False
+        cells = self.cells[:self.num_rows]
+        flags = self.flags[:self.num_rows]
+        for i, j in matches:
+            color = cells[i, j]
+            if color == EMPTY: # Already erased by an earlier match
+                continue
+            seed = np.zeros(cells.shape, bool)
+            seed[i, j] = True
+            combo = flood(cells == color, seed)
+            cells[combo] = EMPTY
+            self.check_loose = True
+
+            if (combo & flags).any(): # Only score combos the player created
+                bi, bj = last_bullet(combo, flags, i, j)
+                combo_bubbles = int(np.count_nonzero(combo & ~flags))
+                combos.append(((int(COLUMN_X[bj]), self.row_y(bi)),
+                               2**combo_bubbles))
+
+        if matches: # Each match erased at least its own spot
+            self.find_lowest()
+        return combos
+
+    def falling_bubble_lands(self, fb):
+        """
+        Given a Dropper, check falling column for landing back on the grid.
+        Return True if Dropper lands and False otherwise.
+        Droppers land on the lowest bubble in their column within a row
+         spacing, taking the spot above it. Nothing can be above the top row,
+         so droppers keep falling past it.
+        """
+        y, j = fb.y, fb.column
+        d = BUBBLE_DIAMETER + BUBBLE_PADDING
+        low = self.lowest[j]
+        # Out of reach below the column's lowest bubble, as most droppers are
+        if low is None or y - (self.scroll - low * GRID_SPACING) > d:
+            return False
+
+        i0 = self.nearest_row(y) # d is one row spacing, only 3 rows can reach
+        for i in range(max(i0-1, low - int(self.index[0])),
+                       min(i0+2, self.num_rows-1)):
+            if self.cells[i, j] != EMPTY and abs(self.row_y(i) - y) <= d:
+                self.cells[i+1, j] = self.colors.index(fb.color)
+                self.dirty[i+1, j] = True
+                return True
+        return False
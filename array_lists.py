@@ -0,0 +1,401 @@
+"""
+Module contains the Array_Bullet_List and Array_Dropper_List classes, NumPy
+ backed alternatives to bubble.Bullet_List and bubble.Dropper_List. Bubbles
+ are stored as columns of parallel arrays (positions, velocities, color
+ indices and columns), so moving and bounds checks run as whole array
+ operations and removals compact the arrays with a mask in one pass.
+Grid and ship collisions are first narrowed down with array operations, and
+ only the few bubbles which could touch are handed to the grid or ship as
+ Bullet or Dropper objects, in list order, so the game plays out the same.
+Requires the numpy package.
+"""
+
+from math import sin, cos
+
+import numpy as np
+
+from bubble import Bubble_List, Bullet, Dropper, GRID_SPACING, column_band
+from sprites import draw_bubbles
+from config import WIDTH, HEIGHT, BULLET_VELOCITY, BUBBLE_GRAVITY, \
+                   FALLING_BUBBLE_POINTS, LOST_BULLET_PENALTY, BUBBLE_DIAMETER
+
+CAPACITY = 64 # Bubbles the arrays hold before doubling
+
+def nearest_rows(grid, y):
+    """
+    Given a grid with rows and an array of y positions, return an array of
+     the position in the grid's rows of the row nearest each y, as
+     grid.nearest_row() would
+    """
+    first = grid.nearest_row(grid.scroll) # Minus the bottom row's index
+    return np.round((grid.scroll - y) / GRID_SPACING) + first
+
+class Array_Bubble_List(object):
+    """
+    Represents a generic list of bubbles stored as parallel arrays, for sub
+     classing. Iterating or indexing gives Bubble objects built from the
+     arrays, changing those objects doesn't change the list.
+    FIELDS: dict of column name to NumPy dtype, each an array attribute
+    n: number of bubbles in the list, the arrays are valid up to n
+    palette: list of RGB colors, the color column holds indices into it
+    """
+    FIELDS = {'x': float, 'y': float, 'color': np.int16}
+    # Snapshot record, the fields of the bubble.py list's record then color
+    RECORD = np.dtype([('x', '<f8'), ('y', '<f8'), ('color', 'u1', 3)])
+
+    def __init__(self):
+        self.n = 0
+        self.palette = []
+        for name, dtype in self.FIELDS.items():
+            setattr(self, name, np.zeros(CAPACITY, dtype))
+
+    def __len__(self):
+        return self.n
+
+    def __iter__(self):
+        return (self.item(k) for k in range(self.n))
+
+    def __getitem__(self, key):
+        return self.item(range(self.n)[key])
+
+    def __delitem__(self, key):
+        keep = np.ones(self.n, bool)
+        keep[key] = False
+        self.compact(keep)
+
+    def __iadd__(self, rhs):
+        """
+        '+=' operator can handle single Bubble objects or lists of them
+        """
+        if isinstance(rhs, (Bubble_List, Array_Bubble_List)):
+            for b in rhs:
+                self.append(b)
+        else:
+            self.append(rhs)
+        return self
+
+    def color_index(self, color):
+        """
+        Returns the palette index of an RGB color, adding it if it's new
+        """
+        if color not in self.palette:
+            self.palette.append(color)
+        return self.palette.index(color)
+
+    def add_row(self, **values):
+        """
+        Given a value for each field, add a bubble to the end of the list,
+         doubling the arrays when they're full
+        """
+        if self.n == len(self.x):
+            self.grow()
+        for name, v in values.items():
+            getattr(self, name)[self.n] = v
+        self.n += 1
+
+    def grow(self):
+        """
+        Doubles the number of bubbles the arrays can hold
+        """
+        for name in self.FIELDS:
+            a = getattr(self, name)
+            setattr(self, name, np.concatenate((a, np.zeros_like(a))))
+
+    def snapshot(self):
+        """
+        Returns the bubbles as bytes in the format of the matching bubble.py
+         list's snapshot(), a RECORD each
+        """
+        n = self.n
+        records = np.empty(n, self.RECORD)
+        for name in self.RECORD.names[:-1]:
+            records[name] = getattr(self, name)[:n]
+        palette = np.array(self.palette, np.uint8).reshape(-1, 3)
+        records['color'] = palette[self.color[:n]]
+        return records.tobytes()
+
+    def restore(self, data):
+        """
+        Given bytes from snapshot() of this or the matching bubble.py list,
+         replace the bubbles with those saved
+        """
+        records = np.frombuffer(data, self.RECORD)
+        n = len(records)
+        while len(self.x) < n:
+            self.grow()
+        for name in self.RECORD.names[:-1]:
+            getattr(self, name)[:n] = records[name]
+        rgb = records['color'].astype(np.int32)
+        keys = rgb[:, 0] << 16 | rgb[:, 1] << 8 | rgb[:, 2] # One int per color
+        palette, color = np.unique(keys, return_inverse=True)
+        self.palette = [(k >> 16, k >> 8 & 255, k & 255)
+                        for k in palette.tolist()]
+        self.color[:n] = color.reshape(-1)
+        self.n = n
+
+    def compact(self, keep):
+        """
+        Given a bool array over the list, drop every bubble not kept while
+         keeping the order of the rest
+        """
+        n = self.n
+        count = int(np.count_nonzero(keep))
+        if count == n:
+            return
+        for name in self.FIELDS:
+            a = getattr(self, name)
+            a[:count] = a[:n][keep]
+        self.n = count
+
+    def colors(self):
+        """
+        Returns a list of the RGB color of each bubble
+        """
+        palette = self.palette
+        return [palette[c] for c in self.color[:self.n].tolist()]
+
+    def positions(self, alpha):
+        """
+        Returns x and y arrays of the positions to draw at, alpha of the way
+         along the last move. Generic bubbles don't move.
+        """
+        return self.x[:self.n], self.y[:self.n]
+
+    def draw(self, screen, alpha=1):
+        """
+        Given a PGZero screen object, draw each bubble in the list alpha of
+         the way along its last move, all in one batch of cached sprites
+        """
+        xs, ys = self.positions(alpha)
+        draw_bubbles(screen, zip(xs.tolist(), ys.tolist(), self.colors()))
+
+class Array_Bullet_List(Array_Bubble_List):
+    """
+    Represents the bullets flying across the screen with the interface of
+     bubble.Bullet_List. Each bullet's velocity is worked out once when fired.
+    swept: bool, test the whole path each bullet moved along since the last
+           update for collisions instead of only its current position
+    """
+    FIELDS = {'x': float, 'y': float, 'prev_x': float, 'prev_y': float,
+              'vx': float, 'vy': float, 'angle': float, 'color': np.int16}
+    RECORD = np.dtype([('x', '<f8'), ('y', '<f8'), ('angle', '<f8'),
+                       ('prev_x', '<f8'), ('prev_y', '<f8'),
+                       ('color', 'u1', 3)])
+
+    def __init__(self, swept=False):
+        self.swept = swept
+        super().__init__()
+
+    def __str__(self):
+        """
+        Returns a formatted string for printing
+        """
+        if self.n:
+            s = 'Array_Bullet_List:\n'
+            s += '     x pos     y pos     ang   color'
+            for b in self:
+                s += f'\n{b.x:10.2f}{b.y:10.2f}{b.angle:8.2f}   {b.color}'
+        else:
+            s = 'Empty Array_Bullet_List:'
+        return s
+
+    def append(self, b):
+        """
+        Add a Bullet to the end of the list
+        """
+        self.add_row(x=b.x, y=b.y, prev_x=b.prev_x, prev_y=b.prev_y,
+                     vx=BULLET_VELOCITY * cos(b.angle),
+                     vy=BULLET_VELOCITY * sin(b.angle), angle=b.angle,
+                     color=self.color_index(b.color))
+
+    def restore(self, data):
+        """
+        Given bytes from snapshot(), replace the bullets with those saved.
+         Velocities are worked out as append() does.
+        """
+        super().restore(data)
+        angles = self.angle[:self.n].tolist()
+        self.vx[:self.n] = [BULLET_VELOCITY * cos(a) for a in angles]
+        self.vy[:self.n] = [BULLET_VELOCITY * sin(a) for a in angles]
+
+    def item(self, k):
+        """
+        Returns bullet k as a Bullet object
+        """
+        b = Bullet(float(self.x[k]), float(self.y[k]),
+                   self.palette[self.color[k]], float(self.angle[k]))
+        b.prev_x, b.prev_y = float(self.prev_x[k]), float(self.prev_y[k])
+        return b
+
+    def move(self, time_delta):
+        """
+        Given ms since the last update, move every bullet at set speed on its
+         angle
+        """
+        n = self.n
+        self.prev_x[:n] = self.x[:n]
+        self.prev_y[:n] = self.y[:n]
+        self.x[:n] += self.vx[:n] * time_delta
+        self.y[:n] -= self.vy[:n] * time_delta
+
+    def positions(self, alpha):
+        """
+        Returns x and y arrays of the positions alpha of the way along the
+         last move
+        """
+        n = self.n
+        px, py = self.prev_x[:n], self.prev_y[:n]
+        return px + alpha * (self.x[:n] - px), py + alpha * (self.y[:n] - py)
+
+    def check_bounds(self):
+        """
+        Return a list of tuples representing bullets that flew off the screen
+         and erase such bullets from the list
+        """
+        n = self.n
+        x, y = self.x[:n], self.y[:n]
+        oob = (x > WIDTH) | (x < 0) | (y > HEIGHT) | (y < 0)
+        if not oob.any():
+            return []
+        lost = [((bx, by), -LOST_BULLET_PENALTY)
+                for bx, by in zip(x[oob].tolist(), y[oob].tolist())]
+        self.compact(~oob)
+        return lost
+
+    def delete_strikers(self, grid):
+        """
+        Given a bubble grid, delete any bullets which contact the grid. Only
+         bullets within a row of the grid are tested, in list order. A hit can
+         add a row to the grid, so the rest are narrowed down again after one.
+        """
+        collide = grid.bullet_sweep if self.swept else grid.bullet_collide
+        hit = np.zeros(self.n, bool)
+        k = 0
+        while k < self.n and len(grid):
+            # Only rows next to the nearest one (or along the path) are tested
+            ia = ib = nearest_rows(grid, self.y[k:self.n])
+            if self.swept:
+                i = nearest_rows(grid, self.prev_y[k:self.n])
+                ia, ib = np.minimum(ia, i), np.maximum(ib, i)
+            near = (ia <= len(grid)) & (ib >= -1)
+            for i in (np.nonzero(near)[0] + k).tolist():
+                if collide(self.item(i)):
+                    hit[i] = True
+                    k = i + 1
+                    break
+            else:
+                break
+
+        if hit.any():
+            self.compact(~hit)
+
+class Array_Dropper_List(Array_Bubble_List):
+    """
+    Represents the bubbles falling off the screen with the interface of
+     bubble.Dropper_List
+    """
+    FIELDS = {'x': float, 'y': float, 'prev_y': float, 'vely': float,
+              'column': np.int16, 'color': np.int16}
+    RECORD = np.dtype([('x', '<f8'), ('y', '<f8'), ('vely', '<f8'),
+                       ('prev_y', '<f8'), ('column', '<i2'),
+                       ('color', 'u1', 3)])
+
+    def __str__(self):
+        """
+        Returns a formatted string for printing purposes
+        """
+        if self.n:
+            s = 'Array_Dropper_List:\n'
+            s += '     x pos     y pos      vely   col   color'
+            for b in self:
+                s += f'\n{b.x:10.2f}{b.y:10.2f}{b.vely:10.2f}{b.column:6}   {b.color}'
+        else:
+            s = 'Empty Array_Dropper_List:'
+        return s
+
+    def append(self, b):
+        """
+        Add a Dropper to the end of the list
+        """
+        self.add_row(x=b.x, y=b.y, prev_y=b.prev_y, vely=b.vely,
+                     column=b.column, color=self.color_index(b.color))
+
+    def item(self, k):
+        """
+        Returns dropper k as a Dropper object
+        """
+        b = Dropper(float(self.x[k]), float(self.y[k]),
+                    self.palette[self.color[k]], float(self.vely[k]),
+                    int(self.column[k]))
+        b.prev_y = float(self.prev_y[k])
+        return b
+
+    def move(self, time_delta):
+        """
+        Given time since last update in ms, accellerate every dropper downward
+        """
+        n = self.n
+        self.prev_y[:n] = self.y[:n]
+        self.y[:n] += (self.vely[:n] + .5 * BUBBLE_GRAVITY * time_delta) \
+                      * time_delta
+        self.vely[:n] += BUBBLE_GRAVITY * time_delta
+
+    def positions(self, alpha):
+        """
+        Returns x and y arrays of the positions alpha of the way along the
+         last move
+        """
+        n = self.n
+        py = self.prev_y[:n]
+        return self.x[:n], py + alpha * (self.y[:n] - py)
+
+    def check_bounds(self):
+        """
+        Return a list of tuples with the locations of droppers that fell off
+         the bottom of the screen and remove said droppers from the list
+        """
+        n = self.n
+        out = self.y[:n] > HEIGHT
+        if not out.any():
+            return []
+        x, y = self.x[:n][out].tolist(), self.y[:n][out].tolist()
+        self.compact(~out)
+        return [((fx, fy), FALLING_BUBBLE_POINTS) for fx, fy in zip(x, y)]
+
+    def strike(self, ship):
+        """
+        Given a Ship object, identify and remove any droppers which struck the
+         Ship. Droppers fall straight down their column, so only those in the
+         band of columns the ship can reach are tested.
+        """
+        n = self.n
+        reach = ship.current_radius + BUBBLE_DIAMETER//2
+        band = column_band(ship.x, reach)
+        column = self.column[:n]
+        near = (column >= band.start) & (column < band.stop) \
+               & (abs(self.y[:n] - ship.y) <= reach)
+        if not near.any():
+            return
+        hit = np.zeros(n, bool)
+        for k in np.nonzero(near)[0].tolist():
+            hit[k] = ship.hit_ship(float(self.x[k]), float(self.y[k]),
+                                   BUBBLE_DIAMETER//2)
+        self.compact(~hit)
+
+    def land(self, grid):
+        """
+        Given a bubble grid, identify and delete any droppers which landed on
+         the grid. Only droppers within reach of a grid row are tested, in
+         list order.
+        """
+        if not self.n or not len(grid):
+            return
+        # Droppers land within a row spacing of a row, so next to the nearest
+        i = nearest_rows(grid, self.y[:self.n])
+        near = (i >= -1) & (i <= len(grid))
+        if not near.any():
+            return
+        hit = np.zeros(self.n, bool)
+        for k in np.nonzero(near)[0].tolist():
+            hit[k] = grid.falling_bubble_lands(self.item(k))
+        self.compact(~hit)
@@ -0,0 +1,260 @@
+"""
+Runs many headless games of Ring Leader across a pool of processes and writes
+ a summary of how far they got, for balancing the game's constants.
+
+- Run 1000 games of each policy: `python batch.py --games 1000`
+- Pick policies: `python batch.py --policy greedy --policy random`
+- Try new constants: `python batch.py --set MATCH_LENGTH=5 --set
+  LEVEL_SPEED_UP=1.05` (any name in config.py, values are Python literals)
+- Keep every game's result too: `python batch.py --records games.jsonl`
+
+Game k of a run is seeded with --seed + k, so the same arguments always play
+ the same games whatever the number of processes. Games run in fixed ticks of
+ SIM_TICK ms with swept bullets, as in ring_leader.py, until game over or
+ --minutes of game time.
+The summary has, per policy, the games played and died, percentiles of level
+ reached, score and time to death, a histogram of levels and the mean score
+ curve sampled every --period seconds of game time.
+"""
+
+import argparse
+import ast
+import json
+import multiprocessing
+import random
+import sys
+from time import perf_counter
+
+import config
+
+POLICIES = ('idle', 'random', 'greedy')
+GAMES = 100        # Games per policy
+SEED = 1           # Seed of the first game
+MINUTES = 20       # Game time limit per game
+PERIOD = 10        # Seconds of game time between score curve samples
+PERCENTILES = (10, 50, 90)
+CHUNK = 4          # Games handed to a worker at a time
+
+def idle_policy(game, rng):
+    """
+    Never touches the controls, a baseline for how long the grid takes to win
+    """
+    from session import Controls
+    return Controls()
+
+def random_policy(game, rng):
+    """
+    Fires at random upward angles, cycles colors and works the thrusters at
+     random
+    """
+    from session import Controls
+    c = Controls()
+    if rng.random() < .08:
+        c.shots.append(rng.uniform(.2, 2.9))
+    if rng.random() < .02:
+        c.cycles = 1
+    if rng.random() < .05:
+        c.up, c.down, c.left, c.right = (rng.random() < .5 for _ in range(4))
+    return c
+
+def greedy_policy(game, rng):
+    """
+    Aims just below the lowest bubble of a column matching the ship's color,
+     cycling colors when there is none, and dodges sideways at random
+    """
+    from session import Controls
+    from bubble import COLUMN_X, GRID_SPACING
+    c = Controls()
+    if rng.random() < .08:
+        grid = game.bubble_grid
+        color = game.ship.get_color()
+        targets = [] # (x, y) of lowest bubbles matching the ship's color
+        found = set()
+        for index, row in sorted(grid.row_colors().items()):
+            for j, bc in enumerate(row):
+                if bc and j not in found:
+                    found.add(j)
+                    if bc == color:
+                        targets.append((COLUMN_X[j],
+                                        grid.scroll - index*GRID_SPACING))
+        if targets:
+            x, y = rng.choice(targets)
+            c.shots.append(game.ship.get_angle((x, y + GRID_SPACING)))
+        else:
+            c.cycles = 1
+    if rng.random() < .03:
+        c.left, c.right = (rng.random() < .5 for _ in range(2))
+    return c
+
+def apply_overrides(overrides):
+    """
+    Given a dict of config.py names to values, set them in config. Game
+     modules copy constants when imported, so this must run before they are.
+    """
+    for name, value in overrides.items():
+        setattr(config, name, value)
+
+def play_game(task):
+    """
+    Given a (policy name, seed, grid name, minutes, period) task, play one
+     game to the end or the time limit. Returns a dict of the policy, seed,
+     level, score, game time in ms, whether the ship died and the score
+     curve.
+    """
+    from session import GameSession
+    policy, seed, grid, minutes, period = task
+    if grid == 'array':
+        from array_grid import Array_Grid
+        grid_type = Array_Grid
+    else:
+        from bubble import Bubble_Grid
+        grid_type = Bubble_Grid
+
+    decide = globals()[policy + '_policy']
+    game = GameSession(grid_type, swept=True, seed=seed)
+    rng = random.Random(seed) # Policy randomness, apart from the game's
+    tick, limit = config.SIM_TICK, minutes * 60000
+    sample, curve = period * 1000, []
+    elapsed = 0
+    while elapsed < limit:
+        state = game.step(tick, decide(game, rng))
+        elapsed += tick
+        if elapsed % sample < tick:
+            curve.append(game.score.score)
+        if not state:
+            break
+    return {'policy': policy, 'seed': seed, 'level': game.level,
+            'score': game.score.score, 'time_ms': elapsed,
+            'died': not game.game_state, 'curve': curve}
+
+def percentiles(values):
+    """
+    Given a list of numbers, return a dict of PERCENTILES by the nearest rank
+     method, with the mean
+    """
+    ordered = sorted(values)
+    n = len(ordered)
+    stats = {f'p{p}': ordered[max(0, -(-p * n // 100) - 1)]
+             for p in PERCENTILES}
+    stats['mean'] = sum(ordered) / n
+    return stats
+
+def summarize(records):
+    """
+    Given the results of play_game(), return a dict of summary statistics by
+     policy
+    """
+    by_policy = {}
+    for r in records:
+        by_policy.setdefault(r['policy'], []).append(r)
+
+    summary = {}
+    for policy, games in by_policy.items():
+        levels = {}
+        for g in games:
+            levels[g['level']] = levels.get(g['level'], 0) + 1
+        deaths = [g['time_ms'] / 1000 for g in games if g['died']]
+        # Mean score after each period, a finished game keeps its final score
+        length = max(len(g['curve']) for g in games)
+        curve = [sum(g['curve'][k] if k < len(g['curve']) else g['score']
+                     for g in games) / len(games) for k in range(length)]
+        alive = [sum(len(g['curve']) > k for g in games) / len(games)
+                 for k in range(length)]
+        summary[policy] = {
+            'games': len(games), 'died': len(deaths),
+            'level': percentiles([g['level'] for g in games]),
+            'score': percentiles([g['score'] for g in games]),
+            'death_s': percentiles(deaths) if deaths else None,
+            'levels': {str(k): levels[k] for k in sorted(levels)},
+            'score_curve': [round(s, 1) for s in curve],
+            'alive_curve': [round(a, 3) for a in alive]}
+    return summary
+
+def run(policies=POLICIES, games=GAMES, seed=SEED, processes=None,
+        overrides=None, grid='object', minutes=MINUTES, period=PERIOD,
+        records=None):
+    """
+    Play games of each policy across a pool of processes. Returns the summary
+     with the settings used. Each result is also written to the records file
+     object as a JSON line, if given.
+    """
+    overrides = overrides or {}
+    tasks = [(p, seed + k, grid, minutes, period)
+             for p in policies for k in range(games)]
+    # Fresh interpreters, so the overrides are in place before game modules
+    # copy the constants they import
+    context = multiprocessing.get_context('spawn')
+    start = perf_counter()
+    results = []
+    with context.Pool(processes, apply_overrides, (overrides,)) as pool:
+        for r in pool.imap_unordered(play_game, tasks, CHUNK):
+            results.append(r)
+            if records:
+                records.write(json.dumps(r) + '\n')
+    seconds = perf_counter() - start
+
+    results.sort(key=lambda r: (r['policy'], r['seed']))
+    return {'games': len(results), 'seed': seed, 'grid': grid,
+            'minutes': minutes, 'period_s': period, 'overrides': overrides,
+            'processes': processes or multiprocessing.cpu_count(),
+            'wall_s': round(seconds, 3),
+            'games_per_s': round(len(results) / seconds, 2),
+            'policies': summarize(results)}
+
+def parse_override(text):
+    """
+    Given NAME=VALUE, return the config.py name and the literal value
+    """
+    name, sep, value = text.partition('=')
+    if not sep or not hasattr(config, name):
+        raise argparse.ArgumentTypeError(f'not a config.py setting: {text}')
+    try:
+        return name, ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        raise argparse.ArgumentTypeError(f'not a Python literal: {value}')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--games', type=int, default=GAMES,
+                        help='games per policy')
+    parser.add_argument('--policy', action='append', choices=POLICIES,
+                        help='policy to play, may be repeated (default all)')
+    parser.add_argument('--seed', type=int, default=SEED,
+                        help='seed of the first game')
+    parser.add_argument('--processes', type=int,
+                        help='worker processes (default one per core)')
+    parser.add_argument('--set', action='append', type=parse_override,
+                        default=[], metavar='NAME=VALUE',
+                        help='override a config.py setting, may be repeated')
+    parser.add_argument('--grid', choices=('object', 'array'),
+                        default='object', help='grid backend to play on')
+    parser.add_argument('--minutes', type=float, default=MINUTES,
+                        help='game time limit per game')
+    parser.add_argument('--period', type=float, default=PERIOD,
+                        help='seconds of game time between score samples')
+    parser.add_argument('--out', default='batch_summary.json',
+                        help='summary JSON file')
+    parser.add_argument('--records', help='JSON lines file of every game')
+    args = parser.parse_args(argv)
+
+    records = open(args.records, 'w') if args.records else None
+    try:
+        summary = run(args.policy or POLICIES, args.games, args.seed,
+                      args.processes, dict(args.set), args.grid,
+                      args.minutes, args.period, records)
+    finally:
+        if records:
+            records.close()
+
+    with open(args.out, 'w') as f:
+        f.write(json.dumps(summary, indent=2) + '\n')
+    for policy, s in summary['policies'].items():
+        print(f"{policy:>8}: {s['games']} games, level p50 "
+              f"{s['level']['p50']}, score p50 {s['score']['p50']}, "
+              f"{s['died']} died", file=sys.stderr)
+    print(f"{summary['games']} games in {summary['wall_s']} s "
+          f"({summary['games_per_s']} games/s)", file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
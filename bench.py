@@ -0,0 +1,238 @@
+"""
+Benchmarks the stages of the Ring Leader update loop on reproducible board
+ states and reports per stage timing percentiles as JSON.
+
+- Run the benchmarks: `python bench.py --out results.json`
+- Check for regressions: `python bench.py --baseline results.json`
+  (exits with status 1 if any stage's median slowed down past --threshold,
+  --metric min compares the fastest calls, which is less noisy)
+- Use the NumPy grid backend: `python bench.py --grid array`
+- Use the NumPy bullet and dropper lists: `python bench.py --lists array`
+
+Every board is built from a fixed seed, and each timed call starts from the
+ board's snapshot, so runs are comparable across machines and commits.
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+from time import perf_counter_ns
+
+from session import GameSession
+from bubble import Bubble_Grid, Bullet_List, Dropper_List, Bullet, Dropper, \
+                   GRID_SPACING, FIRST_COLUMN_X
+from config import BOARD_HEIGHT, BOARD_WIDTH, HEIGHT, WIDTH
+
+SEED = 1234       # Seed for every board and its bullets and droppers
+DELTA = 16        # ms per timed step, about 60 frames per second
+REPEAT = 100      # Timed calls per stage
+THRESHOLD = .10   # Fractional slow down of a median counted as a regression
+PERCENTILES = (50, 90, 99)
+STRIKERS = 8      # Most bullets on a board touching the grid at once
+
+# Score alerts added by the Score.__iadd__ stage: ((x,y),pts)
+ALERTS = [((FIRST_COLUMN_X + GRID_SPACING*j, HEIGHT//2), 2**(j % 8))
+          for j in range(BOARD_WIDTH)]
+
+def build_board(grid_type, rows=0, bullets=0, droppers=0,
+                list_types=(Bullet_List, Dropper_List)):
+    """
+    Returns a GameSession holding rows full grid rows hanging from the top of
+     the screen, 20 rows reach the bottom and more overflow past it. Up to
+     STRIKERS bullets are about to hit the bottom of the grid, the rest fly
+     through the open screen below it. Droppers fall through the lower half of
+     the screen. Every grid spot is dirty and the grid is flagged for a
+     connectivity check, as after a busy update. list_types are the bullet
+     and dropper list classes.
+    """
+    game = GameSession(grid_type, seed=SEED, bullet_type=list_types[0],
+                       dropper_type=list_types[1])
+    grid = game.bubble_grid
+    for _ in range(rows):
+        grid.addTopRow()
+        grid.scroll += GRID_SPACING # Make room for the next row
+    if rows:
+        grid.prev_scroll = grid.scroll
+        grid.mark_all_dirty()
+        grid.check_loose = True
+
+    rng = random.Random(SEED)
+    top = grid[0].y + GRID_SPACING*.6 if rows else 0 # Just below the grid
+    bottom = max(top + 3*GRID_SPACING, HEIGHT)
+    for k in range(bullets):
+        if k < STRIKERS:
+            y = rng.uniform(top, top + GRID_SPACING*.9)
+        else:
+            y = rng.uniform(top + 2*GRID_SPACING, bottom)
+        game.bullets += Bullet(rng.uniform(0, WIDTH), y,
+                               rng.choice(game.level_colors),
+                               rng.uniform(.2, 2.9))
+    for _ in range(droppers):
+        j = rng.randrange(BOARD_WIDTH)
+        game.droppers += Dropper(FIRST_COLUMN_X + GRID_SPACING*j,
+                                 rng.uniform(HEIGHT//2, HEIGHT),
+                                 rng.choice(game.level_colors),
+                                 rng.uniform(0, .3), j)
+    return game
+
+# name: (grid rows, bullets, droppers)
+BOARDS = {'empty': (0, 4, 4),
+          'full': (BOARD_HEIGHT, 8, 8),
+          'tall': (3 * BOARD_HEIGHT, 8, 8),
+          'heavy': (BOARD_HEIGHT // 2, 200, 200)}
+
+def add_alerts(game):
+    """
+    Score stage: add a combo's worth of alerts to the game's Score
+    """
+    game.score += list(ALERTS)
+
+# name: (function of a GameSession, True if each call needs a fresh board
+#        rather than repeating on one copy)
+STAGES = {
+    'bullets.move': (lambda g: g.bullets.move(DELTA), False),
+    'bullets.check_bounds': (lambda g: g.bullets.check_bounds(), True),
+    'delete_strikers': (lambda g: g.bullets.delete_strikers(g.bubble_grid),
+                        True),
+    'droppers.move': (lambda g: g.droppers.move(DELTA), False),
+    'droppers.land': (lambda g: g.droppers.land(g.bubble_grid), True),
+    'droppers.strike': (lambda g: g.droppers.strike(g.ship), True),
+    'erase_matches': (lambda g: g.bubble_grid.erase_matches(), True),
+    'drop_loose_bubbles': (lambda g: g.bubble_grid.drop_loose_bubbles(), True),
+    'bubble_grid.collide': (lambda g: g.bubble_grid.collide(g.ship.x, g.ship.y,
+                                                  g.ship.current_radius),
+                            False),
+    'Score.__iadd__': (add_alerts, True),
+    'step': (lambda g: g.step(DELTA), True),
+}
+
+def percentile(ordered, p):
+    """
+    Given a sorted list, return its p-th percentile by the nearest rank method
+    """
+    k = max(0, -(-p * len(ordered) // 100) - 1)
+    return ordered[k]
+
+def time_stage(board, stage, fresh, repeat):
+    """
+    Given a board GameSession, a stage function and whether each call needs
+     a fresh copy of the board, time repeat calls. Returns a dict of timing
+     statistics in microseconds.
+    """
+    times = []
+    # Play on a game of the same classes, leaving the board as built for
+    # other stages
+    snap = board.snapshot()
+    game = GameSession(board.grid_type, bullet_type=board.bullet_type,
+                       dropper_type=board.dropper_type, swept=board.swept)
+    game.restore(snap)
+    for _ in range(repeat):
+        if fresh:
+            game.restore(snap)
+        start = perf_counter_ns()
+        stage(game)
+        times.append(perf_counter_ns() - start)
+
+    times.sort()
+    stats = {f'p{p}': percentile(times, p) / 1000 for p in PERCENTILES}
+    stats['min'] = times[0] / 1000
+    stats['mean'] = sum(times) / len(times) / 1000
+    return stats
+
+def run(grid_type=Bubble_Grid, repeat=REPEAT, boards=None, stages=None,
+        list_types=(Bullet_List, Dropper_List)):
+    """
+    Time every stage on every board. Returns a dict of results by board then
+     stage, along with the settings used.
+    """
+    results = {}
+    for name in boards or BOARDS:
+        board = build_board(grid_type, *BOARDS[name], list_types=list_types)
+        results[name] = {}
+        for stage in stages or STAGES:
+            func, fresh = STAGES[stage]
+            results[name][stage] = time_stage(board, func, fresh, repeat)
+
+    return {'grid': grid_type.__name__,
+            'lists': [t.__name__ for t in list_types], 'repeat': repeat, 'delta': DELTA,
+            'seed': SEED, 'python': platform.python_version(),
+            'machine': platform.machine(), 'results': results}
+
+def compare(current, baseline, threshold=THRESHOLD, metric='p50'):
+    """
+    Given results from run() and a stored baseline, return a list of
+     (board, stage, baseline time, current time, ratio, regressed) tuples for
+     every stage timed in both, comparing the given statistic.
+    """
+    rows = []
+    for board, stages in current['results'].items():
+        for stage, stats in stages.items():
+            base = baseline['results'].get(board, {}).get(stage)
+            if base is None:
+                continue
+            ratio = stats[metric] / base[metric] if base[metric] else 1
+            rows.append((board, stage, base[metric], stats[metric], ratio,
+                         ratio > 1 + threshold))
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--grid', choices=('object', 'array'),
+                        default='object', help='grid backend to time')
+    parser.add_argument('--lists', choices=('object', 'array'),
+                        default='object',
+                        help='bullet and dropper list backend to time')
+    parser.add_argument('--repeat', type=int, default=REPEAT,
+                        help='timed calls per stage')
+    parser.add_argument('--board', action='append', choices=list(BOARDS),
+                        help='board to time, may be repeated (default all)')
+    parser.add_argument('--stage', action='append', choices=list(STAGES),
+                        help='stage to time, may be repeated (default all)')
+    parser.add_argument('--out', help='write the JSON results to this file')
+    parser.add_argument('--baseline', help='JSON results to compare against')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,
+                        help='fractional slow down counted as a regression')
+    parser.add_argument('--metric', default='p50',
+                        choices=[f'p{p}' for p in PERCENTILES] + ['min', 'mean'],
+                        help='statistic compared against the baseline')
+    args = parser.parse_args(argv)
+
+    grid_type = Bubble_Grid
+    if args.grid == 'array':
+        from array_grid import Array_Grid
+        grid_type = Array_Grid
+    list_types = (Bullet_List, Dropper_List)
+    if args.lists == 'array':
+        from array_lists import Array_Bullet_List, Array_Dropper_List
+        list_types = (Array_Bullet_List, Array_Dropper_List)
+
+    current = run(grid_type, args.repeat, args.board, args.stage, list_types)
+    regressed = False
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        rows = compare(current, baseline, args.threshold, args.metric)
+        current['comparison'] = [
+            {'board': b, 'stage': s, 'metric': args.metric, 'baseline': bp,
+             'current': cp, 'ratio': round(r, 3), 'regressed': reg}
+            for b, s, bp, cp, r, reg in rows]
+        regressed = any(row[-1] for row in rows)
+
+    text = json.dumps(current, indent=2)
+    if args.out:
+        with open(args.out, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+    if args.baseline:
+        for b, s, bp, cp, r, reg in rows:
+            flag = 'REGRESSED' if reg else ''
+            print(f'{b:>6} {s:<20}{bp:10.1f}us{cp:10.1f}us{r:7.2f}x {flag}',
+                  file=sys.stderr)
+    return 1 if regressed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,255 @@
+"""
+Module contains the LookaheadBot class, a computer player for headless games.
+ Whenever it has no bullet in flight, the bot tries each of the ship's bullet
+ colors at ANGLES firing angles, each on a grid restored from a snapshot() of
+ the game's grid. Every shot is played through bullet_sweep(),
+ erase_matches() and drop_loose_bubbles(), and the bot fires the one worth
+ the most points. Shots worth the same points are ranked by the
+ size of the same colored group they land in.
+The shots can be spread over a pool of worker processes. Each move has a time
+ budget, shots not tried by then are skipped, so with a budget the bot plays
+ as well as the CPU allows rather than the same way every time.
+
+- Watch it play: `python bot.py --games 4`
+- Spread the search: `python bot.py --processes 4 --budget 20`
+- Try every shot, the same game every time: `python bot.py --budget 0`
+"""
+
+import argparse
+import multiprocessing
+import random
+import sys
+from math import pi
+from time import time, perf_counter
+
+from bubble import Bubble_Grid, Bullet
+from session import GameSession, Controls
+from config import BOARD_WIDTH, FALLING_BUBBLE_POINTS, LOST_BULLET_PENALTY, \
+                   SIM_TICK
+
+ANGLES = 48          # Firing angles tried per bullet color
+MIN_ANGLE = .1       # Closest to level a shot is aimed (radians)
+BUDGET_MS = 25       # Wall time spent choosing each shot
+LOOKAHEAD_TICK = 40  # ms per step of a tried shot, swept so none are missed
+GROUP_WEIGHT = 1     # Value of each bubble in the group a shot lands in
+GAMES = 1
+SEED = 1
+MINUTES = 5
+
+def land(grid, x, y, color, angle):
+    """
+    Given a grid to play on, the ship's x, y position and a bullet color and
+     angle, fire the bullet and move it and the grid until the bullet joins
+     the grid or leaves the screen. Returns True if it joined the grid.
+    """
+    bullet = Bullet(x, y, color, angle)
+    while True:
+        bullet.move(LOOKAHEAD_TICK)
+        if grid.bullet_sweep(bullet):
+            return True
+        if bullet.is_off_screen():
+            return False
+        grid.move(LOOKAHEAD_TICK)
+
+def group_size(before, after, color):
+    """
+    Given the row_colors() of a grid before and after a bubble of color
+     joined it, returns the number of bubbles of that color connected to the
+     spot it took, including itself
+    """
+    empty = (None,) * BOARD_WIDTH
+    spot = next(((index, j) for index, colors in after.items()
+                 for j, c in enumerate(colors)
+                 if c == color and before.get(index, empty)[j] != color), None)
+    if spot is None:
+        return 0
+    group = {spot}
+    path = [spot] # Stack to walk the group
+    while path:
+        index, j = path.pop()
+        for n in ((index+1, j), (index-1, j), (index, j+1), (index, j-1)):
+            row = after.get(n[0])
+            if (n not in group and row and 0 <= n[1] < BOARD_WIDTH
+                    and row[n[1]] == color):
+                group.add(n)
+                path.append(n)
+    return len(group)
+
+def evaluate(grid_type, snapshot, x, y, colors, shots, deadline=None):
+    """
+    Given a grid class, a grid snapshot(), the ship's x, y position, its
+     bullet colors and a list of (color index, angle) shots, try each shot on
+     a grid restored from the snapshot until the time() deadline, if any.
+     Returns a list of (value, color index, angle) of the shots tried, at
+     least one.
+    """
+    grid = grid_type(colors)
+    grid.restore(snapshot)
+    before = grid.row_colors()
+    results = []
+    for k, angle in shots:
+        if results and deadline and time() > deadline:
+            break
+        grid.restore(snapshot) # Back to the game's grid, reusing its rows
+        if land(grid, x, y, colors[k], angle):
+            group = group_size(before, grid.row_colors(), colors[k])
+            points = sum(pts for _, pts in grid.erase_matches())
+            points += FALLING_BUBBLE_POINTS * len(grid.drop_loose_bubbles())
+            value = points + GROUP_WEIGHT * group
+        else:
+            value = -LOST_BULLET_PENALTY
+        results.append((value, k, angle))
+    return results
+
+class LookaheadBot(object):
+    """
+    Represents a computer player looking one shot ahead. It holds the ship
+     still and picks its shots as described above.
+    budget: ms of wall time per move, 0 to try every shot
+    angles: list of the firing angles tried per color, in radians
+    rng: random.Random shuffling the shots, so a short budget still samples
+         every color and direction
+    processes: number of worker processes, 0 to try shots in this process
+    pool: multiprocessing pool of the workers or None
+    pending: angle to fire on the next step, after cycling to its color
+    moves: shots chosen so far
+    tried: shots tried so far
+    """
+
+    def __init__(self, processes=0, budget=BUDGET_MS, angles=ANGLES, seed=None):
+        """
+        Start processes workers if any. seed seeds the shot order.
+        """
+        self.budget = budget
+        self.angles = [MIN_ANGLE + (pi - 2*MIN_ANGLE) * a / (angles - 1)
+                       for a in range(angles)]
+        self.rng = random.Random(seed)
+        self.processes = processes
+        self.pool = None
+        if processes:
+            self.pool = multiprocessing.get_context('spawn').Pool(processes)
+        self.pending = None
+        self.moves = 0
+        self.tried = 0
+
+    def __str__(self):
+        """
+        Return a formatted string for printing
+        """
+        atts = ['\t' + a + ': ' + str(v) for a,v in self.__dict__.items()
+                if a != 'angles']
+        return type(self).__name__ + ' object:\n' + '\n'.join(atts)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __call__(self, game):
+        """
+        Given a GameSession, returns the Controls for its next step
+        """
+        if game.game_state != 1:
+            return Controls()
+        if self.pending is not None: # Cycled to the color last step
+            angle, self.pending = self.pending, None
+            return Controls(shots=[angle])
+        if len(game.bullets) or not len(game.bubble_grid):
+            return Controls()
+
+        value, k, angle = self.search(game)
+        if value < 0: # Every shot tried missed the grid
+            return Controls()
+        ship = game.ship
+        cycles = (k - ship.bullet_index) % len(ship.bullet_colors)
+        if cycles: # Colors change after the step's shots, so fire next step
+            self.pending = angle
+            return Controls(cycles=cycles)
+        return Controls(shots=[angle])
+
+    def search(self, game):
+        """
+        Given a GameSession, try shots until the budget runs out. Returns the
+         (value, color index, angle) of the best shot.
+        """
+        ship, grid = game.ship, game.bubble_grid
+        args = (type(grid), grid.snapshot(), ship.x, ship.y,
+                ship.bullet_colors)
+        shots = [(k, a) for k in range(len(ship.bullet_colors))
+                 for a in self.angles]
+        self.rng.shuffle(shots)
+        deadline = time() + self.budget / 1000 if self.budget else None
+
+        if self.pool is None:
+            results = evaluate(*args, shots, deadline)
+        else:
+            tasks = [self.pool.apply_async(evaluate,
+                                           (*args, shots[n::self.processes],
+                                            deadline))
+                     for n in range(self.processes)]
+            results = [r for t in tasks for r in t.get()]
+
+        self.moves += 1
+        self.tried += len(results)
+        return max(results)
+
+    def close(self):
+        """
+        Stop the worker processes
+        """
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+
+def play(bot, seed, grid_type=Bubble_Grid, minutes=MINUTES):
+    """
+    Given a LookaheadBot, play a swept game from seed in SIM_TICK ms steps to
+     the end or the time limit. Returns the GameSession and game time in ms.
+    """
+    game = GameSession(grid_type, swept=True, seed=seed)
+    elapsed, limit = 0, minutes * 60000
+    while elapsed < limit and game.step(SIM_TICK, bot(game)):
+        elapsed += SIM_TICK
+    return game, elapsed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--games', type=int, default=GAMES,
+                        help='games to play')
+    parser.add_argument('--seed', type=int, default=SEED,
+                        help='seed of the first game')
+    parser.add_argument('--processes', type=int, default=0,
+                        help='worker processes trying shots (default none)')
+    parser.add_argument('--budget', type=float, default=BUDGET_MS,
+                        help='ms per move, 0 tries every shot')
+    parser.add_argument('--angles', type=int, default=ANGLES,
+                        help='firing angles tried per color')
+    parser.add_argument('--grid', choices=('object', 'array'),
+                        default='object', help='grid backend to play on')
+    parser.add_argument('--minutes', type=float, default=MINUTES,
+                        help='game time limit per game')
+    args = parser.parse_args(argv)
+
+    grid_type = Bubble_Grid
+    if args.grid == 'array':
+        from array_grid import Array_Grid
+        grid_type = Array_Grid
+
+    with LookaheadBot(args.processes, args.budget, args.angles,
+                      args.seed) as bot:
+        for seed in range(args.seed, args.seed + args.games):
+            moves, tried = bot.moves, bot.tried
+            start = perf_counter()
+            game, elapsed = play(bot, seed, grid_type, args.minutes)
+            seconds = perf_counter() - start
+            print(f'seed {seed}: level {game.level}, score {game.score.score}'
+                  f', {elapsed / 1000:.0f} s of play'
+                  f'{"" if game.game_state else " (died)"}, '
+                  f'{bot.moves - moves} moves, '
+                  f'{(bot.tried - tried) / seconds:.0f} shots tried/s')
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,58 +1,129 @@
 """
 Module contains the following Classes:
 - Bubble (Generic properties for 3 sub classes)
- - Bullet (A bullet fired from player's ship)
- - Dropper (A falling bubble broken free from the grid)
+ - Free_Bubble (A Bubble with its own position, outside the grid)
+  - Bullet (A bullet fired from player's ship)
+  - Dropper (A falling bubble broken free from the grid)
  - Grid_Bubble (A Bubble in grid formation)
 - Bubble List (Generic properties for 3 sub classes)
  - Bubble_Row (A row of bubbles in a Bubble_Grid)
  - Bullet_List (A list of Bullet objects)
  - Dropper_List (A list of Dropper objects)
+- Row_Ring (Ring buffer of Bubble_Row objects)
 - Bubble_Grid (List of Bubble_Row objects)
 """
 
-from random import choice
+import random
+import struct
 from math import sin, cos
 
 from dist import *
+from sprites import draw_bubbles
 from config import INITIAL_BUBBLE_VELOCITY, HEIGHT, WIDTH, BUBBLE_DIAMETER, \
                    MATCH_LENGTH, BUBBLE_PADDING, BUBBLE_GRAVITY, MARGINS, \
                    BOARD_WIDTH, BULLET_VELOCITY, FALLING_BUBBLE_POINTS, \
-                   LOST_BULLET_PENALTY
+                   LOST_BULLET_PENALTY, GRID_ROWS
+
+GRID_SPACING = BUBBLE_DIAMETER + BUBBLE_PADDING # Between grid bubble centers
+FIRST_COLUMN_X = MARGINS + BUBBLE_DIAMETER // 2 # x of grid column 0
+COLUMN_X = tuple(FIRST_COLUMN_X + GRID_SPACING*j for j in range(BOARD_WIDTH))
+DENSE_DIRTY = 4 # Scan the whole grid for matches once 1 in 4 spots are dirty
+
+# Snapshot layouts, little endian with no padding. Colors are RGB bytes.
+# scroll, prev_scroll, velocity, speed_rows, rows, bottom row index, colors,
+# check_loose
+GRID_HEADER = struct.Struct('<3d4i?')
+BULLET_RECORD = struct.Struct('<5d3B')   # x, y, angle, prev_x, prev_y, color
+DROPPER_RECORD = struct.Struct('<4dh3B') # x, y, vely, prev_y, column, color
+
+def pack_colors(colors):
+    """
+    Returns a list of RGB colors as bytes, three per color
+    """
+    return bytes(v for c in colors for v in c)
+
+def unpack_colors(data):
+    """
+    Returns the list of RGB tuples of bytes from pack_colors()
+    """
+    return [tuple(data[k:k+3]) for k in range(0, len(data), 3)]
+
+def nearest_column(x):
+    """
+    Returns the index of the grid column nearest to x, which may be outside
+     range(BOARD_WIDTH)
+    """
+    return round((x - FIRST_COLUMN_X) / GRID_SPACING)
+
+def column_band(x, reach):
+    """
+    Returns the range of grid columns whose centers can be within reach pix of
+     x. Rounding to the nearest column at each edge never cuts a column off.
+    """
+    return range(max(nearest_column(x - reach), 0),
+                 min(nearest_column(x + reach) + 1, BOARD_WIDTH))
+
+def random_row_colors(colors, rng=random):
+    """
+    Given a list of RGB colors and a random number generator, return a list of
+     BOARD_WIDTH random colors for a new Bubble_Row with no horizontal matches.
+    """
+    row = [rng.choice(colors)] # 1st bubble
+    last_color = row[0] # Track this to ensure no horizontal matches
+    consec = 1
+    cs = set(colors)
+    for j in range(BOARD_WIDTH-1):
+        if consec == MATCH_LENGTH-1: # Avoid horizontal match
+            c = rng.choice(tuple(cs - set([last_color])))
+        else:
+            c = rng.choice(colors)
+        row.append(c)
+        if c == last_color:
+            consec += 1
+        else:
+            last_color = c
+            consec = 1
+    return row
 
 class Bubble(object):
     """
-    Represents a generic bubble for sub classing
-    x: x position in pix
-    y: y position in pix
+    Represents a generic bubble for sub classing. Sub classes declare
+     __slots__ for their own attributes and provide an x, y position in pix:
+     Free_Bubble stores it, Grid_Bubble derives it from its place in the
+     grid.
     color: RGB tuple
     """
+    __slots__ = ('color',)
 
-    def __init__(self, x, y, color):
+    def __init__(self, color):
         """
-        Initialize postion and color
+        Initialize color
         """
-        
-        self.x = x
-        self.y = y
         self.color = color
 
     def __str__(self):
         """
         Return a formatted string for printing
         """
-        
-        atts = ['\t' + a + ': ' + str(v) for a,v in self.__dict__.items()]
+        slots = [a for cls in reversed(type(self).__mro__)
+                 for a in getattr(cls, '__slots__', ())]
+        atts = ['\t' + a + ': ' + str(getattr(self, a)) for a in slots]
         return type(self).__name__ + ' object:\n' + '\n'.join(atts)
 
-    def draw(self, screen):
+    def draw(self, screen, alpha=1):
+        """
+        Given a PGZero screen object, draw this bubble on the screen. alpha is
+         how far between its last two positions to draw it, see lerp().
+        """
+        draw_bubbles(screen, [(*self.lerp(alpha), self.color)])
+
+    def lerp(self, alpha):
         """
-        Given a PGZero screen object, draw this bubble on the screen.
+        Returns the x, y position to draw at, alpha of the way from the
+         position before the last move to the current one. A generic bubble
+         doesn't move.
         """
-        if self.color:
-            screen.draw.filled_circle((self.x, self.y),
-                                       BUBBLE_DIAMETER//2,
-                                       self.color)
+        return self.x, self.y
                                        
     def is_off_screen(self):
         """
@@ -61,32 +132,62 @@ class Bubble(object):
         """
         return self.x > WIDTH or self.x < 0 or self.y > HEIGHT or self.y < 0
 
-class Bullet(Bubble):
+class Free_Bubble(Bubble):
+    """
+    Represents a bubble with its own position, for sub classing. Only these
+     bubbles have x, y slots, so grid bubbles carry none.
+    x: x position in pix
+    y: y position in pix
+    """
+    __slots__ = ('x', 'y')
+
+    def __init__(self, x, y, color):
+        """
+        Initialize postion and color
+        """
+        self.x = x
+        self.y = y
+        super().__init__(color)
+
+class Bullet(Free_Bubble):
     """
     Represents a bullet fired from the player's ship.
     angle: Angle of travel in radians
+    prev_x, prev_y: position in pix before the last move
     """
+    __slots__ = ('angle', 'prev_x', 'prev_y')
 
     def __init__(self, x, y, color, ang):
         """
         Store generic bubble attributes and angle of travel in radians
         """
         self.angle = ang
+        self.prev_x, self.prev_y = x, y
         super().__init__(x, y, color)
 
     def move(self, time_delta):
         """
         Given ms since the last update, move bullet at set speed on angle
         """
+        self.prev_x, self.prev_y = self.x, self.y
         self.x += BULLET_VELOCITY * cos(self.angle) * time_delta # x vect
         self.y -= BULLET_VELOCITY * sin(self.angle) * time_delta # y vect
 
-class Dropper(Bubble):
+    def lerp(self, alpha):
+        """
+        Returns the x, y position alpha of the way along the last move
+        """
+        return (self.prev_x + alpha * (self.x - self.prev_x),
+                self.prev_y + alpha * (self.y - self.prev_y))
+
+class Dropper(Free_Bubble):
     """
     Represents a bubble falling downward after breaking free from bubble grid
     vely: falling speed in pix/ms
     column: integer index of falling column 0 - BOARD_WIDTH-1
+    prev_y: y position in pix before the last move
     """
+    __slots__ = ('vely', 'column', 'prev_y')
 
     def __init__(self, x, y, color, vely, column):
         """
@@ -94,27 +195,66 @@ class Dropper(Bubble):
         """
         self.vely = vely
         self.column = column
+        self.prev_y = y
         super().__init__(x, y, color)
 
     def move(self, time_delta):
         """
-        Given time since last update in ms, accellerate dropper downward
+        Given time since last update in ms, accellerate dropper downward. The
+         fall is integrated exactly, so it doesn't depend on the step size.
         """
-        self.y += self.vely * time_delta
+        self.prev_y = self.y
+        self.y += (self.vely + .5 * BUBBLE_GRAVITY * time_delta) * time_delta
         self.vely += BUBBLE_GRAVITY * time_delta
 
+    def lerp(self, alpha):
+        """
+        Returns the x, y position alpha of the way along the last move
+        """
+        return self.x, self.prev_y + alpha * (self.y - self.prev_y)
+
 class Grid_Bubble(Bubble):
     """
-    Represents a bubble in the grid
+    Represents a bubble in the grid. Only its place in the grid is stored, the
+     x, y position is derived from it.
+    column: integer index of the bubble's column 0 - BOARD_WIDTH-1
+    row: the Bubble_Row holding this bubble, y position is the row's y
     bulletFlag: indicates if this grid bubble came from a Bullet for scoring
                 purposes
     """
-    def __init__(self, x, y, color, bulletFlag):
+    __slots__ = ('column', 'row', 'bulletFlag')
+
+    def __init__(self, column, row, color, bulletFlag):
         """
-        Initialize flag for grid bubble added by bullet and generic attributes
+        Initialize column, row, flag for grid bubble added by bullet and
+         color. The position follows the row as the grid scrolls.
         """
+        self.column = column
+        self.row = row
         self.bulletFlag = bulletFlag
-        super().__init__(x, y, color)
+        self.color = color
+
+    def __str__(self):
+        """
+        Return a formatted string for printing
+        """
+        atts = ['\t' + a + ': ' + str(getattr(self, a))
+                for a in ('x', 'y', 'color', 'bulletFlag')]
+        return type(self).__name__ + ' object:\n' + '\n'.join(atts)
+
+    @property
+    def x(self):
+        return COLUMN_X[self.column]
+
+    @property
+    def y(self):
+        return self.row.y
+
+    def lerp(self, alpha):
+        """
+        Returns the x, y position alpha of the way along the grid's last move
+        """
+        return COLUMN_X[self.column], self.row.lerp_y(alpha)
 
 class Bubble_List(object):
     """
@@ -149,12 +289,12 @@ class Bubble_List(object):
             self.contents.append(rhs)
         return self
 
-    def draw(self, screen):
+    def draw(self, screen, alpha=1):
         """
-        Given a PGZero screen object, draw each Bubble in the list
+        Given a PGZero screen object, draw each Bubble in the list alpha of
+         the way along its last move, all in one batch of cached sprites
         """
-        for b in self.contents:
-            b.draw(screen)
+        draw_bubbles(screen, [(*b.lerp(alpha), b.color) for b in self.contents])
             
     def move(self, time_delta):
         """
@@ -166,8 +306,39 @@ class Bubble_List(object):
 class Bubble_Row(Bubble_List):
     """
     Represents a row of Grid_Bubble objects in a Bubble_Grid object
+    grid: the Bubble_Grid holding this row
+    index: fixed integer position of this row in the grid, counting upward.
+           Row y position is derived from it and the grid's scroll offset.
     """
-    
+
+    def __init__(self, grid, index):
+        """
+        Initialize an empty row at a fixed index of a grid
+        """
+        self.grid = grid
+        self.index = index
+        super().__init__()
+
+    @property
+    def y(self):
+        return self.grid.scroll - self.index * GRID_SPACING
+
+    def lerp_y(self, alpha):
+        """
+        Returns the row's y position alpha of the way along the grid's last
+         move
+        """
+        return self.grid.lerp_scroll(alpha) - self.index * GRID_SPACING
+
+    def reset(self, index):
+        """
+        Empty every spot in this row and move it to a new index in the grid
+        """
+        self.index = index
+        for b in self.contents:
+            b.color = None
+            b.bulletFlag = False
+
     def __str__(self):
         """
         Returns a formatted string for printing
@@ -184,7 +355,13 @@ class Bubble_Row(Bubble_List):
 class Bullet_List(Bubble_List):
     """
     Represents a list of Bullets flying across the screen
+    swept: bool, test the whole path each bullet moved along since the last
+           update for collisions instead of only its current position
     """
+    def __init__(self, swept=False):
+        self.swept = swept
+        super().__init__()
+
     def __str__(self):
         """
         Returns a formatted string for printing
@@ -216,15 +393,34 @@ class Bullet_List(Bubble_List):
                 cnt += 1
         return oob
 
+    def snapshot(self):
+        """
+        Returns the bullets as bytes, a BULLET_RECORD each
+        """
+        return b''.join(BULLET_RECORD.pack(b.x, b.y, b.angle, b.prev_x,
+                                           b.prev_y, *b.color)
+                        for b in self.contents)
+
+    def restore(self, data):
+        """
+        Given bytes from snapshot(), replace the bullets with those saved
+        """
+        self.contents = []
+        for x, y, angle, px, py, *color in BULLET_RECORD.iter_unpack(data):
+            b = Bullet(x, y, tuple(color), angle)
+            b.prev_x, b.prev_y = px, py
+            self.contents.append(b)
+
     def delete_strikers(self, grid):
         """
-        Given a Bubble_Grid object, delete any Bullet objects which contact the 
+        Given a Bubble_Grid object, delete any Bullet objects which contact the
          grid.
         """
+        collide = grid.bullet_sweep if self.swept else grid.bullet_collide
         cnt = 0
         while cnt < len(self.contents):
             b = self.contents[cnt]
-            if grid.bullet_collide(b):
+            if collide(b):
                 del self.contents[cnt]
             else:
                 cnt += 1
@@ -264,50 +460,208 @@ class Dropper_List(Bubble_List):
                 cnt += 1
         return oob
 
+    def snapshot(self):
+        """
+        Returns the droppers as bytes, a DROPPER_RECORD each
+        """
+        return b''.join(DROPPER_RECORD.pack(fb.x, fb.y, fb.vely, fb.prev_y,
+                                            fb.column, *fb.color)
+                        for fb in self.contents)
+
+    def restore(self, data):
+        """
+        Given bytes from snapshot(), replace the droppers with those saved
+        """
+        self.contents = []
+        for x, y, vely, py, j, *color in DROPPER_RECORD.iter_unpack(data):
+            fb = Dropper(x, y, tuple(color), vely, j)
+            fb.prev_y = py
+            self.contents.append(fb)
+
     def strike(self, ship):
         """
         Given a Ship object, identify and remove any droppers from the list 
-        which struck the Ship.
+        which struck the Ship. Droppers fall straight down their column, so
+         only those in the band of columns the ship can reach are tested.
         """
-        cnt = 0
-        while cnt < len(self.contents):
-            fb = self.contents[cnt]
-
-            if ship.hit_ship(fb.x,fb.y, BUBBLE_DIAMETER//2):
-                del self.contents[cnt]
-            else:
-                cnt += 1
+        radius = BUBBLE_DIAMETER//2
+        band = column_band(ship.x, ship.current_radius + radius)
+        self.contents = [fb for fb in self.contents if fb.column not in band
+                         or not ship.hit_ship(fb.x, fb.y, radius)]
 
     def land(self, grid):
         """
         Given a Bubble_Grid, identify and delete any droppers which landed on 
          the grid.
         """
-        cnt = 0
-        while cnt < len(self.contents):
-            if grid.falling_bubble_lands(self.contents[cnt]):
-                del self.contents[cnt]
-            else:
-                cnt += 1
+        self.contents = [fb for fb in self.contents
+                         if not grid.falling_bubble_lands(fb)]
+
+class Row_Ring(object):
+    """
+    Represents the rows of a Bubble_Grid, bottom row first, as a ring buffer
+     of preallocated Bubble_Row objects. Rows are recycled at both ends, so
+     adding and removing rows never shifts a list or creates Grid_Bubbles.
+    grid: the Bubble_Grid holding these rows
+    slots: list of Bubble_Row objects, one per row of capacity
+    start: position in slots of the bottom row
+    count: number of rows in use
+    """
+
+    def __init__(self, grid, capacity):
+        """
+        Preallocate capacity empty rows
+        """
+        self.grid = grid
+        self.slots = [self.new_row() for _ in range(capacity)]
+        self.start = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        return iter(self.ordered())
+
+    def __getitem__(self, key):
+        return self.slots[self.slot(key)]
+
+    def __setitem__(self, key, item):
+        """
+        Stores the Bubble_Row item as row key, pointing it and its bubbles at
+         this ring's grid and their new row, as a row may come from another
+         grid
+        """
+        item.grid = self.grid
+        for j, b in enumerate(item.contents):
+            b.row = item
+            b.column = j
+        self.slots[self.slot(key)] = item
+
+    def __delitem__(self, key):
+        """
+        Removes the row at key, shifting the rows above it down one position
+        """
+        gone = self.slots[self.slot(key)]
+        if key < 0:
+            key += self.count
+        if key == 0:
+            self.pop_bottom()
+            return
+        cap = len(self.slots)
+        for k in range(key, self.count-1):
+            self.slots[(self.start+k) % cap] = self.slots[(self.start+k+1) % cap]
+        self.slots[(self.start+self.count-1) % cap] = gone # Free for reuse
+        self.count -= 1
+
+    def new_row(self):
+        """
+        Returns a new empty Bubble_Row of BOARD_WIDTH Grid_Bubble objects
+        """
+        row = Bubble_Row(self.grid, 0)
+        for j in range(BOARD_WIDTH):
+            # color of None adds blank place holders
+            row += Grid_Bubble(j, row, None, False)
+        return row
+
+    def slot(self, key):
+        """
+        Returns the position in self.slots of row key, which may be negative
+        """
+        if key < 0:
+            key += self.count
+        if not 0 <= key < self.count:
+            raise IndexError('row index out of range')
+        return (self.start + key) % len(self.slots)
+
+    def ordered(self):
+        """
+        Returns a list of the rows in use, bottom row first
+        """
+        end = self.start + self.count
+        if end <= len(self.slots):
+            return self.slots[self.start:end]
+        return self.slots[self.start:] + self.slots[:end - len(self.slots)]
+
+    def grow(self):
+        """
+        Doubles the capacity of the ring, keeping the rows in use
+        """
+        rows = self.ordered()
+        spare = [self.slots[(self.start + self.count + k) % len(self.slots)]
+                 for k in range(len(self.slots) - self.count)]
+        self.slots = rows + spare + [self.new_row() for _ in self.slots]
+        self.start = 0
+
+    def clear(self):
+        """
+        Removes every row, leaving them all free for reuse
+        """
+        self.start = 0
+        self.count = 0
+
+    def push_top(self, index):
+        """
+        Returns an empty row with the given index added above the top row
+        """
+        if self.count == len(self.slots):
+            self.grow()
+        row = self.slots[(self.start + self.count) % len(self.slots)]
+        row.reset(index)
+        self.count += 1
+        return row
+
+    def push_bottom(self, index):
+        """
+        Returns an empty row with the given index added below the bottom row
+        """
+        if self.count == len(self.slots):
+            self.grow()
+        self.start = (self.start - 1) % len(self.slots)
+        row = self.slots[self.start]
+        row.reset(index)
+        self.count += 1
+        return row
+
+    def pop_bottom(self):
+        """
+        Removes the bottom row, leaving it free for reuse
+        """
+        self.start = (self.start + 1) % len(self.slots)
+        self.count -= 1
 
 class Bubble_Grid(object):
     """
     Represents the grid of bubbles falling slowly from the top of the screen
     colors: list of RGB colors to make new grid bubbles
     velocity: speed of bubble generation from screen top
-    rows: a list of Bubble_Row objects
+    rng: random number generator for new row colors, random module by default
+    rows: a Row_Ring of Bubble_Row objects, bottom row first
+    scroll: y position in pix of the row with index 0. Moving the grid only
+            changes this value.
+    prev_scroll: scroll before the last move, for interpolated drawing
     speed_rows: number of rows to speed out at level begining
+    check_loose: bool, bubbles were removed since the last drop_loose_bubbles
+    dirty: set of (i,j) grid positions colored since the last erase_matches
+    lowest: list of the fixed index of the lowest row holding a bubble in each
+            column, None for an empty column
     """
 
-    def __init__(self, colors, velocity=None):
+    def __init__(self, colors, velocity=None, rng=random):
         if velocity:
             self.velocity = velocity
         else:
             self.velocity = INITIAL_BUBBLE_VELOCITY
 
         self.colors = colors
-        self.rows = []
+        self.rng = rng
+        self.rows = Row_Ring(self, GRID_ROWS)
+        self.scroll = 0
+        self.prev_scroll = 0
         self.speed_rows = MATCH_LENGTH
+        self.check_loose = False
+        self.dirty = set()
+        self.lowest = [None] * BOARD_WIDTH
 
     def __str__(self):
         """
@@ -331,94 +685,195 @@ class Bubble_Grid(object):
         return self.rows[key]
 
     def __setitem__(self, key, item):
+        item.index = self.rows[key].index # Take over this row's position
         self.rows[key] = item
+        self.check_loose = True
+        self.mark_all_dirty()
+        for j in range(BOARD_WIDTH):
+            self.find_lowest(j)
 
     def __delitem__(self, key):
         del self.rows[key]
+        rows = self.rows.ordered()
+        for k, row in enumerate(rows): # Rows above the gap move down into it
+            row.index = rows[0].index + k
+        self.check_loose = True
+        self.mark_all_dirty()
+        for j in range(BOARD_WIDTH):
+            self.find_lowest(j)
 
-    def draw(self, screen):
+    def draw(self, screen, alpha=1):
+        """
+        Given a PGZero screen object, draw every grid bubble alpha of the way
+         along the grid's last move in one batch of cached sprites
+        """
+        bubbles = []
         for r in self.rows:
-            r.draw(screen)
+            y = r.lerp_y(alpha)
+            bubbles.extend((x, y, b.color)
+                           for b, x in zip(r.contents, COLUMN_X) if b.color)
+        draw_bubbles(screen, bubbles)
+
+    def lerp_scroll(self, alpha):
+        """
+        Returns the scroll offset alpha of the way along the last move
+        """
+        return self.prev_scroll + alpha * (self.scroll - self.prev_scroll)
+
+    def row_colors(self):
+        """
+        Returns a dict of each row's fixed index to a tuple of its colors, None
+         for an empty spot
+        """
+        return {r.index: tuple(b.color for b in r.contents) for r in self.rows}
+
+    def snapshot(self):
+        """
+        Returns the grid as bytes: a GRID_HEADER, the RGB colors, then a byte
+         per spot of each row, bottom row first, for each of its color (1 + its
+         position in colors, 0 for no bubble), bullet flag and dirty flag
+        """
+        rows = self.rows.ordered()
+        code = {c: k+1 for k, c in enumerate(self.colors)}
+        code[None] = 0
+        spots = [b for r in rows for b in r.contents]
+        cells = bytes([code[b.color] for b in spots])
+        flags = bytes([b.bulletFlag for b in spots])
+        dirty = bytearray(len(cells))
+        for i, j in self.dirty:
+            dirty[i*BOARD_WIDTH + j] = 1
+        header = GRID_HEADER.pack(self.scroll, self.prev_scroll, self.velocity,
+                                  self.speed_rows, len(rows),
+                                  rows[0].index if rows else 0,
+                                  len(self.colors), self.check_loose)
+        return header + pack_colors(self.colors) + cells + flags + dirty
+
+    def restore(self, data):
+        """
+        Given bytes from snapshot() of this or any other grid class, replace
+         the grid's state with the one saved. Rows are reused, not rebuilt.
+        """
+        (self.scroll, self.prev_scroll, self.velocity, self.speed_rows, n,
+         bottom, num_colors, self.check_loose) = GRID_HEADER.unpack_from(data)
+        k = GRID_HEADER.size + 3*num_colors
+        self.colors = unpack_colors(data[GRID_HEADER.size:k])
+        spots = n * BOARD_WIDTH
+        cells = data[k:k+spots]
+        flags = data[k+spots:k+2*spots]
+        dirty = data[k+2*spots:k+3*spots]
+
+        palette = [None] + self.colors
+        self.rows.clear()
+        self.lowest = lowest = [None] * BOARD_WIDTH
+        for i in range(n):
+            row = self.rows.push_top(bottom + i)
+            s = i * BOARD_WIDTH
+            for b, c, f in zip(row.contents, cells[s:s+BOARD_WIDTH],
+                               flags[s:s+BOARD_WIDTH]):
+                if c:
+                    b.color = palette[c]
+                    if lowest[b.column] is None:
+                        lowest[b.column] = bottom + i
+                if f:
+                    b.bulletFlag = True
+        self.dirty = {divmod(p, BOARD_WIDTH) for p, d in enumerate(dirty) if d}
+
+    def nearest_row(self, y):
+        """
+        Returns the position in self.rows of the row nearest to y, which may be
+         outside range(len(self.rows)). Rows always hold consecutive indices, so
+         this comes straight from the scroll offset.
+        """
+        return round((self.scroll - y) / GRID_SPACING) - self.rows[0].index
+
+    def row_band(self, y, reach):
+        """
+        Returns the range of positions in self.rows of the rows whose y can be
+         within reach pix of y
+        """
+        if not self.rows:
+            return range(0)
+        return range(max(self.nearest_row(y + reach), 0),
+                     min(self.nearest_row(y - reach) + 1, len(self.rows)))
 
-    def addBottomRow(self):
+    def mark_all_dirty(self):
         """
-        Adds a new bottom row at bottom of screen in position 0 of self.rows
+        Flags every grid position for match detection by the next
+         erase_matches()
         """
-        nbr = Bubble_Row()
+        self.dirty = {(i,j) for i in range(len(self.rows))
+                            for j in range(BOARD_WIDTH)}
 
-        # base coordinates on current first row bullet
-        x = self.rows[0][0].x
-        y = (self.rows[0][0].y + BUBBLE_DIAMETER + BUBBLE_PADDING)
-
-        for j in range(BOARD_WIDTH):
-            # color of None adds blank place holders
-            nbr += Grid_Bubble(x,y,None,False)
-            x += BUBBLE_DIAMETER + BUBBLE_PADDING
+    def find_lowest(self, j):
+        """
+        Looks up the lowest row holding a bubble in column j for self.lowest
+        """
+        self.lowest[j] = next((row.index for row in self.rows if row[j].color),
+                              None)
 
-        self.rows.insert(0, nbr)
+    def addBottomRow(self):
+        """
+        Adds a new bottom row at bottom of screen in position 0 of self.rows
+        """
+        self.rows.push_bottom(self.rows[0].index - 1)
+        self.dirty = {(i+1,j) for i, j in self.dirty} # Row indices shifted up
 
     def addTopRow(self):
         """
-        Appends a new Bubble_Row to self.rows with no horizontal matches.
+        Adds a new top Bubble_Row to self.rows with no horizontal matches.
         Decrements self.speed_rows if > 0.
         """
         # Check if there's space at top of screen for new row.
-        if self.rows and self.rows[-1][0].y < BUBBLE_DIAMETER//2 \
-                                               + BUBBLE_PADDING:
+        if self.rows and self.rows[-1].y < BUBBLE_DIAMETER//2 \
+                                            + BUBBLE_PADDING:
             return
-        
-        # Distance between bubble centers
-        offset = BUBBLE_PADDING + BUBBLE_DIAMETER
-        
-        # Distance the new row from the one below it. 
+
+        # Place the new row one index above the one below it.
         if not self.rows:
-            y = -BUBBLE_DIAMETER // 2 # Barely off the screen if no row exists
+            index = 0
+            self.scroll = -BUBBLE_DIAMETER // 2 # Barely off the screen
+            self.prev_scroll = self.scroll
         else:
-            y = self.rows[-1][0].y - offset
-            
-        x = MARGINS + BUBBLE_DIAMETER // 2 # First column
-        nbr = Bubble_Row()
-        nbr += Grid_Bubble(x, y, choice(self.colors), False) # Add 1st bubble
-        x += offset # Move right to next spot
-        last_color = nbr[0].color # Track this to ensure no horizontal matches
-        consec = 1
-        cs = set(self.colors)
-        for j in range(BOARD_WIDTH-1):
-            if consec == MATCH_LENGTH-1: # Avoid horizontal match
-                c = choice(tuple(cs - set([last_color])))
-            else: 
-                c = choice(self.colors)            
-            nbr += Grid_Bubble(x, y, c, False)
-            x += offset
-            if c == last_color:
-                consec += 1
-            else:
-                last_color = c
-                consec = 1
+            index = self.rows[-1].index + 1
 
-        self.rows.append(nbr)
+        nbr = self.rows.push_top(index)
+        for b, c in zip(nbr, random_row_colors(self.colors, self.rng)):
+            b.color = c
+        self.lowest = [index if low is None else low for low in self.lowest]
+        i = len(self.rows)-1 # New colors may complete vertical matches
+        self.dirty.update((i,j) for j in range(BOARD_WIDTH))
 
         if self.speed_rows:
             self.speed_rows -= 1
 
     def bullet_collide(self, bullet):
         """
-        Function takes a Bullet object and returns true if the bullet colides 
+        Function takes a Bullet object and returns true if the bullet colides
          with any Bubble in the grid.
-        Returns true for collision and False otherwise. Uses is_close() and 
-         distance() to verify collision.
+        Returns true for collision and False otherwise. Only the 3x3 spots of
+         the lattice around the bullet can be within BUBBLE_DIAMETER of it, so
+         just those are checked with is_close() and distance().
         Calls findNearestSpot upon collision to find the nearest spot to place 
          the Bullet in the Bubble_Grid.
         Calls addGridBubble to add the Bullet to the grid.
         """
         x, y, c = bullet.x, bullet.y, bullet.color
+        if not self.rows:
+            return False
+
+        i0 = self.nearest_row(y)
+        j0 = nearest_column(x)
         close_bubble = None #(i,j,dist)
-        for i, row in enumerate(self.rows):
-            for j, b in enumerate(row):
+        for i in range(max(i0-1, 0), min(i0+2, len(self.rows))):
+            row = self.rows[i]
+            row_y = row.y
+            for j in range(max(j0-1, 0), min(j0+2, BOARD_WIDTH)):
+                b = row[j]
                 # Use is_close() to find potential matches (city block distance)
-                if b.color and is_close(x, y, b.x, b.y, BUBBLE_DIAMETER):
+                bx = COLUMN_X[j]
+                if b.color and is_close(x, y, bx, row_y, BUBBLE_DIAMETER):
                     # Use euclidian distance for precision
-                    d = distance(x, y, b.x, b.y)
+                    d = distance(x, y, bx, row_y)
                     if d < BUBBLE_DIAMETER:
                         # find the closest bubble if multiple in range
                         if close_bubble:
@@ -434,6 +889,45 @@ class Bubble_Grid(object):
 
         return False
 
+    def bullet_sweep(self, bullet):
+        """
+        Swept version of bullet_collide() for a Bullet that moved from
+         (prev_x, prev_y) to (x, y) since the last update. Finds the grid
+         bubble the bullet touched first along that path, so a long update
+         can't carry a bullet through the grid. The bullet is moved back to
+         the point of contact before being added to the grid.
+        Returns true for collision and False otherwise.
+        """
+        if not self.rows:
+            return False
+
+        x0, y0, x1, y1 = bullet.prev_x, bullet.prev_y, bullet.x, bullet.y
+        rows = self.rows
+        ia, ib = sorted((self.nearest_row(y0), self.nearest_row(y1)))
+        ja, jb = sorted((nearest_column(x0), nearest_column(x1)))
+        contact = None #(t,i,j)
+        for i in range(max(ia-1, 0), min(ib+2, len(rows))):
+            row = rows[i]
+            row_y = row.y
+            for j in range(max(ja-1, 0), min(jb+2, BOARD_WIDTH)):
+                b = row[j]
+                if b.color:
+                    t = first_contact(x0, y0, x1, y1, COLUMN_X[j], row_y,
+                                      BUBBLE_DIAMETER)
+                    if t is not None and (not contact or t < contact[0]):
+                        contact = (t,i,j)
+
+        if not contact:
+            return False
+
+        t, i, j = contact
+        bullet.x, bullet.y = x0 + t*(x1-x0), y0 + t*(y1-y0)
+        if not t: # Overlapping from the start, use the nearest bubble
+            return self.bullet_collide(bullet)
+        n = self.findNearestSpot(bullet.x, bullet.y, i, j)
+        self.addGridBubble(*n, bullet.color)
+        return True
+
     def findNearestSpot(self, x, y, i, j):
         """
         Given x, y position and Grid_Bubble location i, j, return the available
@@ -447,27 +941,27 @@ class Bubble_Grid(object):
 
         if i+1 in row_range and not self.rows[i+1][j].color: #up
             x1 = self.rows[i][j].x
-            y1 = self.rows[i+1][j].y
+            y1 = self.rows[i+1].y
             n_list.append((distance(x, y, x1, y1), (i+1,j), False))
 
         if j+1 in col_range and not self.rows[i][j+1].color: #right
             x1 = self.rows[i][j+1].x
-            y1 = self.rows[i][j].y
+            y1 = self.rows[i].y
             n_list.append((distance(x, y, x1, y1), (i,j+1), False))
 
         if j-1 in col_range and not self.rows[i][j-1].color: #left
             x1 = self.rows[i][j-1].x
-            y1 = self.rows[i][j].y
+            y1 = self.rows[i].y
             n_list.append((distance(x, y, x1, y1), (i,j-1), False))
 
         if i == 0: #new bottom row
             x1 = self.rows[0][j].x
-            y1 = (self.rows[0][j].y + BUBBLE_DIAMETER + BUBBLE_PADDING)
+            y1 = self.rows[0].y + GRID_SPACING
             n_list.append((distance(x, y, x1, y1), (0, j), True))
 
         elif i-1 in row_range and not self.rows[i-1][j].color: # down
             x1 = self.rows[i][j].x
-            y1 = self.rows[i-1][j].y
+            y1 = self.rows[i-1].y
             n_list.append((distance(x, y, x1, y1), (i-1,j), False))
 
         nearest = min(n_list) # min distance is closest
@@ -487,46 +981,65 @@ class Bubble_Grid(object):
         self.rows[i][j].color = c
         # Player added this bubble so can score points
         self.rows[i][j].bulletFlag = True
+        self.dirty.add((i,j))
+        index = self.rows[i].index
+        if self.lowest[j] is None or index < self.lowest[j]:
+            self.lowest[j] = index
 
     def drop_loose_bubbles(self):
         """
-        From every Bubble in the top row, attempt to reach every grid bubble, 
-         storing all reachable bubbles in the keep list. Any grid bubbles not
-         on the keep list are removed from the grid and returned in a list of 
+        From every Bubble in the top row, attempt to reach every grid bubble,
+         marking all reachable bubbles in the visited bitmap. Any grid bubbles
+         not visited are removed from the grid and returned in a list of
          Droppers.
+        Bubbles are only added beside bubbles already held by the grid, so
+         the search is skipped unless bubbles were removed since the last call.
         """
-        num_rows = len(self)
-        col_range = range(BOARD_WIDTH)
-        keep = [] #Bubbles connected to top row [(i,j), ...]
-        for j in col_range:
-            i = num_rows-1 # loop through top row of bubbles
-            if not self.rows[i][j].color: # No color == No bubble
-                continue
-
-            path = [(i,j)] #stack to track path to every bubble reachable
-            while path:
-                check = path.pop()
-                if check in keep: #No need to visit a bubble twice
-                    continue
-                keep.append(check) # Bubble is reachable
-                i,j = check # Try all four neighbors
-                if i-1 >= 0 and self.rows[i-1][j].color: #South
-                    path.append((i-1,j))
-                if i+1 < num_rows and self.rows[i+1][j].color: #North
-                    path.append((i+1,j))
-                if j-1 in col_range and self.rows[i][j-1].color: #West
-                    path.append((i,j-1))
-                if j+1 in col_range and self.rows[i][j+1].color: #East
-                    path.append((i,j+1))
-
         newDroppers = Dropper_List()
-        for i in range(num_rows-1): # loop through all Bubble_Row except top row
-            for j in col_range:   
-                gb = self.rows[i][j]
-                if gb.color and (i,j) not in keep:  #drop bubbles not in keep 
-                    newDroppers += Dropper(gb.x, gb.y, gb.color, self.velocity
-                                           , j)
-                    self.rows[i][j].color = None
+        if not self.check_loose:
+            return newDroppers
+        self.check_loose = False
+
+        num_rows = len(self)
+        if not num_rows:
+            return newDroppers
+        rows = self.rows.ordered()
+        visited = bytearray(num_rows * BOARD_WIDTH) # 1 at i*BOARD_WIDTH + j
+        top = num_rows-1
+        path = [] #stack to track path to every bubble reachable
+        for j in range(BOARD_WIDTH): # loop through top row of bubbles
+            if rows[top][j].color: # No color == No bubble
+                visited[top*BOARD_WIDTH + j] = 1
+                path.append((top,j))
+
+        while path:
+            i,j = path.pop() # Try all four neighbors not yet visited
+            k = i*BOARD_WIDTH + j
+            if i-1 >= 0 and not visited[k-BOARD_WIDTH] \
+                        and rows[i-1][j].color: #South
+                visited[k-BOARD_WIDTH] = 1
+                path.append((i-1,j))
+            if i+1 < num_rows and not visited[k+BOARD_WIDTH] \
+                              and rows[i+1][j].color: #North
+                visited[k+BOARD_WIDTH] = 1
+                path.append((i+1,j))
+            if j-1 >= 0 and not visited[k-1] and rows[i][j-1].color: #West
+                visited[k-1] = 1
+                path.append((i,j-1))
+            if j+1 < BOARD_WIDTH and not visited[k+1] \
+                                 and rows[i][j+1].color: #East
+                visited[k+1] = 1
+                path.append((i,j+1))
+
+        for i in range(top): # loop through all Bubble_Row except top row
+            row_y = rows[i].y
+            for j, gb in enumerate(rows[i]):
+                if gb.color and not visited[i*BOARD_WIDTH + j]: # unreachable
+                    newDroppers += Dropper(COLUMN_X[j], row_y, gb.color,
+                                           self.velocity, j)
+                    gb.color = None
+                    if rows[i].index == self.lowest[j]:
+                        self.find_lowest(j)
 
         return newDroppers
 
@@ -537,9 +1050,10 @@ class Bubble_Grid(object):
          containing grid positions of matches: [(i,j), ...]
         """
         if not self.rows:
-            return
+            return []
 
-        row_range = range(len(self.rows))
+        rows = self.rows.ordered()
+        row_range = range(len(rows))
 
         matches = [] # [(i,j), ...]
         
@@ -547,7 +1061,7 @@ class Bubble_Grid(object):
             curr_color = None
             count = 0
             for j in range(BOARD_WIDTH):
-                tbc = self.rows[i][j].color
+                tbc = rows[i][j].color
                 if not tbc:
                     curr_color = None
                     count = 0
@@ -566,7 +1080,7 @@ class Bubble_Grid(object):
             curr_color = None
             count = 0
             for i in row_range:
-                tbc = self.rows[i][j].color
+                tbc = rows[i][j].color
                 if not tbc:
                     curr_color = None
                     count = 0
@@ -583,55 +1097,122 @@ class Bubble_Grid(object):
 
         return matches
 
+    def get_dirty_matches(self):
+        """
+        Like get_matches() but only checks the runs of color through each
+         position in self.dirty. Any new match must contain a newly colored
+         bubble, so these are the only places a match can appear, and the
+         matches and their order are the same as get_matches(). When many
+         spots are dirty get_matches() is faster, and is used instead.
+         Return a list of tuples containing grid positions of matches:
+         [(i,j), ...]
+        """
+        rows = self.rows.ordered()
+        num_rows = len(rows)
+        if len(self.dirty) * DENSE_DIRTY >= num_rows * BOARD_WIDTH:
+            return self.get_matches()
+
+        across = set() # Horizontal matches (i,j)
+        down = set()   # Vertical matches (j,i), to sort by column
+        for i, j in self.dirty:
+            if i >= num_rows:
+                continue
+            row = rows[i]
+            color = row[j].color
+            if not color:
+                continue
+
+            # Horizontal Check, the run was walked from a dirty spot before it
+            if not ((i,j-1) in self.dirty and row[j-1].color == color):
+                start = j
+                while start and row[start-1].color == color:
+                    start -= 1
+                end = j + 1
+                while end < BOARD_WIDTH and row[end].color == color:
+                    end += 1
+                if end - start >= MATCH_LENGTH:
+                    across.add((i, start + MATCH_LENGTH-1))
+
+            # Vertical Check
+            if not ((i-1,j) in self.dirty and rows[i-1][j].color == color):
+                start = i
+                while start and rows[start-1][j].color == color:
+                    start -= 1
+                end = i + 1
+                while end < num_rows and rows[end][j].color == color:
+                    end += 1
+                if end - start >= MATCH_LENGTH:
+                    down.add((j, start + MATCH_LENGTH-1))
+
+        return sorted(across) + [(i,j) for j, i in sorted(down)]
+
     def prune_bottom_row(self):
         """
         Removes the bottom (1st) Bubble_Row if it's off the bottom of screen
         """
-        if self.rows and self.rows[0][0].y > HEIGHT + BUBBLE_DIAMETER//2:
-            del self.rows[0] # fell off screen
+        if self.rows and self.rows[0].y > HEIGHT + BUBBLE_DIAMETER//2:
+            index = self.rows[0].index
+            self.rows.pop_bottom() # fell off screen
+            self.check_loose = True
+            # Row indices shift down
+            self.dirty = {(i-1,j) for i, j in self.dirty if i}
+            for j in range(BOARD_WIDTH):
+                if self.lowest[j] == index:
+                    self.find_lowest(j)
 
     def collide(self, x, y, radius):
         """
         Given an x, y location and radius of a circular object, return True if
          any Bubble in the grid collides with the object and False otherwise.
+        Only the bubbles in the band of rows and columns within the strike
+         zone of the object are tested.
         """
         strike_zone = BUBBLE_DIAMETER//2 + radius
-        for row in self.rows:
-            for b in row:
-                if b.color and is_close(b.x, b.y, x, y, strike_zone):
-                    d = distance(b.x, b.y, x, y)
+        columns = column_band(x, strike_zone)
+        for i in self.row_band(y, strike_zone):
+            row = self.rows[i]
+            row_y = row.y
+            for j in columns:
+                bx = COLUMN_X[j]
+                if row[j].color and is_close(bx, row_y, x, y, strike_zone):
+                    d = distance(bx, row_y, x, y)
                     if d <= strike_zone:
                         return True
         return False
 
     def move(self, time_delta):
         """
-        Given the time in ms since last update, move each bubble down at self
+        Given the time in ms since last update, scroll the grid down at self
          .velocity pix/ms. If self.speed_rows > 0, bubbles fall 16 times faster.
         """
         delta_y = self.velocity * time_delta
         if self.speed_rows:
             delta_y *= 16
-        for row in self.rows:
-            for b in row:
-                b.y += delta_y
+        self.prev_scroll = self.scroll
+        self.scroll += delta_y
 
     def erase_matches(self):
         """
-        Get a list of i,j position matches from get_matches(). Erase all 
+        Get a list of i,j position matches from get_dirty_matches(). Erase all
          consecutive bubbles of the same color begining at each match position.
         Store a tuple in combos list for each combo scored. A combo must contain 
          at least one player bullet to score points. The combos list is returned
          to update player's score.
         """
         combos = [] #[((x,y),pts), ...]
-        for match in self.get_matches():
+        if not self.dirty: # Nothing colored since the last call
+            return combos
+        matches = self.get_dirty_matches()
+        self.dirty.clear()
+        rows = self.rows.ordered()
+        row_range = range(len(rows))
+        for match in matches:
             bulletFound = None
             combo_bubbles = 0
             path = [match] #Stack to walk matches
             while path:
                 r, c = path.pop()
-                b = self.rows[r][c]
+                b = rows[r][c]
                 color = b.color
                 if not color:
                     continue
@@ -640,12 +1221,15 @@ class Bubble_Grid(object):
                 else:
                     combo_bubbles += 1
                 b.color = None
+                self.check_loose = True
+                if rows[r].index == self.lowest[c]:
+                    self.find_lowest(c)
                 n = ((r+1,c), (r-1,c), (r, c+1), (r, c-1))
                 for nei in n: # Try 4 cardinal neighbors
                     i, j = nei
-                    if (i in range(len(self.rows))               # valid row
+                    if (i in row_range                           # valid row
                             and j in range(BOARD_WIDTH)          # valid column
-                            and self.rows[i][j].color == color): # color match
+                            and rows[i][j].color == color):      # color match
                         path.append((i, j))
 
             if bulletFound: # Only award points if player created this combo
@@ -657,12 +1241,23 @@ class Bubble_Grid(object):
         """
         Given a Dropper, check falling column for landing back on the grid.
         Return True if Dropper lands and False otherwise.
+        Droppers land on the lowest bubble in their column within a row
+         spacing, taking the spot above it. Nothing can be above the top row,
+         so droppers keep falling past it.
         """
         y, c, j = fb.y, fb.color, fb.column
         d = BUBBLE_DIAMETER + BUBBLE_PADDING
-        for i, row in enumerate(self.rows):
-            b = row[j] # only check in the faller's column
-            if b.color and abs(b.y - y) <= d:
-                self.rows[i+1][j].color = c
+        low = self.lowest[j]
+        # Out of reach below the column's lowest bubble, as most droppers are
+        if low is None or y - (self.scroll - low * GRID_SPACING) > d:
+            return False
+
+        rows = self.rows
+        i0 = self.nearest_row(y) # d is one row spacing, only 3 rows can reach
+        for i in range(max(i0-1, low - rows[0].index), min(i0+2, len(rows)-1)):
+            row = rows[i]
+            if row[j].color and abs(row.y - y) <= d:
+                rows[i+1][j].color = c
+                self.dirty.add((i+1,j))
                 return True
         return False
\ No newline at end of file
@@ -26,6 +26,18 @@ HULL_RADIUS = 32      # in pix
 HIT_GROW = 8          # ship growth when struck by a falling bubble (pix)
 #Main Game
 BOARD_HEIGHT = 20 #Height of screen in Bubbles
+GRID_ROWS = BOARD_HEIGHT + MATCH_LENGTH # Rows preallocated by bubble grids
+NEW_LEVEL_POINTS = 500 # Points required to leave the first level
+LEVEL_SPEED_UP = 1.1   # Grid velocity multiplier at each level up
+NEW_COLOR_SLOW_DOWN = .8 # Grid velocity multiplier at levels adding a color
+LEVEL_MSG_DURATION = 8 # Seconds to display the new level message
+SIM_TICK = 10          # ms of game time simulated per fixed step
+MAX_CATCH_UP = 5       # Most fixed steps run for one rendered frame
+REPLAY_FILE = 'last_game.json' # Input log of the last game played
+SAVE_FILE = 'saved_game.rls'   # Game saved with F5 and loaded with F9
+PROFILE = False                # Time update and draw stages, F3 shows them
+TELEMETRY_FILE = 'telemetry.csv' # Stage timings written while profiling
+DIRTY_RECTS = False            # Repaint only the parts of the screen that changed
 # Total Width of the screen based on bubbles
 WIDTH = (BUBBLE_DIAMETER*BOARD_WIDTH+BUBBLE_PADDING*(BOARD_WIDTH-1)+MARGINS*2)
 # Total Height of the screen based on bubbles
@@ -50,6 +62,7 @@ INSTRUCTIONS = """Controls
 - Right click to speed out the next row
 - p to pause game
 - r to restart game
+- F5 to save game, F9 to load it
 
 Gameplay
 - Fire bubbles to make rows and columns of
@@ -1,6 +1,7 @@
 """
 This package provides city block and euclidian distance functions. Use
- is_close() for speed and distance() for precision.
+ is_close() for speed and distance() for precision. first_contact() sweeps a
+ moving point against a fixed one.
 """
 
 def distance(x1, y1, x2, y2):
@@ -18,4 +19,27 @@ def is_close(x1, y1, x2, y2, d):
 
     if abs(y1-y2) <= d and abs(x1-x2) <= d:
         return True
-    return False
\ No newline at end of file
+    return False
+
+def first_contact(x1, y1, x2, y2, x, y, d):
+    """
+    Function finds where a point moving in a straight line from (x1, y1) to
+     (x2, y2) first comes within distance d of point (x, y). Returns the
+     fraction of the path traveled at that moment, 0 if the path starts within
+     d, or None if the path never comes within d.
+    """
+
+    fx, fy = x1 - x, y1 - y
+    c = fx*fx + fy*fy - d*d
+    if c < 0: # Already within d at the start
+        return 0
+    vx, vy = x2 - x1, y2 - y1
+    a = vx*vx + vy*vy
+    b = 2 * (fx*vx + fy*vy)
+    disc = b*b - 4*a*c
+    if not a or disc < 0: # Standing still or passing wide
+        return None
+    t = (-b - disc**.5) / (2*a)
+    if 0 <= t <= 1:
+        return t
+    return None
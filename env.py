@@ -0,0 +1,427 @@
+"""
+Module contains the RingLeaderEnv and VectorEnv classes, a gym style
+ reset() / step(action) interface to headless GameSessions for training bots,
+ with no pgzero window in the way. A VectorEnv steps many games in lockstep,
+ in this process or sharded across worker processes which write straight
+ into shared memory, optionally exporting each game's full state into a
+ shared_state.SharedState too.
+Observations are dicts of fixed size NumPy arrays (see OBSERVATION):
+- grid: palette index of every spot of the lowest OBS_ROWS grid rows, bottom
+        row first, -1 for no bubble. The palette is the game's level_colors.
+- grid_y: y position in pix of the bottom grid row
+- bullets: x, y, angle and palette index of up to MAX_BULLETS bullets
+- droppers: x, y and palette index of up to MAX_DROPPERS droppers
+- ship: x, y, velx, vely, current_radius and final_radius of the ship
+- bullet_index: the ship's Ship.bullet_index
+Unused bullet and dropper rows are zero with a palette index of -1.
+Actions are (keys, shot, cycle, rush) sequences of ints:
+- keys: mask of the held thrusters, bits as in input_log.KEY_BITS
+- shot: 0 holds fire, k fires on the k-th of ANGLES directions spread evenly
+        from right (0 radians) over the top to left (pi radians)
+- cycle, rush: 1 cycles the bullet color / rushes a row, 0 doesn't
+The reward of a step is the change in score.
+Requires the numpy package.
+"""
+
+import multiprocessing
+from math import pi
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from session import GameSession, Controls
+from bubble import Bubble_Grid, GRID_SPACING
+from input_log import InputLog
+from shared_state import SharedState, pack_layout, pack_views, MAX_BULLETS, \
+                         MAX_DROPPERS
+from config import BOARD_HEIGHT, BOARD_WIDTH, SIM_TICK
+
+OBS_ROWS = BOARD_HEIGHT + 2 # Grid rows observed, enough to cover the screen
+ANGLES = 33        # Firing directions over the upper half circle
+TICKS = 4          # Steps of SIM_TICK ms the game runs per action
+MAX_STEPS = 30000  # Actions per episode before it is truncated
+
+# Observation key: (shape, dtype)
+OBSERVATION = {'grid': ((OBS_ROWS, BOARD_WIDTH), np.int8),
+               'grid_y': ((), np.float32),
+               'bullets': ((MAX_BULLETS, 4), np.float32),
+               'droppers': ((MAX_DROPPERS, 3), np.float32),
+               'ship': ((6,), np.float32),
+               'bullet_index': ((), np.int8)}
+ACTION_SIZE = 4    # keys, shot, cycle, rush
+
+def empty_observation(batch=None):
+    """
+    Returns a dict of zeroed observation arrays, with a leading batch axis of
+     the given size if any
+    """
+    lead = () if batch is None else (batch,)
+    return {k: np.zeros(lead + shape, dtype)
+            for k, (shape, dtype) in OBSERVATION.items()}
+
+def observe(game, obs):
+    """
+    Given a GameSession and a dict of observation arrays, write the game's
+     current observation into the arrays in place
+    """
+    palette = {c: k for k, c in enumerate(game.level_colors)}
+    grid = game.bubble_grid
+    rows = sorted(grid.row_colors().items())[:OBS_ROWS]
+    cells = obs['grid']
+    cells[...] = -1
+    for i, (index, colors) in enumerate(rows):
+        cells[i] = [palette.get(c, -1) for c in colors]
+    obs['grid_y'][...] = grid.scroll - rows[0][0]*GRID_SPACING if rows else 0
+
+    bullets = obs['bullets']
+    bullets[...] = 0
+    bullets[:, 3] = -1
+    for k, b in zip(range(MAX_BULLETS), game.bullets):
+        bullets[k] = b.x, b.y, b.angle, palette.get(b.color, -1)
+
+    droppers = obs['droppers']
+    droppers[...] = 0
+    droppers[:, 2] = -1
+    for k, d in zip(range(MAX_DROPPERS), game.droppers):
+        droppers[k] = d.x, d.y, palette.get(d.color, -1)
+
+    s = game.ship
+    obs['ship'][:] = (s.x, s.y, s.velx, s.vely, s.current_radius,
+                      s.final_radius)
+    obs['bullet_index'][...] = s.bullet_index
+
+def controls(action):
+    """
+    Given an action, return the Controls for its first step
+    """
+    keys, shot, cycle, rush = (int(a) for a in action)
+    c = Controls(**InputLog.held(keys), cycles=cycle, rushes=rush)
+    if shot:
+        c.shots.append(pi * (shot - 1) / (ANGLES - 1))
+    return c
+
+class RingLeaderEnv(object):
+    """
+    Represents one headless game as a reinforcement learning environment.
+    game: the GameSession being played
+    grid_type: class used for the game's bubble grid
+    ticks: SIM_TICK ms steps run per action, the action's thrusters are held
+           for all of them and its other actions happen before the first
+    max_steps: actions per episode before it is truncated
+    steps: actions taken this episode
+    obs: dict of the observation arrays step() and reset() write into
+    """
+
+    def __init__(self, grid_type=Bubble_Grid, ticks=TICKS, max_steps=MAX_STEPS,
+                 obs=None):
+        """
+        Initialize with no game, reset() starts one. obs is a dict of arrays
+         to write observations into, fresh ones are made if not given.
+        """
+        self.grid_type = grid_type
+        self.ticks = ticks
+        self.max_steps = max_steps
+        self.game = None
+        self.steps = 0
+        self.obs = obs if obs is not None else empty_observation()
+
+    def __str__(self):
+        """
+        Return a formatted string for printing
+        """
+        atts = ['\t' + a + ': ' + str(v) for a,v in self.__dict__.items()
+                if a != 'obs']
+        return type(self).__name__ + ' object:\n' + '\n'.join(atts)
+
+    def info(self):
+        """
+        Returns a dict of the game's seed, score and level
+        """
+        g = self.game
+        return {'seed': g.seed, 'score': g.score.score, 'level': g.level}
+
+    def reset(self, seed=None):
+        """
+        Start a new game from seed, or a random seed. Returns the observation
+         and info dict.
+        """
+        self.game = GameSession(self.grid_type, swept=True, seed=seed)
+        self.steps = 0
+        observe(self.game, self.obs)
+        return self.obs, self.info()
+
+    def step(self, action):
+        """
+        Given an action, play it for self.ticks steps. Returns the
+         observation, reward, terminated (game over), truncated (out of
+         steps) and info dict.
+        """
+        game = self.game
+        before = game.score.score
+        c = controls(action)
+        game.step(SIM_TICK, c)
+        held = Controls(c.up, c.down, c.left, c.right)
+        for _ in range(self.ticks - 1):
+            if not game.game_state:
+                break
+            game.step(SIM_TICK, held)
+        self.steps += 1
+
+        observe(game, self.obs)
+        terminated = not game.game_state
+        truncated = not terminated and self.steps >= self.max_steps
+        return (self.obs, game.score.score - before, terminated, truncated,
+                self.info())
+
+# Batch array key: (shape per game, dtype). Observations, then the actions in
+# and the step results out, so worker processes share everything in one block
+BATCH = dict(OBSERVATION, action=((ACTION_SIZE,), np.int32),
+             reward=((), np.int64), terminated=((), bool),
+             truncated=((), bool), seed=((), np.int64), score=((), np.int64),
+             level=((), np.int32))
+
+def batch_layout(num_envs):
+    """
+    Returns a list of (key, shape, dtype, byte offset) of the BATCH arrays
+     for num_envs games packed in one buffer, and the buffer's size in bytes
+    """
+    return pack_layout(BATCH, num_envs)
+
+def batch_arrays(buf, num_envs):
+    """
+    Returns a dict of the BATCH arrays for num_envs games as NumPy views of
+     the buffer buf
+    """
+    return pack_views(buf, BATCH, num_envs)
+
+class EnvShard(object):
+    """
+    Represents the games lo to hi of a VectorEnv, each writing its results
+     into its own row of the batch arrays. Episode e of game k is played from
+     seed + k + e*num_envs, so sharding never changes the games played.
+    envs: list of RingLeaderEnv, one per game in the shard
+    arrays: dict of the BATCH arrays of the whole VectorEnv
+    state: SharedState each game's full state is exported into, or None
+    episodes: list of the episode number of each game
+    """
+
+    def __init__(self, arrays, lo, hi, seed, grid_type, ticks, max_steps,
+                 state=None):
+        """
+        Initialize a RingLeaderEnv writing observations into row k of the
+         batch arrays for each game k from lo to hi
+        """
+        self.arrays = arrays
+        self.state = state
+        self.lo, self.hi = lo, hi
+        self.seed = seed
+        self.num_envs = len(arrays['reward'])
+        self.envs = [RingLeaderEnv(grid_type, ticks, max_steps,
+                                   {key: arrays[key][k, ...] # Views of row k
+                                    for key in OBSERVATION})
+                     for k in range(lo, hi)]
+        self.episodes = [0] * (hi - lo)
+
+    def start(self, n):
+        """
+        Start the next episode of the shard's game n
+        """
+        k = self.lo + n
+        self.envs[n].reset(self.seed + k + self.episodes[n] * self.num_envs)
+        self.episodes[n] += 1
+
+    def record(self, k, env):
+        """
+        Write the seed, score and level of env into row k of the batch arrays
+        """
+        a, game = self.arrays, env.game
+        a['seed'][k] = game.seed
+        a['score'][k] = game.score.score
+        a['level'][k] = game.level
+
+    def export(self, k, env):
+        """
+        Export the full state of env's game as game k of the shared state, if
+         there is one
+        """
+        if self.state is not None:
+            self.state.export(k, env.game)
+
+    def reset(self):
+        """
+        Start a new episode of every game in the shard
+        """
+        for n, env in enumerate(self.envs):
+            self.start(n)
+            self.record(self.lo + n, env)
+            self.export(self.lo + n, env)
+
+    def step(self):
+        """
+        Play each game's row of the action array. A finished game's row keeps
+         its final reward, flags, seed, score and level, while its
+         observation and shared state are already those of the next episode.
+        """
+        a = self.arrays
+        for n, env in enumerate(self.envs):
+            k = self.lo + n
+            _, reward, terminated, truncated, _ = env.step(a['action'][k])
+            a['reward'][k] = reward
+            a['terminated'][k] = terminated
+            a['truncated'][k] = truncated
+            self.record(k, env)
+            if terminated or truncated:
+                self.start(n)
+            self.export(k, env)
+
+def shard_worker(conn, name, num_envs, lo, hi, seed, grid_type, ticks,
+                 max_steps, state_name=None):
+    """
+    Worker process loop of a sharded VectorEnv. Attaches to the shared memory
+     block name, and the SharedState block state_name if given, then runs
+     'reset' and 'step' commands from conn on games lo to hi, answering each
+     when done, until 'close'.
+    """
+    shm = shared_memory.SharedMemory(name=name)
+    state = SharedState(num_envs, state_name) if state_name else None
+    try:
+        shard = EnvShard(batch_arrays(shm.buf, num_envs), lo, hi, seed,
+                         grid_type, ticks, max_steps, state)
+        while True:
+            command = conn.recv()
+            if command == 'close':
+                break
+            getattr(shard, command)()
+            conn.send(command)
+        del shard # Release the views before closing the block
+    finally:
+        shm.close()
+        if state:
+            state.close()
+
+class VectorEnv(object):
+    """
+    Represents num_envs games stepped in lockstep. Observations and results
+     are batch arrays with a leading axis of games, written in place by every
+     step, so copy anything kept across steps. Finished games start their
+     next episode automatically.
+    With processes, the games are split into that many shards, each played by
+     a worker process writing into a shared memory block the arrays are views
+     of, so nothing is pickled per step.
+    With state, every game's full state is also exported after each step into
+     a SharedState, for learners that need more than the observations.
+    num_envs: int number of games
+    arrays: dict of the BATCH arrays
+    obs: dict of the observation arrays among them
+    state: SharedState of every game, or None
+    shards: EnvShard of all games when played in this process, else None
+    workers: list of (process, connection) of the worker processes
+    """
+
+    def __init__(self, num_envs, grid_type=Bubble_Grid, seed=0, processes=0,
+                 ticks=TICKS, max_steps=MAX_STEPS, state=False):
+        """
+        Set up num_envs games seeded from seed, played here or by processes
+         worker processes. state exports the games into a SharedState.
+        """
+        self.num_envs = num_envs
+        self.shm = None
+        self.shard = None
+        self.workers = []
+        self.state = SharedState(num_envs) if state else None
+        state_name = self.state.name if state else None
+        _, size = batch_layout(num_envs)
+        if processes:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.arrays = batch_arrays(self.shm.buf, num_envs)
+            context = multiprocessing.get_context('spawn')
+            bounds = np.linspace(0, num_envs, processes + 1).astype(int)
+            for lo, hi in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+                here, there = context.Pipe()
+                p = context.Process(target=shard_worker, daemon=True,
+                                    args=(there, self.shm.name, num_envs, lo,
+                                          hi, seed, grid_type, ticks,
+                                          max_steps, state_name))
+                p.start()
+                self.workers.append((p, here))
+        else:
+            self.arrays = batch_arrays(bytearray(size), num_envs)
+            self.shard = EnvShard(self.arrays, 0, num_envs, seed, grid_type,
+                                  ticks, max_steps, self.state)
+        self.obs = {key: self.arrays[key] for key in OBSERVATION}
+
+    def __str__(self):
+        """
+        Return a formatted string for printing
+        """
+        where = f'{len(self.workers)} processes' if self.workers else 'local'
+        return f'{type(self).__name__}: {self.num_envs} games, {where}'
+
+    def __len__(self):
+        return self.num_envs
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def run(self, command):
+        """
+        Run a shard command on every game and wait for all of them
+        """
+        if self.shard is not None:
+            getattr(self.shard, command)()
+            return
+        for _, conn in self.workers:
+            conn.send(command)
+        for _, conn in self.workers:
+            conn.recv()
+
+    def info(self):
+        """
+        Returns a dict of the seed, score and level arrays
+        """
+        a = self.arrays
+        return {'seed': a['seed'], 'score': a['score'], 'level': a['level']}
+
+    def reset(self):
+        """
+        Start every game over. Returns the observations and info.
+        """
+        self.run('reset')
+        return self.obs, self.info()
+
+    def step(self, actions):
+        """
+        Given a (num_envs, ACTION_SIZE) array of actions, play one step of
+         every game. Returns the observations, reward, terminated, truncated
+         and info arrays. For a finished game the observation is the first of
+         its next episode while the rest describe the one that ended.
+        """
+        a = self.arrays
+        a['action'][:] = actions
+        self.run('step')
+        return (self.obs, a['reward'], a['terminated'], a['truncated'],
+                self.info())
+
+    def close(self):
+        """
+        Stop the worker processes and free the shared memory
+        """
+        for p, conn in self.workers:
+            conn.send('close')
+            p.join()
+        self.workers = []
+        self.shard = None
+        if self.state:
+            self.state.close()
+            self.state = None
+        if self.shm:
+            self.arrays = self.obs = None
+            try:
+                self.shm.close()
+            except BufferError: # Views still held elsewhere keep it mapped
+                pass
+            self.shm.unlink()
+            self.shm = None
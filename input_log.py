@@ -0,0 +1,122 @@
+"""
+Module contains the InputLog class, a compact record of everything the player
+ did in one game. Together with the game's random seed it is enough to replay
+ the game exactly with GameSession.replay(), headlessly and as fast as the CPU
+ allows.
+"""
+
+import json
+
+LOG_VERSION = 1 # Bump when the file layout changes
+
+# Bit of each held thruster in a step's keys mask
+KEY_BITS = (('up', 1), ('down', 2), ('left', 4), ('right', 8))
+
+class InputLog(object):
+    """
+    Represents the player's input for one game.
+    seed: int seed of the game's random number generator
+    swept: bool, the game used swept bullet collisions
+    steps: list of [delta, keys, repeat, events] entries, one per run of
+           identical steps. delta is the step's ms, keys a mask of the held
+           thrusters (KEY_BITS), repeat the number of steps in the run and
+           events the actions taken before the first of them.
+    pending: list of events since the last step
+    Events are [code] or [code, angle] lists: 'f' fire on angle in radians,
+     'c' cycle color, 'r' rush a row, 'p' toggle pause, 'i' toggle
+     instructions.
+    """
+
+    def __init__(self, seed, swept=False):
+        """
+        Initialize an empty log for a game started with seed
+        """
+        self.seed = seed
+        self.swept = swept
+        self.steps = []
+        self.pending = []
+
+    def __str__(self):
+        """
+        Return a formatted string for printing
+        """
+        atts = ['\t' + a + ': ' + str(v) for a,v in self.__dict__.items()]
+        return type(self).__name__ + ' object:\n' + '\n'.join(atts)
+
+    def __len__(self):
+        """
+        Returns the number of steps logged
+        """
+        return sum(s[2] for s in self.steps)
+
+    def __eq__(self, other):
+        return isinstance(other, InputLog) and self.to_dict() == other.to_dict()
+
+    def event(self, code, angle=None):
+        """
+        Record an action taken before the next step
+        """
+        if angle is None:
+            self.pending.append([code])
+        else:
+            self.pending.append([code, angle])
+
+    def step(self, delta, controls):
+        """
+        Given a step's ms and Controls, record the step along with the actions
+         taken since the last one. A step matching the last one with no new
+         actions only increases its repeat count.
+        """
+        keys = 0
+        for name, bit in KEY_BITS:
+            if getattr(controls, name):
+                keys |= bit
+
+        last = self.steps[-1] if self.steps else None
+        if last and not self.pending and last[0] == delta and last[1] == keys:
+            last[2] += 1
+        else:
+            self.steps.append([delta, keys, 1, self.pending])
+            self.pending = []
+
+    @staticmethod
+    def held(keys):
+        """
+        Given a keys mask, return a dict of the held thrusters for Controls
+        """
+        return {name: bool(keys & bit) for name, bit in KEY_BITS}
+
+    def to_dict(self):
+        """
+        Returns the log as a dict of plain JSON types
+        """
+        return {'version': LOG_VERSION, 'seed': self.seed, 'swept': self.swept,
+                'steps': self.steps, 'pending': self.pending}
+
+    @classmethod
+    def from_dict(cls, d):
+        """
+        Given a dict from to_dict(), return the InputLog it holds
+        """
+        if d.get('version') != LOG_VERSION:
+            raise ValueError(f"Unsupported input log version {d.get('version')}")
+        log = cls(d['seed'], d['swept'])
+        log.steps = d['steps']
+        log.pending = d['pending']
+        return log
+
+    def save(self, path):
+        """
+        Write the log to a JSON file. Floats are written with repr, so angles
+         read back bit for bit.
+        """
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, separators=(',', ':'))
+
+    @classmethod
+    def load(cls, path):
+        """
+        Read an InputLog from a file written by save()
+        """
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
@@ -0,0 +1,154 @@
+"""
+Module contains the Profiler class, an opt in instrumentation layer timing
+ each stage of the update sequence and each draw call. Keeps a rolling window
+ of samples per stage, draws an on screen overlay and periodically appends
+ telemetry to a CSV or JSON lines file for offline analysis.
+"""
+
+import json
+import os
+from collections import deque
+from time import perf_counter, time
+
+# Upper edges in ms of the histogram buckets, the last bucket is unbounded
+BUCKETS = (.05, .1, .25, .5, 1, 2, 4, 8, 16, 33)
+WINDOW = 300     # Samples kept per stage, about 5 seconds at 60 fps
+PERIOD = 5       # Seconds between telemetry writes
+OVERLAY_COLOR = (255, 255, 255)
+BAR_COLOR = (237, 150, 9)
+
+class Profiler(object):
+    """
+    Times named stages and keeps their recent durations.
+    samples: dict of stage name to a deque of its last window durations in ms
+    window: int samples kept per stage
+    path: telemetry file, CSV if it ends in '.csv' and JSON lines otherwise,
+          or None to keep no telemetry
+    period: seconds between telemetry writes
+    frames: int frames counted since the profiler started
+    last_write: time() of the last telemetry write
+    visible: bool, draw the overlay
+    """
+
+    def __init__(self, path=None, period=PERIOD, window=WINDOW):
+        """
+        Initialize empty samples and the telemetry schedule
+        """
+        self.samples = {}
+        self.window = window
+        self.path = path
+        self.period = period
+        self.frames = 0
+        self.last_write = time()
+        self.visible = False
+
+    def __str__(self):
+        """
+        Return a formatted string for printing
+        """
+        s = 'Profiler:\n' + f"{'stage':>22}  count   mean ms    p95 ms    max ms"
+        for name in self.samples:
+            st = self.stats(name)
+            s += (f"\n{name:>22}{st['count']:7}{st['mean']:10.3f}"
+                  f"{st['p95']:10.3f}{st['max']:10.3f}")
+        return s
+
+    def timed(self, name, func, *args):
+        """
+        Call func with args, record how long it took under name and return
+         its result
+        """
+        start = perf_counter()
+        result = func(*args)
+        self.record(name, (perf_counter() - start) * 1000)
+        return result
+
+    def record(self, name, ms):
+        """
+        Add a duration in ms to the rolling window of stage name
+        """
+        if name not in self.samples:
+            self.samples[name] = deque(maxlen=self.window)
+        self.samples[name].append(ms)
+
+    def stats(self, name):
+        """
+        Returns a dict of count, mean, p50, p95, max and the histogram bucket
+         counts of the samples in stage name's window
+        """
+        times = sorted(self.samples.get(name, ()))
+        if not times:
+            return {'count': 0, 'mean': 0, 'p50': 0, 'p95': 0, 'max': 0,
+                    'histogram': [0] * (len(BUCKETS) + 1)}
+
+        histogram = [0] * (len(BUCKETS) + 1)
+        k = 0
+        for t in times: # Sorted, so walk the buckets once
+            while k < len(BUCKETS) and t > BUCKETS[k]:
+                k += 1
+            histogram[k] += 1
+        n = len(times)
+        return {'count': n, 'mean': sum(times) / n,
+                'p50': times[(n-1) // 2], 'p95': times[(n-1) * 95 // 100],
+                'max': times[-1], 'histogram': histogram}
+
+    def toggle(self):
+        """
+        Show or hide the overlay
+        """
+        self.visible = not self.visible
+
+    def frame(self):
+        """
+        Mark the end of a frame and write telemetry when it's due
+        """
+        self.frames += 1
+        if self.path and time() - self.last_write >= self.period:
+            self.write()
+
+    def write(self):
+        """
+        Append the current stats of every stage to the telemetry file
+        """
+        now = time()
+        self.last_write = now
+        stats = {name: self.stats(name) for name in self.samples}
+        new = not os.path.exists(self.path)
+        with open(self.path, 'a') as f:
+            if self.path.endswith('.csv'):
+                if new:
+                    f.write('time,frames,stage,count,mean_ms,p50_ms,p95_ms,'
+                            'max_ms,' + ','.join(f'le_{b}ms' for b in BUCKETS)
+                            + ',over\n')
+                for name, st in stats.items():
+                    f.write(f"{now:.3f},{self.frames},{name},{st['count']},"
+                            f"{st['mean']:.4f},{st['p50']:.4f},{st['p95']:.4f},"
+                            f"{st['max']:.4f},"
+                            + ','.join(map(str, st['histogram'])) + '\n')
+            else:
+                f.write(json.dumps({'time': now, 'frames': self.frames,
+                                    'buckets_ms': BUCKETS, 'stages': stats})
+                        + '\n')
+
+    def draw(self, screen):
+        """
+        Given a PGZero screen object, draw a table of each stage's recent mean,
+         p95 and max in ms with a histogram of its samples, if visible.
+        """
+        if not self.visible:
+            return
+
+        x, y = 10, 10
+        screen.draw.text('stage             mean    p95    max', (x, y),
+                         color=OVERLAY_COLOR, fontsize=18)
+        for name in self.samples:
+            y += 16
+            st = self.stats(name)
+            screen.draw.text(f"{name:<16}{st['mean']:7.2f}{st['p95']:7.2f}"
+                             f"{st['max']:7.2f}", (x, y),
+                             color=OVERLAY_COLOR, fontsize=18)
+            top = max(st['histogram']) or 1
+            for k, count in enumerate(st['histogram']): # One bar per bucket
+                bx = x + 300 + 4*k
+                screen.draw.line((bx, y + 14), (bx, y + 14 - 12*count // top),
+                                 BAR_COLOR)
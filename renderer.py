@@ -0,0 +1,179 @@
+"""
+Module contains draw_frame(), which draws a whole frame of a GameSession, and
+ the DirtyRenderer class, which repaints only the parts of the screen that
+ changed since the last frame.
+"""
+
+from pygame import Rect
+
+from bubble import nearest_column, GRID_SPACING, FIRST_COLUMN_X
+from sprites import draw_bubbles, RADIUS
+from text_cache import draw_text
+from config import HEIGHT, WIDTH, BLACK, HULL_RADIUS, BOARD_WIDTH, \
+                   PAUSE_MESSAGE, INSTRUCTIONS, GAME_OVER_MSG
+
+ALERT_BOX = (96, 32)   # Room in pix for the text of a score alert
+SCORE_BOX = (200, 40)  # Room in pix for the score in the bottom left corner
+
+def draw_frame(screen, session, alpha=1):
+    """
+    Given a PGZero screen object and a GameSession, clear the screen and draw
+     everything alpha of the way between the last two steps
+    """
+    screen.fill(BLACK) # Background
+    t = session.timed
+    t('bubble_grid.draw', session.bubble_grid.draw, screen, alpha)
+    t('ship.draw', session.ship.draw, screen, alpha)
+    t('bullets.draw', session.bullets.draw, screen, alpha)
+    t('droppers.draw', session.droppers.draw, screen, alpha)
+    t('score.draw', session.score.draw, screen)
+    if session.new_level_msg: # Briefly introduce changes for a level
+        draw_text(screen, session.new_level_msg, centery=(HEIGHT//4),
+                  centerx=WIDTH//2)
+    if not session.game_state:     # Game Over
+        draw_text(screen, GAME_OVER_MSG , centery=HEIGHT//2, centerx=WIDTH//2)
+    elif session.game_state == 3:  # Game Paused
+        draw_text(screen, PAUSE_MESSAGE, centery=HEIGHT//2, centerx=WIDTH//2)
+    elif session.game_state == 5:  # Instruction Screen
+        screen.fill(BLACK) # Declutter for redaing instructions
+        draw_text(screen, INSTRUCTIONS, topleft=(350,150))
+
+def bubble_rect(x, y):
+    """
+    Returns the (left, top, width, height) screen area of a bubble sprite
+     centered on x, y
+    """
+    return (round(x) - RADIUS, round(y) - RADIUS, 2*RADIUS, 2*RADIUS)
+
+class DirtyRenderer(object):
+    """
+    Draws a GameSession by repainting only the screen areas which changed:
+     moved bullets, droppers, the ship and cross-hairs, score alerts, the
+     score and grid spots which changed color. Relies on the screen keeping
+     the last frame. The whole screen is redrawn when the grid has scrolled
+     by a whole pixel, on a new grid, and while a message or the profiler
+     overlay is up.
+    rects: list of areas drawn into last frame, cleared by the next one
+    grid: the grid drawn last frame
+    grid_y: whole pixel scroll offset the grid was drawn at
+    colors: dict of row index to row colors from the grid's row_colors()
+    full: bool, the next frame must be a full redraw
+    """
+
+    def __init__(self):
+        """
+        Initialize with nothing drawn, so the first frame is a full redraw
+        """
+        self.rects = []
+        self.grid = None
+        self.grid_y = None
+        self.colors = {}
+        self.full = True
+
+    def __str__(self):
+        """
+        Return a formatted string for printing
+        """
+        atts = ['\t' + a + ': ' + str(v) for a,v in self.__dict__.items()]
+        return type(self).__name__ + ' object:\n' + '\n'.join(atts)
+
+    def invalidate(self):
+        """
+        Force a full redraw next frame
+        """
+        self.full = True
+
+    def sprite_rects(self, session, alpha):
+        """
+        Returns the screen areas drawn into by everything but the grid
+        """
+        rects = [bubble_rect(*b.lerp(alpha)) for b in session.bullets]
+        rects += [bubble_rect(*b.lerp(alpha)) for b in session.droppers]
+
+        ship = session.ship
+        x, y = ship.lerp(alpha)
+        r = ship.current_radius + HULL_RADIUS//4 + 1 # Hull and thrusters
+        rects.append((round(x) - r, round(y) - r, 2*r + 1, 2*r + 1))
+        cx, cy = ship.cross.pos
+        r = HULL_RADIUS//2 + 1
+        rects.append((round(cx) - r, round(cy) - r, 2*r + 1, 2*r + 1))
+
+        w, h = ALERT_BOX
+        for a in session.score.alerts: # Generous boxes around every anchor
+            ax = min(max(round(a.x), 0), WIDTH)
+            rects.append((ax - w, round(a.y) - h, 2*w, 2*h))
+        w, h = SCORE_BOX
+        rects.append((0, HEIGHT - h, w, h))
+        return rects
+
+    def draw(self, screen, session, alpha=1, overlay=False):
+        """
+        Given a PGZero screen object and a GameSession, bring the screen up to
+         date alpha of the way between the last two steps. overlay is True
+         when something else is drawn over the frame. Returns the list of
+         changed areas as Rects clipped to the screen, or None after a full
+         redraw.
+        """
+        grid = session.bubble_grid
+        scroll = grid.lerp_scroll(alpha)
+        colors = grid.row_colors()
+        rects = self.sprite_rects(session, alpha)
+
+        if (self.full or overlay or grid is not self.grid
+                or round(scroll) != self.grid_y or session.new_level_msg
+                or session.game_state != 1):
+            draw_frame(screen, session, alpha)
+            # Keep redrawing in full until the message or overlay is gone
+            self.full = bool(overlay or session.new_level_msg
+                             or session.game_state != 1)
+            self.rects, self.grid, self.grid_y = rects, grid, round(scroll)
+            self.colors = colors
+            return None
+
+        # Grid spots which changed color since the last frame
+        dirty = self.rects + rects
+        for index in self.colors.keys() | colors.keys():
+            old = self.colors.get(index, (None,) * BOARD_WIDTH)
+            new = colors.get(index, (None,) * BOARD_WIDTH)
+            if old != new:
+                y = scroll - index * GRID_SPACING
+                dirty += [bubble_rect(FIRST_COLUMN_X + j*GRID_SPACING, y)
+                          for j in range(BOARD_WIDTH) if old[j] != new[j]]
+
+        # Clip to the screen, fill() shifts an area hanging off the left or
+        # top edge onto the screen rather than cutting it
+        bounds = screen.surface.get_rect()
+        dirty = [r for r in (Rect(r).clip(bounds) for r in dirty) if r]
+        for r in dirty:
+            screen.surface.fill(BLACK, r)
+        t = session.timed
+        t('bubble_grid.draw', self.draw_grid, screen, colors, scroll, dirty)
+        t('ship.draw', session.ship.draw, screen, alpha)
+        t('bullets.draw', session.bullets.draw, screen, alpha)
+        t('droppers.draw', session.droppers.draw, screen, alpha)
+        t('score.draw', session.score.draw, screen)
+
+        self.rects, self.colors = rects, colors
+        return dirty
+
+    def draw_grid(self, screen, colors, scroll, dirty):
+        """
+        Redraw the grid bubbles touching any of the dirty areas, given the
+         grid's row_colors() and scroll offset
+        """
+        first = min(colors) if colors else 0
+        spots = set()
+        for left, top, w, h in dirty: # Lattice spots the area can touch
+            i0 = round((scroll - top - h - RADIUS) / GRID_SPACING)
+            i1 = round((scroll - top + RADIUS) / GRID_SPACING)
+            j0 = max(nearest_column(left - RADIUS), 0)
+            j1 = min(nearest_column(left + w + RADIUS), BOARD_WIDTH - 1)
+            for index in range(max(i0, first), i1 + 1):
+                row = colors.get(index)
+                if row:
+                    spots.update((index, j) for j in range(j0, j1 + 1)
+                                 if row[j])
+
+        draw_bubbles(screen, [(FIRST_COLUMN_X + j*GRID_SPACING,
+                               scroll - index*GRID_SPACING, colors[index][j])
+                              for index, j in spots])
@@ -1,6 +1,13 @@
 """
 This file contains the Ring Leader game which has the following dependencies.
 - PGZero package
+- session.py
+- input_log.py
+- savegame.py
+- sprites.py
+- text_cache.py
+- renderer.py
+- profiler.py (when PROFILE is set in config.py)
 - dist.py
 - score.py
 - bubble.py
@@ -10,99 +17,63 @@ This file contains the Ring Leader game which has the following dependencies.
 - Install Dependencies: `pip install pgzero`
 - Play the game: `python ring_leader.py`
 - Press 'p' to pause and then 'i' to view instructions.
+- Set PROFILE = True in config.py and press F3 to see stage timings.
 """
 
 import pgzrun
 from pygame.time import Clock
 
-from ship import Ship
-from bubble import Bubble_Grid, Bullet_List, Dropper_List, Bullet
-from score import Score
-from config import HEIGHT, WIDTH, COLOR_LEVELS, HULL_RADIUS, BLACK, \
-                   PAUSE_MESSAGE, INSTRUCTIONS, GAME_OVER_MSG
-
-def initalize_game():
-    """
-    Procedure starts / restarts the game when the 'r' key is pressed
-    """
-    global bubble_grid, droppers, ship, bullets, score, new_level_msg, \
-           game_state, level, level_colors, c
-
-    # Bubbles creeping downward from top of screen
-    bubble_grid = Bubble_Grid(COLOR_LEVELS[0])
-    # list of all bubbles broken free from grid and falling
-    droppers = Dropper_List()
-    # List of bullets fired from the player's ship
-    bullets = Bullet_List()
-    # List of RGB tuples tracks the number of colors in the game currently
-    level_colors = COLOR_LEVELS[0]
-    # Player's ship 
-    ship = Ship((WIDTH // 2, HEIGHT - 2*HULL_RADIUS), COLOR_LEVELS[0])
-    # Tracks the player's score
-    score = Score(500)
-    #1: Normal Play, 0: Game Over, 3: Paused, 5: Instruction
-    game_state = 1 
-    # Levels progresses with player score
-    level = 1
-    # Briefly displayed at level up
-    new_level_msg = None
-    # PYGame object used to scale movements with time
-    c = Clock()
-
-initalize_game()
+from session import GameSession, Controls, FixedTimestep
+from renderer import draw_frame, DirtyRenderer
+from savegame import save_game, load_game
+import sprites
+from config import REPLAY_FILE, PROFILE, TELEMETRY_FILE, DIRTY_RECTS, SAVE_FILE
+
+# Headless game state, stepped in fixed ticks of game time by loop. Swept
+# bullets keep collisions sound when a stalled frame owes several ticks.
+# The input log lets a finished game be replayed exactly.
+session = GameSession(swept=True, record=True)
+loop = FixedTimestep(session)
+if PROFILE: # Opt in stage timing, overlay and telemetry
+    from profiler import Profiler
+    session.profiler = Profiler(TELEMETRY_FILE)
+# PYGame object used to scale movements with time
+c = Clock()
+sprites.preload() # Rasterize every bubble color before the first frame
+# Repaints only changed areas when on, pgzero still flips the whole display
+renderer = DirtyRenderer() if DIRTY_RECTS else None
 
 def draw():
     """
     PGZero's global draw() function
     """
-    screen.fill(BLACK) # Background
-    bubble_grid.draw(screen)
-    ship.draw(screen)
-    bullets.draw(screen)
-    droppers.draw(screen)
-    score.draw(screen)
-    if new_level_msg:      # Briefly introduce changes for a level
-        screen.draw.text(new_level_msg , centery=(HEIGHT//4), centerx=WIDTH//2)
-    if not game_state:     # Game Over
-        screen.draw.text(GAME_OVER_MSG , centery=HEIGHT//2, centerx=WIDTH//2)
-    elif game_state == 3:  # Game Paused
-        screen.draw.text(PAUSE_MESSAGE, centery=HEIGHT//2, centerx=WIDTH//2)
-    elif game_state == 5:  # Instruction Screen
-        screen.fill(BLACK) # Declutter for redaing instructions
-        screen.draw.text(INSTRUCTIONS, topleft=(350,150))
+    alpha = loop.alpha # Draw between the last two ticks
+    if renderer:
+        overlay = session.profiler is not None and session.profiler.visible
+        renderer.draw(screen, session, alpha, overlay)
+    else:
+        draw_frame(screen, session, alpha)
+    if session.profiler:
+        session.profiler.draw(screen)
+        session.profiler.frame()
 
 def update():
     """
     PGZero's global update game loop
     """
-    global game_state, droppers, score
     delta = c.tick() # Time in ms since last update
-
-    if game_state == 1: # Normal Game Play
-        bullets.move(delta)
-        score += bullets.check_bounds()
-        bullets.delete_strikers(bubble_grid)
-        droppers.move(delta)
-        score += droppers.check_bounds()
-        droppers.land(bubble_grid)
-        droppers.strike(ship)
-        bubble_grid.prune_bottom_row()
-        bubble_grid.addTopRow()
-        bubble_grid.move(delta)
-        score += bubble_grid.erase_matches()
-        droppers += bubble_grid.drop_loose_bubbles()
-        ship.update(delta, keyboard, keys)
-        if bubble_grid.collide(ship.x, ship.y, ship.current_radius):
-            game_state = 0 # Game Over
-        score.update(delta)
-        if score.is_new_level(): # Triger level change
-            next_level()
+    playing = session.game_state == 1
+    session.timed('update', loop.advance, delta,
+                  Controls(up=keyboard[keys.W], down=keyboard[keys.S],
+                           left=keyboard[keys.A], right=keyboard[keys.D]))
+    if playing and not session.game_state and session.log: # Keep a replay
+        session.log.save(REPLAY_FILE)
 
 def on_mouse_move(pos):
     """
     PGZero hook procedure. Cross-hairs follow mouse movements
     """
-    ship.cross.pos = pos
+    session.ship.cross.pos = pos
 
 def on_mouse_down(pos, button):
     """
@@ -110,11 +81,10 @@ def on_mouse_down(pos, button):
     LMB: Fire Bullet
     RMB: Rush out a new Bubble_Row
     """
-    global bullets
-    if mouse.LEFT == button:
-        bullets += Bullet(ship.x, ship.y, ship.get_color(), ship.get_angle(pos))
+    if mouse.LEFT == button: # Fired on the next tick
+        loop.queue(Controls(shots=[session.ship.get_angle(pos)]))
     if mouse.RIGHT == button:
-        bubble_grid.speed_rows += 1
+        loop.queue(Controls(rushes=1))
 
 def on_key_down(key):
     """
@@ -123,64 +93,31 @@ def on_key_down(key):
     P:     Pause/Unpause the game
     R:     Restart the game
     I:     Move between Pause and Instruction screens
+    F3:    Show/hide the profiler overlay
+    F5:    Save the game to SAVE_FILE
+    F9:    Load the game saved in SAVE_FILE
     """
-    global game_state
     if key == keys.SPACE:
-        ship.cycle_color()
+        loop.queue(Controls(cycles=1))
     if key == keys.P:
-        if game_state == 3:
-            game_state = 1
-        elif game_state == 1:
-            game_state = 3
+        session.toggle_pause()
     if key == keys.R:
-        initalize_game()
+        session.reset()
+        loop.reset()
     if key == keys.I:
-        if game_state == 3:
-            game_state = 5
-        elif game_state == 5:
-            game_state = 3
-
-def next_level():
-    """
-    Procedure trigered when player score reaches next_level_points. Sets 
-     conditions for next level.
-    """
-    global level, bubble_grid, bullets, droppers, new_level_msg, level_colors, \
-           score
-
-    droppers = Dropper_List()
-    bullets = Bullet_List()
-    ship.reset_hull_size()
-    level += 1
-    score.next_level_points += 250 * level
-
-    new_level_msg = f"Level {level}"
-    
-    if level == 5:    # Add new color to increase difficulty
-        level_colors = COLOR_LEVELS[1]
-        new_level_msg += "\nBubble Creation Rate -20%\nNew Color Added!"
-        ship.set_colors(level_colors)
-        # Slow down bubble grid
-        bubble_grid = Bubble_Grid(level_colors, bubble_grid.velocity * .8)
-    elif level == 10: # Add new color to increase difficulty
-        level_colors = COLOR_LEVELS[2]
-        new_level_msg += "\nBubble Creation Rate -20%\nNew Color Added!"
-        ship.set_colors(level_colors)
-        # Slow down bubble grid
-        bubble_grid = Bubble_Grid(level_colors, bubble_grid.velocity * .8)
-    else: # Speed up bubble creation by 10%
-        new_level_msg += "\nBubble Creation Rate +10%"
-        bubble_grid = Bubble_Grid(level_colors, bubble_grid.velocity * 1.1)
-
-    # Schedule New Level Message to disappear in 8 seconds
-    clock.schedule(clear_new_level_msg, 8.0)
-
-def clear_new_level_msg():
-    """
-    Procedure clears new level message when it expires
-    """
-    global new_level_msg
-    new_level_msg = None
+        session.toggle_instructions()
+    if key == keys.F3 and session.profiler:
+        session.profiler.toggle()
+    if key == keys.F5:
+        save_game(SAVE_FILE, session)
+    if key == keys.F9:
+        try:
+            load_game(SAVE_FILE, session)
+        except (OSError, ValueError) as e: # Nothing saved yet or not a save
+            print(f'Could not load {SAVE_FILE}: {e}')
+        else:
+            session.log = None # A loaded game can't be replayed from its seed
+            loop.reset()
 
 # PGZero method starts game
 pgzrun.go()
\ No newline at end of file
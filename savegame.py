@@ -0,0 +1,296 @@
+"""
+Module contains the save game file format and the SaveFile class, which reads
+ it through mmap. A save file holds one or more GameSession snapshots, such as
+ a paused game or the checkpoints of a long replay:
+- FILE_HEADER: SAVE_MAGIC, SAVE_VERSION and the number of snapshots
+- an ENTRY per snapshot: its label (such as the step it was taken at), byte
+  offset and size
+- the bytes of each GameSession.snapshot(), starting on 8 byte boundaries
+Snapshots hold the grid as a matrix of palette indices with its row offsets,
+ the bullet and dropper records, the ship, the score and alerts, the level,
+ level_colors and the rng state, see GameSession.snapshot().
+Opening a file maps it rather than reading it, so a file of thousands of
+ checkpoints opens as fast as one. Single fields, the grid matrix and the
+ bullet and dropper records are read straight from the mapped file without
+ restoring a game. Those last three come as NumPy arrays, the rest of the
+ module doesn't need numpy.
+"""
+
+import mmap
+import os
+import random
+import struct
+
+from bubble import GRID_HEADER, BULLET_RECORD, DROPPER_RECORD, unpack_colors
+from session import SESSION_HEADER, unpack_parts
+from ship import SHIP_HEADER
+from score import SCORE_HEADER, ALERT_RECORD
+from config import BOARD_WIDTH
+
+SAVE_MAGIC = b'RLSV'
+SAVE_VERSION = 1 # Bump when the file layout or snapshot layout changes
+FILE_HEADER = struct.Struct('<4sII') # magic, version, number of snapshots
+ENTRY = struct.Struct('<qQQ')        # label, offset, size
+PARTS = ('colors', 'message', 'grid', 'bullets', 'droppers', 'ship', 'score')
+GAME_STATES = (0, 1, 3, 5) # Game Over, Normal Play, Paused, Instructions
+
+def check_snapshot(data):
+    """
+    Given a GameSession snapshot read from a file, check that every part is
+     there and holds what its header says and that every color in play is
+     one of the grid's, so restoring and playing it can't fail part way.
+     Returns the parts as a list, in PARTS order. Raises ValueError for
+     a truncated or corrupt snapshot.
+    """
+    if len(data) < SESSION_HEADER.size:
+        raise ValueError('Truncated snapshot')
+    header = SESSION_HEADER.unpack_from(data)
+    if header[2] not in GAME_STATES:
+        raise ValueError(f'Unknown game state {header[2]}')
+    state = header[6:]
+    random.Random().setstate((3, tuple(state), None)) # Checks the rng state
+    parts = unpack_parts(data, SESSION_HEADER.size)
+    if len(parts) != len(PARTS):
+        raise ValueError(f'Snapshot has {len(parts)} parts, not {len(PARTS)}')
+    colors, msg, grid, bullets, droppers, ship, score = parts
+    bytes(msg).decode() # UnicodeDecodeError is a ValueError
+
+    if len(grid) < GRID_HEADER.size:
+        raise ValueError('Truncated grid')
+    rows, _, num_colors = GRID_HEADER.unpack_from(grid)[4:7]
+    start = GRID_HEADER.size + 3*num_colors
+    if rows < 0 or num_colors < 0 or len(grid) != start + 3*rows*BOARD_WIDTH:
+        raise ValueError('Truncated grid')
+    if max(grid[start:start + rows*BOARD_WIDTH], default=0) > num_colors:
+        raise ValueError('Grid color out of range')
+    palette = set(unpack_colors(grid[GRID_HEADER.size:start]))
+
+    if (len(colors) % 3 or len(bullets) % BULLET_RECORD.size
+            or len(droppers) % DROPPER_RECORD.size):
+        raise ValueError('Truncated colors, bullets or droppers')
+    if not all(0 <= r[4] < BOARD_WIDTH
+               for r in DROPPER_RECORD.iter_unpack(droppers)):
+        raise ValueError('Dropper column out of range')
+    if not all(tuple(r[-3:]) in palette
+               for records, layout in ((bullets, BULLET_RECORD),
+                                       (droppers, DROPPER_RECORD))
+               for r in layout.iter_unpack(records)):
+        raise ValueError('Bullet or dropper color not in the grid')
+
+    if len(ship) < SHIP_HEADER.size or (len(ship) - SHIP_HEADER.size) % 3:
+        raise ValueError('Truncated ship')
+    bullet_index = SHIP_HEADER.unpack_from(ship)[8]
+    if not 0 <= bullet_index < (len(ship) - SHIP_HEADER.size) // 3:
+        raise ValueError('Ship bullet color out of range')
+    if not set(unpack_colors(ship[SHIP_HEADER.size:])) <= palette:
+        raise ValueError('Ship color not in the grid')
+    if (len(score) < SCORE_HEADER.size
+            or (len(score) - SCORE_HEADER.size) % ALERT_RECORD.size):
+        raise ValueError('Truncated score')
+    return parts
+
+def save(path, snapshots, labels=None):
+    """
+    Given a path, a list of GameSession snapshots and an optional list of int
+     labels for them (their positions by default), write a save file. The
+     file is written beside path, synced to disk, then moved over it, so a
+     crash never leaves a half written save.
+    """
+    if labels is None:
+        labels = range(len(snapshots))
+    offset = FILE_HEADER.size + ENTRY.size * len(snapshots)
+    entries, padded = [], []
+    for label, snap in zip(labels, snapshots):
+        offset += -offset % 8
+        entries.append(ENTRY.pack(label, offset, len(snap)))
+        padded.append(snap + bytes(-len(snap) % 8))
+        offset += len(snap)
+
+    temp = path + '.tmp'
+    with open(temp, 'wb') as f:
+        f.write(FILE_HEADER.pack(SAVE_MAGIC, SAVE_VERSION, len(snapshots)))
+        f.write(b''.join(entries))
+        f.write(bytes(-f.tell() % 8))
+        for p in padded:
+            f.write(p)
+        f.flush()
+        os.fsync(f.fileno()) # On disk before it takes the save's name
+    os.replace(temp, path)
+
+def save_game(path, game):
+    """
+    Given a path and a GameSession, save the game's current state
+    """
+    save(path, [game.snapshot()])
+
+def load_game(path, game, k=-1):
+    """
+    Given a path and a GameSession, put the game in the state of snapshot k
+     of the save file, the last by default. Raises OSError if the file can't
+     be read and ValueError if it isn't a whole save file, leaving the game
+     as it was.
+    """
+    with SaveFile(path) as f:
+        f.restore(game, k)
+
+class SaveFile(object):
+    """
+    Represents a save file mapped into memory. Snapshots are memoryviews of
+     the mapped file, copy any kept after close().
+    path: file name
+    file: the open file object
+    map: read only mmap of the file
+    view: memoryview of the map
+    labels: list of the int label of each snapshot
+    spans: list of the (offset, size) of each snapshot
+    Snapshots are checked with check_snapshot() as they are read, so a
+     damaged one raises ValueError rather than restoring part of a game.
+    """
+
+    def __init__(self, path):
+        """
+        Map the save file at path and read its table of snapshots. Raises
+         ValueError, with the file closed, if the header or table is damaged
+         or points past the end of the file.
+        """
+        self.path = path
+        self.file = open(path, 'rb')
+        self.map = self.view = None
+        try:
+            # ValueError for an empty file
+            self.map = mmap.mmap(self.file.fileno(), 0,
+                                 access=mmap.ACCESS_READ)
+            self.view = memoryview(self.map)
+            self.labels, self.spans = self.read_table()
+        except Exception:
+            self.close()
+            raise
+
+    def __str__(self):
+        """
+        Return a formatted string for printing
+        """
+        return f'{type(self).__name__}: {len(self)} snapshots in {self.path}'
+
+    def read_table(self):
+        """
+        Returns the lists of labels and spans of the file's snapshots, after
+         checking the header and that every span lies within the file
+        """
+        end = len(self.map)
+        if end < FILE_HEADER.size:
+            raise ValueError(f'Not a save file: {self.path}')
+        magic, version, count = FILE_HEADER.unpack_from(self.view)
+        if magic != SAVE_MAGIC:
+            raise ValueError(f'Not a save file: {self.path}')
+        if version != SAVE_VERSION:
+            raise ValueError(f'Unsupported save file version {version}')
+        start = FILE_HEADER.size
+        table = start + ENTRY.size*count
+        if table > end:
+            raise ValueError(f'Truncated save file: {self.path}')
+
+        labels, spans = [], []
+        for label, offset, size in ENTRY.iter_unpack(self.view[start:table]):
+            if offset < table or offset + size > end:
+                raise ValueError(f'Snapshot {len(spans)} lies outside '
+                                 f'{self.path}')
+            labels.append(label)
+            spans.append((offset, size))
+        return labels, spans
+
+    def __len__(self):
+        return len(self.spans)
+
+    def __getitem__(self, k):
+        """
+        Returns snapshot k as a memoryview of the file
+        """
+        offset, size = self.spans[k]
+        return self.view[offset:offset+size]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def parts(self, k):
+        """
+        Returns a dict of the name in PARTS of each part of snapshot k to a
+         memoryview of it
+        """
+        return dict(zip(PARTS, check_snapshot(self[k])))
+
+    def restore(self, game, k=-1):
+        """
+        Given a GameSession, put it in the state of snapshot k. The snapshot
+         is checked first, the game is left as it was if it's damaged.
+        """
+        check_snapshot(self[k])
+        game.restore(self[k])
+
+    def info(self, k=-1):
+        """
+        Returns a dict of the seed, level, game_state, score,
+         next_level_points, level_colors and grid rows of snapshot k, read
+         without restoring it
+        """
+        parts = self.parts(k)
+        seed, level, game_state = SESSION_HEADER.unpack_from(self[k])[:3]
+        score, next_level_points = SCORE_HEADER.unpack_from(parts['score'])
+        rows = GRID_HEADER.unpack_from(parts['grid'])[4]
+        return {'seed': seed, 'level': level, 'game_state': game_state,
+                'score': score, 'next_level_points': next_level_points,
+                'level_colors': unpack_colors(parts['colors']),
+                'rows': rows}
+
+    def grid(self, k=-1):
+        """
+        Returns the fixed index of the bottom row of snapshot k's grid, its
+         list of RGB colors and a (rows, BOARD_WIDTH) NumPy uint8 view of
+         each spot's position in the colors plus one, 0 for no bubble
+        """
+        import numpy as np
+        grid = self.parts(k)['grid']
+        rows, bottom, num_colors = GRID_HEADER.unpack_from(grid)[4:7]
+        start = GRID_HEADER.size + 3*num_colors
+        colors = unpack_colors(grid[GRID_HEADER.size:start])
+        cells = np.frombuffer(grid, np.uint8, rows*BOARD_WIDTH, start)
+        return bottom, colors, cells.reshape(rows, BOARD_WIDTH)
+
+    def bullets(self, k=-1):
+        """
+        Returns a NumPy record array view of snapshot k's bullets, with the
+         fields of array_lists.Array_Bullet_List.RECORD
+        """
+        import numpy as np
+        from array_lists import Array_Bullet_List
+        return np.frombuffer(self.parts(k)['bullets'],
+                             Array_Bullet_List.RECORD)
+
+    def droppers(self, k=-1):
+        """
+        Returns a NumPy record array view of snapshot k's droppers, with the
+         fields of array_lists.Array_Dropper_List.RECORD
+        """
+        import numpy as np
+        from array_lists import Array_Dropper_List
+        return np.frombuffer(self.parts(k)['droppers'],
+                             Array_Dropper_List.RECORD)
+
+    def close(self):
+        """
+        Unmap and close the file. Views still held elsewhere keep it mapped.
+        """
+        if self.file is None:
+            return
+        try:
+            if self.view is not None:
+                self.view.release()
+            if self.map is not None:
+                self.map.close()
+        except BufferError:
+            pass
+        self.file.close()
+        self.file = self.map = self.view = None
@@ -1,7 +1,13 @@
 """
 This module contains the Score, Alert and Alerts_List classes.
 """
+import struct
+
 from config import HEIGHT, WIDTH, SCORE_DURATION, SCORE_VELOCITY
+from text_cache import draw_text
+
+SCORE_HEADER = struct.Struct('<2q')      # score, next_level_points
+ALERT_RECORD = struct.Struct('<2dq2d')   # x, y, pts, life, vely
 
 class Score(object):
     """
@@ -59,10 +65,25 @@ class Score(object):
         Draws the score and next level threshold in bottom left.
         Draws the score alerts
         """
-        screen.draw.text(f'{self.score}/{self.next_level_points}',
-                         bottomleft=(10, HEIGHT-10))
+        draw_text(screen, f'{self.score}/{self.next_level_points}',
+                  bottomleft=(10, HEIGHT-10))
         self.alerts.draw(screen)
 
+    def snapshot(self):
+        """
+        Returns the score as bytes, a SCORE_HEADER then the alerts
+        """
+        return SCORE_HEADER.pack(self.score, self.next_level_points) \
+               + self.alerts.snapshot()
+
+    def restore(self, data):
+        """
+        Given bytes from snapshot(), replace the score and alerts with those
+         saved
+        """
+        self.score, self.next_level_points = SCORE_HEADER.unpack_from(data)
+        self.alerts.restore(data[SCORE_HEADER.size:])
+
     def is_new_level(self):
         """
         Tests and reports player's progression to the next level.
@@ -122,6 +143,23 @@ class Alerts_List(object):
         self.contents.append(rhs)
         return self
 
+    def snapshot(self):
+        """
+        Returns the alerts as bytes, an ALERT_RECORD each
+        """
+        return b''.join(ALERT_RECORD.pack(a.x, a.y, a.pts, a.life, a.vely)
+                        for a in self.contents)
+
+    def restore(self, data):
+        """
+        Given bytes from snapshot(), replace the alerts with those saved
+        """
+        self.contents = []
+        for x, y, pts, life, vely in ALERT_RECORD.iter_unpack(data):
+            a = Alert(x, y, pts)
+            a.life, a.vely = life, vely
+            self.contents.append(a)
+
     def draw(self, screen):
         """
         Given a PGZero screen object and the width of the game board, draws
@@ -153,6 +191,8 @@ class Alert(object):
     life: time alert displays in ms
     vely: float y velocity in pix/ms
     """
+    __slots__ = ('x', 'y', 'pts', 'life', 'vely')
+
     def __init__(self, x, y, pts):
         """
         Initializes the position, points, life and velocity of an alert.
@@ -167,7 +207,8 @@ class Alert(object):
         """
         Returns a formatted string for printing the Alert.
         """
-        atts = ['\t' + a + ': ' + str(v) for a,v in self.__dict__.items()]
+        atts = ['\t' + a + ': ' + str(getattr(self, a))
+                for a in self.__slots__]
         return type(self).__name__ + ' object:\n' + '\n'.join(atts)
 
     def draw(self, screen):
@@ -177,11 +218,11 @@ class Alert(object):
         """
         x, y, m = self.x, self.y, self.pts
         if x > WIDTH: #Off screen to right, adjust
-            screen.draw.text(f'{m:+d}', midright=(WIDTH, y))
+            draw_text(screen, f'{m:+d}', midright=(WIDTH, y))
         elif x < 0: #Off screen to left, adjust
-            screen.draw.text(f'{m:+d}', midleft=(0, y))
+            draw_text(screen, f'{m:+d}', midleft=(0, y))
         else:
-            screen.draw.text(f'{m:+d}', midtop=(x, y))
+            draw_text(screen, f'{m:+d}', midtop=(x, y))
 
     def move(self, delta):
         """
@@ -0,0 +1,445 @@
+"""
+Module contains the GameSession, Controls and FixedTimestep classes. A
+ GameSession runs the Ring Leader game loop without pgzero, so games can be
+ stepped headlessly as fast as the CPU allows: no window, no SDL and no module
+ level game state. A FixedTimestep steps a GameSession at a set rate whatever
+ the frame rate.
+"""
+
+import random
+import struct
+
+from ship import Ship
+from bubble import Bubble_Grid, Bullet_List, Dropper_List, Bullet, \
+                   pack_colors, unpack_colors
+from score import Score
+from input_log import InputLog
+from config import HEIGHT, WIDTH, COLOR_LEVELS, HULL_RADIUS, \
+                   NEW_LEVEL_POINTS, LEVEL_MSG_DURATION, SIM_TICK, \
+                   MAX_CATCH_UP, LEVEL_SPEED_UP, NEW_COLOR_SLOW_DOWN
+
+# Session snapshot layout: seed, level, game_state, msg_life, gauss_next is
+# set, gauss_next, then the 625 words of the rng's Mersenne Twister state
+SESSION_HEADER = struct.Struct('<q2id?d625I')
+PART_SIZE = struct.Struct('<I') # Length of each part following the header
+
+def pack_parts(parts):
+    """
+    Returns a list of bytes objects as one, each after its length
+    """
+    return b''.join(PART_SIZE.pack(len(p)) + p for p in parts)
+
+def unpack_parts(data, offset=0):
+    """
+    Returns the list of bytes objects packed by pack_parts() into data from
+     offset on. Raises ValueError if a part runs past the end of data.
+    """
+    parts = []
+    while offset < len(data):
+        if offset + PART_SIZE.size > len(data):
+            raise ValueError('Truncated part size')
+        size, = PART_SIZE.unpack_from(data, offset)
+        offset += PART_SIZE.size
+        if offset + size > len(data):
+            raise ValueError('Truncated part')
+        parts.append(data[offset:offset+size])
+        offset += size
+    return parts
+
+class Controls(object):
+    """
+    Represents the player's input for a single step of a GameSession.
+    up, down, left, right: bool thrusters engaged (W, S, A, D keys)
+    shots: list of firing angles in radians (Left Mouse Button)
+    cycles: int number of bullet color changes (Space Bar)
+    rushes: int number of rows to speed out (Right Mouse Button)
+    """
+
+    def __init__(self, up=False, down=False, left=False, right=False,
+                 shots=None, cycles=0, rushes=0):
+        """
+        Initialize held thrusters and the actions taken this step
+        """
+        self.up = up
+        self.down = down
+        self.left = left
+        self.right = right
+        self.shots = shots if shots else []
+        self.cycles = cycles
+        self.rushes = rushes
+
+    def __str__(self):
+        """
+        Return a formatted string for printing
+        """
+        atts = ['\t' + a + ': ' + str(v) for a,v in self.__dict__.items()]
+        return type(self).__name__ + ' object:\n' + '\n'.join(atts)
+
+class GameSession(object):
+    """
+    Represents a single game of Ring Leader and owns all of its state.
+    grid_type: class used to build each level's bubble grid
+    bullet_type, dropper_type: classes used for the bullet and dropper lists
+    swept: bool, bullets collide along their whole path each step so long
+           steps can't carry them through the grid
+    record: bool, keep an InputLog of the player's input
+    seed: int seed of this game's random number generator
+    rng: random.Random generator for the game, the only source of randomness
+    log: InputLog of this game or None when not recording
+    profiler: profiler.Profiler timing each stage of step() or None
+    bubble_grid: Bubble_Grid creeping downward from top of screen
+    droppers: Dropper_List of bubbles broken free from the grid and falling
+    bullets: Bullet_List of bullets fired from the player's ship
+    ship: Player's Ship
+    score: Score tracking the player's points and alerts
+    level_colors: list of RGB tuples, the colors currently in the game
+    level: int level progresses with player score
+    game_state: 1: Normal Play, 0: Game Over, 3: Paused, 5: Instruction
+    new_level_msg: string briefly displayed at level up or None
+    msg_life: ms remaining to display new_level_msg
+    """
+
+    def __init__(self, grid_type=Bubble_Grid, swept=False, seed=None,
+                 record=False, bullet_type=Bullet_List,
+                 dropper_type=Dropper_List):
+        """
+        Start a new game. grid_type is the class used for the bubble grid,
+         Bubble_Grid or a drop in replacement such as array_grid.Array_Grid.
+        bullet_type and dropper_type likewise replace Bullet_List and
+         Dropper_List, as with array_lists.Array_Bullet_List and
+         array_lists.Array_Dropper_List.
+        swept turns on swept bullet collisions. The same seed and input always
+         play out the same game, a random seed is picked if none is given.
+        record keeps an InputLog of the game for replay().
+        """
+        self.grid_type = grid_type
+        self.bullet_type = bullet_type
+        self.dropper_type = dropper_type
+        self.swept = swept
+        self.record = record
+        self.profiler = None
+        self.reset(seed)
+
+    def reset(self, seed=None):
+        """
+        Starts / restarts the game from seed, or from a new random seed
+        """
+        if seed is None:
+            seed = random.getrandbits(32)
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.log = InputLog(seed, self.swept) if self.record else None
+        self.bubble_grid = self.grid_type(COLOR_LEVELS[0], rng=self.rng)
+        self.droppers = self.dropper_type()
+        self.bullets = self.bullet_type(self.swept)
+        self.level_colors = COLOR_LEVELS[0]
+        self.ship = Ship((WIDTH // 2, HEIGHT - 2*HULL_RADIUS), COLOR_LEVELS[0])
+        self.score = Score(NEW_LEVEL_POINTS)
+        self.game_state = 1
+        self.level = 1
+        self.new_level_msg = None
+        self.msg_life = 0
+
+    def snapshot(self):
+        """
+        Returns the state of the game as bytes: a SESSION_HEADER then the
+         level colors, level message, grid, bullets, droppers, ship and score
+         as parts. The input log and profiler aren't part of it.
+        """
+        version, state, gauss = self.rng.getstate()
+        header = SESSION_HEADER.pack(self.seed, self.level, self.game_state,
+                                     self.msg_life, gauss is not None,
+                                     gauss or 0, *state)
+        msg = self.new_level_msg.encode() if self.new_level_msg else b''
+        return header + pack_parts((pack_colors(self.level_colors), msg,
+                                    self.bubble_grid.snapshot(),
+                                    self.bullets.snapshot(),
+                                    self.droppers.snapshot(),
+                                    self.ship.snapshot(),
+                                    self.score.snapshot()))
+
+    def restore(self, data):
+        """
+        Given bytes from snapshot() of a game played with any grid and list
+         classes, put this game back in the state saved. The grid, lists,
+         ship and score are restored in place and the rng keeps playing on
+         from where it was.
+        """
+        seed, level, game_state, msg_life, has_gauss, gauss, *state = \
+            SESSION_HEADER.unpack_from(data)
+        colors, msg, grid, bullets, droppers, ship, score = \
+            unpack_parts(data, SESSION_HEADER.size)
+        colors = unpack_colors(colors)
+        msg = bytes(msg).decode() if msg else None
+
+        self.seed, self.level, self.game_state = seed, level, game_state
+        self.msg_life = msg_life
+        self.rng.setstate((3, tuple(state), gauss if has_gauss else None))
+        # Share the list from config, as a game in play does
+        self.level_colors = next((c for c in COLOR_LEVELS if c == colors),
+                                 colors)
+        self.new_level_msg = msg
+        self.bubble_grid.restore(grid)
+        self.bullets.restore(bullets)
+        self.droppers.restore(droppers)
+        self.ship.restore(ship)
+        self.score.restore(score)
+
+    def fire(self, angle):
+        """
+        Fire a bullet of the ship's current color on the given angle in radians
+        """
+        if self.log is not None:
+            self.log.event('f', angle)
+        self.bullets += Bullet(self.ship.x, self.ship.y, self.ship.get_color(),
+                               angle)
+
+    def fire_at(self, pos):
+        """
+        Fire a bullet from the ship towards the given x, y screen position
+        """
+        self.fire(self.ship.get_angle(pos))
+
+    def cycle_color(self):
+        """
+        Move the ship to its next bullet color
+        """
+        if self.log is not None:
+            self.log.event('c')
+        self.ship.cycle_color()
+
+    def rush_row(self):
+        """
+        Speed out the next Bubble_Row
+        """
+        if self.log is not None:
+            self.log.event('r')
+        self.bubble_grid.speed_rows += 1
+
+    def toggle_pause(self):
+        """
+        Pause normal play or resume a paused game
+        """
+        if self.log is not None:
+            self.log.event('p')
+        if self.game_state == 3:
+            self.game_state = 1
+        elif self.game_state == 1:
+            self.game_state = 3
+
+    def toggle_instructions(self):
+        """
+        Move between the Pause and Instruction screens
+        """
+        if self.log is not None:
+            self.log.event('i')
+        if self.game_state == 3:
+            self.game_state = 5
+        elif self.game_state == 5:
+            self.game_state = 3
+
+    def step(self, delta, controls=None):
+        """
+        Given the ms elapsed since the last step and an optional Controls
+         object, apply the player's actions and advance the game by delta ms.
+        Returns the game_state after the step.
+        """
+        if controls is None:
+            controls = Controls()
+
+        if self.new_level_msg: # Expire the level message in real time
+            self.msg_life -= delta
+            if self.msg_life <= 0:
+                self.new_level_msg = None
+
+        if self.game_state == 1:
+            for angle in controls.shots:
+                self.fire(angle)
+            for _ in range(controls.cycles):
+                self.cycle_color()
+            for _ in range(controls.rushes):
+                self.rush_row()
+
+        if self.log is not None: # Bundle the step with the actions before it
+            self.log.step(delta, controls)
+
+        if self.game_state != 1: # Paused or Game Over
+            return self.game_state
+
+        t = self.timed
+        grid = self.bubble_grid
+        t('bullets.move', self.bullets.move, delta)
+        if self.swept: # Bullets which reached the grid land before leaving
+            t('delete_strikers', self.bullets.delete_strikers, grid)
+            self.score += t('bullets.check_bounds', self.bullets.check_bounds)
+        else:
+            self.score += t('bullets.check_bounds', self.bullets.check_bounds)
+            t('delete_strikers', self.bullets.delete_strikers, grid)
+        t('droppers.move', self.droppers.move, delta)
+        self.score += t('droppers.check_bounds', self.droppers.check_bounds)
+        t('droppers.land', self.droppers.land, grid)
+        t('droppers.strike', self.droppers.strike, self.ship)
+        t('prune_bottom_row', grid.prune_bottom_row)
+        t('addTopRow', grid.addTopRow)
+        t('bubble_grid.move', grid.move, delta)
+        self.score += t('erase_matches', grid.erase_matches)
+        self.droppers += t('drop_loose_bubbles', grid.drop_loose_bubbles)
+        t('ship.update', self.ship.update, delta, controls)
+        if t('bubble_grid.collide', grid.collide, self.ship.x, self.ship.y,
+             self.ship.current_radius):
+            self.game_state = 0 # Game Over
+        t('score.update', self.score.update, delta)
+        if self.score.is_new_level(): # Triger level change
+            t('next_level', self.next_level)
+
+        return self.game_state
+
+    def timed(self, name, func, *args):
+        """
+        Call func with args and return its result, timing it as stage name
+         when a profiler is attached
+        """
+        if self.profiler is None:
+            return func(*args)
+        return self.profiler.timed(name, func, *args)
+
+    @classmethod
+    def replay(cls, log, grid_type=Bubble_Grid, bullet_type=Bullet_List,
+               dropper_type=Dropper_List):
+        """
+        Given an InputLog, play its game again headlessly and return the
+         GameSession at the end of it. The replayed game records its own log,
+         which matches the one given. grid_type, bullet_type and dropper_type
+         are the classes to replay with, as for GameSession().
+        """
+        game = cls(grid_type, log.swept, log.seed, True, bullet_type,
+                   dropper_type)
+        actions = {'f': game.fire, 'c': game.cycle_color, 'r': game.rush_row,
+                   'p': game.toggle_pause, 'i': game.toggle_instructions}
+        for delta, keys, repeat, events in log.steps:
+            for e in events:
+                actions[e[0]](*e[1:])
+            controls = Controls(**InputLog.held(keys))
+            for _ in range(repeat):
+                game.step(delta, controls)
+        for e in log.pending:
+            actions[e[0]](*e[1:])
+        return game
+
+    def next_level(self):
+        """
+        Procedure trigered when player score reaches next_level_points. Sets
+         conditions for next level.
+        """
+        self.droppers = self.dropper_type()
+        self.bullets = self.bullet_type(self.swept)
+        self.ship.reset_hull_size()
+        self.level += 1
+        self.score.next_level_points += 250 * self.level
+
+        self.new_level_msg = f"Level {self.level}"
+        self.msg_life = LEVEL_MSG_DURATION * 1000 #convert to ms
+
+        velocity = self.bubble_grid.velocity
+        slow_down = f"{round(100 * (NEW_COLOR_SLOW_DOWN - 1)):+d}%"
+        speed_up = f"{round(100 * (LEVEL_SPEED_UP - 1)):+d}%"
+        if self.level == 5:    # Add new color to increase difficulty
+            self.level_colors = COLOR_LEVELS[1]
+            self.new_level_msg += f"\nBubble Creation Rate {slow_down}" \
+                                  "\nNew Color Added!"
+            self.ship.set_colors(self.level_colors)
+            # Slow down bubble grid
+            self.bubble_grid = self.grid_type(self.level_colors,
+                                              velocity * NEW_COLOR_SLOW_DOWN,
+                                              self.rng)
+        elif self.level == 10: # Add new color to increase difficulty
+            self.level_colors = COLOR_LEVELS[2]
+            self.new_level_msg += f"\nBubble Creation Rate {slow_down}" \
+                                  "\nNew Color Added!"
+            self.ship.set_colors(self.level_colors)
+            # Slow down bubble grid
+            self.bubble_grid = self.grid_type(self.level_colors,
+                                              velocity * NEW_COLOR_SLOW_DOWN,
+                                              self.rng)
+        else: # Speed up bubble creation
+            self.new_level_msg += f"\nBubble Creation Rate {speed_up}"
+            self.bubble_grid = self.grid_type(self.level_colors,
+                                              velocity * LEVEL_SPEED_UP,
+                                              self.rng)
+
+class FixedTimestep(object):
+    """
+    Runs a GameSession in fixed steps of game time. Frame time is banked and
+     spent one tick at a time, so the simulation is the same at any frame
+     rate, and drawing interpolates between the last two steps.
+    session: the GameSession being stepped
+    tick: ms of game time simulated by each step
+    max_ticks: most steps run for one frame. Time owed beyond that is dropped
+               so a stalled frame can't snowball into ever longer catch up.
+    accumulator: ms of frame time not yet simulated
+    alpha: fraction of a tick left in the accumulator, how far between the
+           last two steps to draw
+    pending: Controls with actions waiting for the next step
+    """
+
+    def __init__(self, session, tick=SIM_TICK, max_ticks=MAX_CATCH_UP):
+        """
+        Initialize an empty accumulator for stepping session
+        """
+        self.session = session
+        self.tick = tick
+        self.max_ticks = max_ticks
+        self.accumulator = 0
+        self.alpha = 1
+        self.pending = Controls()
+
+    def __str__(self):
+        """
+        Return a formatted string for printing
+        """
+        atts = ['\t' + a + ': ' + str(v) for a,v in self.__dict__.items()]
+        return type(self).__name__ + ' object:\n' + '\n'.join(atts)
+
+    def advance(self, delta, controls=None):
+        """
+        Given the ms elapsed since the last frame and an optional Controls
+         object, run every whole tick owed, up to max_ticks. Held thrusters
+         apply to each tick and actions to the first one, or wait for the next
+         frame if no tick is due. Returns the number of ticks run.
+        """
+        if controls is None:
+            controls = Controls()
+        self.queue(controls)
+
+        self.accumulator = min(self.accumulator + delta,
+                               self.max_ticks * self.tick)
+        ticks = int(self.accumulator // self.tick)
+        for _ in range(ticks):
+            actions = self.pending
+            actions.up, actions.down = controls.up, controls.down
+            actions.left, actions.right = controls.left, controls.right
+            self.pending = Controls()
+            self.session.step(self.tick, actions)
+            self.accumulator -= self.tick
+
+        self.alpha = self.accumulator / self.tick
+        return ticks
+
+    def queue(self, controls):
+        """
+        Given a Controls object, hold its shots, color cycles and rushes for
+         the next step, so input between frames lands on a tick like any other
+        """
+        self.pending.shots += controls.shots
+        self.pending.cycles += controls.cycles
+        self.pending.rushes += controls.rushes
+
+    def reset(self):
+        """
+        Drop banked time and waiting actions, as when the session is
+         restarted or restored, so nothing owed to the old game is spent on
+         the new one and drawing starts from its current state
+        """
+        self.accumulator = 0
+        self.alpha = 1
+        self.pending = Controls()
@@ -0,0 +1,246 @@
+"""
+Module contains the SharedState class, the state of many headless games packed
+ into one preallocated shared memory block. The process playing a game exports
+ it into its row of the block in place, and any process attached to the block
+ reads every game as NumPy views, so nothing is pickled or copied to pass game
+ state between processes.
+State arrays per game (see STATE):
+- cells: palette index of every spot of the lowest STATE_ROWS grid rows,
+         bottom row first, -1 for no bubble. The palette is the game's
+         level_colors, in palette.
+- flags: bullet flag of every spot, the player placed that bubble
+- row_index: fixed index of each grid row, its y is scroll - index *
+             GRID_SPACING
+- bullets: x, y, prev_x, prev_y, angle and palette index of up to MAX_BULLETS
+           bullets
+- droppers: x, y, prev_y, vely, column and palette index of up to MAX_DROPPERS
+            droppers
+- ship: x, y, prev_x, prev_y, velx, vely, current_radius and final_radius
+- thrusters: the ship's nthrust, sthrust, ethrust and wthrust
+- num_rows, num_bullets, num_droppers, num_alerts: full counts, which may be
+  more than the arrays hold
+- the grid's scroll, prev_scroll, velocity and speed_rows, the ship's
+  bullet_index, the score, next_level_points, level, game_state and seed
+- frame: number of exports of this game so far, written last
+Unused grid rows and bullet and dropper rows are zero with a palette index of
+ -1.
+Requires the numpy package.
+"""
+
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from array_grid import Array_Grid
+from array_lists import Array_Bubble_List
+from config import BOARD_WIDTH, GRID_ROWS
+
+STATE_ROWS = GRID_ROWS # Grid rows held, a taller grid's top rows are left out
+MAX_BULLETS = 32
+MAX_DROPPERS = 64
+MAX_COLORS = 8
+BULLET_FIELDS = ('x', 'y', 'prev_x', 'prev_y', 'angle')   # Then palette index
+DROPPER_FIELDS = ('x', 'y', 'prev_y', 'vely', 'column')   # Then palette index
+SHIP_FIELDS = ('x', 'y', 'prev_x', 'prev_y', 'velx', 'vely', 'current_radius',
+               'final_radius')
+THRUSTERS = ('nthrust', 'sthrust', 'ethrust', 'wthrust')
+
+# State key: (shape per game, dtype)
+STATE = {'cells': ((STATE_ROWS, BOARD_WIDTH), np.int8),
+         'flags': ((STATE_ROWS, BOARD_WIDTH), bool),
+         'row_index': ((STATE_ROWS,), np.int64),
+         'num_rows': ((), np.int32),
+         'scroll': ((), np.float64),
+         'prev_scroll': ((), np.float64),
+         'velocity': ((), np.float64),
+         'speed_rows': ((), np.int32),
+         'palette': ((MAX_COLORS, 3), np.uint8),
+         'num_colors': ((), np.int32),
+         'bullets': ((MAX_BULLETS, len(BULLET_FIELDS) + 1), np.float64),
+         'num_bullets': ((), np.int32),
+         'droppers': ((MAX_DROPPERS, len(DROPPER_FIELDS) + 1), np.float64),
+         'num_droppers': ((), np.int32),
+         'ship': ((len(SHIP_FIELDS),), np.float64),
+         'thrusters': ((len(THRUSTERS),), bool),
+         'bullet_index': ((), np.int32),
+         'score': ((), np.int64),
+         'next_level_points': ((), np.int64),
+         'num_alerts': ((), np.int32),
+         'level': ((), np.int32),
+         'game_state': ((), np.int32),
+         'seed': ((), np.int64),
+         'frame': ((), np.int64)}
+
+def pack_layout(spec, count):
+    """
+    Given a dict of key: (shape, dtype) and a number of items, returns a list
+     of (key, shape, dtype, byte offset) of the arrays of count items packed
+     in one buffer, and the buffer's size in bytes
+    """
+    layout, offset = [], 0
+    for key, (shape, dtype) in spec.items():
+        shape = (count,) + shape
+        layout.append((key, shape, dtype, offset))
+        size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+        offset += -(-size // 8) * 8 # Keep every array 8 byte aligned
+    return layout, offset
+
+def pack_views(buf, spec, count):
+    """
+    Returns a dict of the arrays of pack_layout(spec, count) as NumPy views of
+     the buffer buf
+    """
+    layout, _ = pack_layout(spec, count)
+    return {key: np.ndarray(shape, dtype, buf, offset)
+            for key, shape, dtype, offset in layout}
+
+def palette_lookup(colors, index):
+    """
+    Given a list of RGB colors and a dict of color to palette index, returns
+     an int8 array mapping each color's position in the list to its palette
+     index. Its last entry maps -1 (no color) to -1.
+    """
+    return np.array([index.get(c, -1) for c in colors] + [-1], np.int8)
+
+def export_bubbles(bubbles, fields, out, index):
+    """
+    Given a bullet or dropper list, the names of the fields to export, the
+     (rows, len(fields) + 1) array to export into and a dict of color to
+     palette index, write each bubble's fields then palette index into a row
+     of out. Bubbles past the last row are left out and unused rows zeroed.
+    Returns the number of bubbles in the list.
+    """
+    n = min(len(bubbles), len(out))
+    out[n:] = 0
+    out[n:, -1] = -1
+    if isinstance(bubbles, Array_Bubble_List): # Copy whole columns
+        for f, name in enumerate(fields):
+            out[:n, f] = getattr(bubbles, name)[:n]
+        out[:n, -1] = palette_lookup(bubbles.palette, index)[bubbles.color[:n]]
+    else:
+        for k, b in zip(range(n), bubbles):
+            out[k] = [getattr(b, name) for name in fields] \
+                     + [index.get(b.color, -1)]
+    return len(bubbles)
+
+def export_state(game, state):
+    """
+    Given a GameSession and a dict of one game's STATE arrays, write the
+     game's current state into the arrays in place
+    """
+    palette = game.level_colors[:MAX_COLORS]
+    index = {c: k for k, c in enumerate(palette)}
+    state['palette'][...] = 0
+    state['palette'][:len(palette)] = palette
+    state['num_colors'][...] = len(palette)
+
+    grid = game.bubble_grid
+    cells, flags, row_index = state['cells'], state['flags'], state['row_index']
+    n = min(len(grid), STATE_ROWS)
+    cells[n:] = -1
+    flags[n:] = False
+    row_index[n:] = 0
+    if isinstance(grid, Array_Grid): # Rows are arrays already
+        cells[:n] = palette_lookup(grid.colors, index)[grid.cells[:n]]
+        flags[:n] = grid.flags[:n]
+        row_index[:n] = grid.index[:n]
+    else:
+        for i, row in zip(range(n), grid):
+            cells[i] = [index.get(b.color, -1) for b in row.contents]
+            flags[i] = [b.bulletFlag for b in row.contents]
+            row_index[i] = row.index
+    state['num_rows'][...] = len(grid)
+    state['scroll'][...] = grid.scroll
+    state['prev_scroll'][...] = grid.prev_scroll
+    state['velocity'][...] = grid.velocity
+    state['speed_rows'][...] = grid.speed_rows
+
+    state['num_bullets'][...] = export_bubbles(
+        game.bullets, BULLET_FIELDS, state['bullets'], index)
+    state['num_droppers'][...] = export_bubbles(
+        game.droppers, DROPPER_FIELDS, state['droppers'], index)
+
+    s = game.ship
+    state['ship'][:] = [getattr(s, name) for name in SHIP_FIELDS]
+    state['thrusters'][:] = [getattr(s, name) for name in THRUSTERS]
+    state['bullet_index'][...] = s.bullet_index
+
+    state['score'][...] = game.score.score
+    state['next_level_points'][...] = game.score.next_level_points
+    state['num_alerts'][...] = len(game.score.alerts)
+    state['level'][...] = game.level
+    state['game_state'][...] = game.game_state
+    state['seed'][...] = game.seed
+    state['frame'] += 1
+
+class SharedState(object):
+    """
+    Represents the STATE arrays of num_games games packed in one shared memory
+     block. The process that creates the block owns it and unlinks it on
+     close(), others attach to it by name. Exports overwrite a game's arrays
+     in place, so readers copy anything kept across steps.
+    num_games: int number of games
+    shm: the SharedMemory block
+    owner: bool, this object created the block
+    arrays: dict of the STATE arrays with a leading axis of games, views of
+            the block
+    games: list of a dict of each game's views of the arrays
+    """
+
+    def __init__(self, num_games, name=None):
+        """
+        Create a block for num_games games, or attach to the block name
+        """
+        _, size = pack_layout(STATE, num_games)
+        self.num_games = num_games
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name, self.owner, size)
+        self.arrays = pack_views(self.shm.buf, STATE, num_games)
+        if self.owner: # No grid bubbles, bullets or droppers yet
+            self.arrays['cells'][...] = -1
+            self.arrays['bullets'][..., -1] = -1
+            self.arrays['droppers'][..., -1] = -1
+        self.games = [{key: a[k, ...] for key, a in self.arrays.items()}
+                      for k in range(num_games)]
+
+    def __str__(self):
+        """
+        Return a formatted string for printing
+        """
+        return f'{type(self).__name__}: {self.num_games} games in ' \
+               f'{self.shm.name} ({self.shm.size} bytes)'
+
+    def __len__(self):
+        return self.num_games
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def export(self, k, game):
+        """
+        Given a game number and a GameSession, write the game's state into
+         its arrays
+        """
+        export_state(game, self.games[k])
+
+    def close(self):
+        """
+        Release the views and the block, freeing it if this object owns it
+        """
+        if self.shm is None:
+            return
+        self.arrays = self.games = None
+        try:
+            self.shm.close()
+        except BufferError: # Views still held elsewhere keep it mapped
+            pass
+        if self.owner:
+            self.shm.unlink()
+        self.shm = None
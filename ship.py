@@ -2,11 +2,18 @@
 Module contains the Ship and Cross classes
 """
 
+import struct
 from math import atan2
 from dist import *
 
+from bubble import pack_colors, unpack_colors
 from config import HULL_RADIUS, HIT_GROW, SHIP_ACCEL, WIDTH, HEIGHT, PURP, FLAME
 
+# Ship snapshot layout, then the RGB bytes of its bullet colors. x, y, prev_x,
+# prev_y, velx, vely, final_radius, current_radius, bullet_index, ethrust,
+# wthrust, nthrust, sthrust, cross-hair x, y
+SHIP_HEADER = struct.Struct('<6d3i4?2d')
+
 class Ship(object):
     """
     Represents the player piloted ship.
@@ -17,15 +24,20 @@ class Ship(object):
     final_radius: int outer radius of the ship
     current_radius: int animates 1 pix per update towards final_radius
     velx, vely: float x, y velocity in pix/ms
+    prev_x, prev_y: float x, y position before the last move
     ethrust, wthrust, nthrust, sthrust: bool thrust indicators to draw flames
     cross: Cross object represents cross-hair for aiming bullets
     """
+    __slots__ = ('x', 'y', 'prev_x', 'prev_y', 'bullet_colors', 'bullet_index',
+                 'final_radius', 'current_radius', 'velx', 'vely', 'ethrust',
+                 'wthrust', 'nthrust', 'sthrust', 'cross')
 
     def __init__(self, pos, color_list):
         """
         Initialize location, size, color, thrusters and cross-hair.
         """
         self.x, self.y = pos
+        self.prev_x, self.prev_y = pos
         self.bullet_colors = color_list
         self.bullet_index = 0
         self.final_radius = HULL_RADIUS
@@ -41,42 +53,55 @@ class Ship(object):
         """
         Returns formatted string for printing
         """
-        atts = ['\t' + a + ': ' + str(v) for a,v in self.__dict__.items()]
+        atts = ['\t' + a + ': ' + str(getattr(self, a))
+                for a in self.__slots__]
         return type(self).__name__ + ' object:\n' + '\n'.join(atts)
 
-    def draw(self, screen):
+    def draw(self, screen, alpha=1):
         """
         Given a PGZero screen object, draw the ship, thrusters and cross-hair.
+         The ship is drawn alpha of the way along its last move.
         """
         self.cross.draw(screen, self.get_color())
+        x, y = self.lerp(alpha)
 
-        screen.draw.circle((self.x, self.y), self.current_radius,
+        screen.draw.circle((x, y), self.current_radius,
             PURP) #outer hull
 
-        screen.draw.filled_circle((self.x, self.y), HULL_RADIUS//4,
+        screen.draw.filled_circle((x, y), HULL_RADIUS//4,
             self.bullet_colors[self.bullet_index]) #central bullet indicator
 
         if self.nthrust: # North, Boost Down
-            screen.draw.filled_circle((self.x, self.y-self.current_radius),
+            screen.draw.filled_circle((x, y-self.current_radius),
                                       HULL_RADIUS//4 , FLAME)
         if self.sthrust: # South, Boost Up
-            screen.draw.filled_circle((self.x, self.y+self.current_radius),
+            screen.draw.filled_circle((x, y+self.current_radius),
                                       HULL_RADIUS//4 , FLAME)
 
         if self.ethrust: # East, Boost left
-            screen.draw.filled_circle((self.x+self.current_radius, self.y),
+            screen.draw.filled_circle((x+self.current_radius, y),
                                       HULL_RADIUS//4 , FLAME)
 
         if self.wthrust: # West, Boost right
-            screen.draw.filled_circle((self.x-self.current_radius, self.y),
+            screen.draw.filled_circle((x-self.current_radius, y),
                                       HULL_RADIUS//4 , FLAME)
 
-    def update(self, time_delta, keyboard, keys):
+    def lerp(self, alpha):
+        """
+        Returns the x, y position alpha of the way along the last move. A move
+         which wrapped around the screen isn't interpolated.
+        """
+        if abs(self.x - self.prev_x) > WIDTH // 2:
+            return self.x, self.y
+        return (self.prev_x + alpha * (self.x - self.prev_x),
+                self.prev_y + alpha * (self.y - self.prev_y))
+
+    def update(self, time_delta, controls):
         """
         Wrapper function updates the ship's hull size and moves the ship.
         """
         self.update_hull()
-        self.move(time_delta, keyboard, keys)
+        self.move(time_delta, controls)
 
     def update_hull(self):
         """
@@ -87,21 +112,21 @@ class Ship(object):
         elif self.current_radius > self.final_radius:
             self.current_radius -= 1
 
-    def move(self, time_delta, keyboard, keys):
+    def move(self, time_delta, controls):
         """
-        Given time elapsed since last update, keyboard and key pgzero objects,
-         width and height of the game board: Update the ship's position,
-         velocity and thrust indicators.
+        Given time elapsed since last update and a Controls object holding the
+         thrusters the player has engaged: Update the ship's position, velocity
+         and thrust indicators.
         """
         # Update horizontal velocity and thrust indicators
-        if keyboard[keys.A] and keyboard[keys.D]:
+        if controls.left and controls.right:
             self.ethrust = True
             self.wthrust = True
-        elif keyboard[keys.A]:
+        elif controls.left:
             self.velx -= SHIP_ACCEL * time_delta
             self.ethrust = True
             self.wthrust = False
-        elif keyboard[keys.D]:
+        elif controls.right:
             self.velx += SHIP_ACCEL * time_delta
             self.ethrust = False
             self.wthrust = True
@@ -118,14 +143,14 @@ class Ship(object):
                 self.velx *= sign
 
         # Update vertical velocity and thrust indicators
-        if keyboard[keys.W] and keyboard[keys.S]:
+        if controls.up and controls.down:
             self.nthrust = True
             self.sthrust = True
-        elif keyboard[keys.W]:
+        elif controls.up:
             self.vely -= SHIP_ACCEL * time_delta
             self.sthrust = True
             self.nthrust = False
-        elif keyboard[keys.S]:
+        elif controls.down:
             self.vely += SHIP_ACCEL * time_delta
             self.nthrust = True
             self.sthrust = False
@@ -142,6 +167,7 @@ class Ship(object):
                 self.vely *= sign
 
         # Update position
+        self.prev_x, self.prev_y = self.x, self.y
         self.x += self.velx * time_delta
         self.y += self.vely * time_delta
 
@@ -178,6 +204,28 @@ class Ship(object):
         """
         self.bullet_index = (self.bullet_index+1)%len(self.bullet_colors)
 
+    def snapshot(self):
+        """
+        Returns the ship's state as bytes, a SHIP_HEADER and its bullet colors
+        """
+        return SHIP_HEADER.pack(self.x, self.y, self.prev_x, self.prev_y,
+                                self.velx, self.vely, self.final_radius,
+                                self.current_radius, self.bullet_index,
+                                self.ethrust, self.wthrust, self.nthrust,
+                                self.sthrust, *self.cross.pos) \
+               + pack_colors(self.bullet_colors)
+
+    def restore(self, data):
+        """
+        Given bytes from snapshot(), replace the ship's state with the one saved
+        """
+        (self.x, self.y, self.prev_x, self.prev_y, self.velx, self.vely,
+         self.final_radius, self.current_radius, self.bullet_index,
+         self.ethrust, self.wthrust, self.nthrust, self.sthrust,
+         *pos) = SHIP_HEADER.unpack_from(data)
+        self.cross.pos = tuple(pos)
+        self.bullet_colors = unpack_colors(data[SHIP_HEADER.size:])
+
     def reset_hull_size(self):
         """
         Reset the ship's hull back to it's original size
@@ -210,6 +258,8 @@ class Cross(object):
     Represents colored cross-hairs for aiming.
     pos: tuple of floats x, y position in pix
     """
+    __slots__ = ('pos',)
+
     def __init__(self):
         """
         Initialize position to top left of screen
@@ -0,0 +1,49 @@
+"""
+Module contains the bubble sprite cache. Each bubble color is rasterized once
+ into a small surface, and whole lists of bubbles are drawn with a single
+ Surface.blits() call instead of a filled_circle() per bubble. Pixels match
+ screen.draw.filled_circle() exactly.
+pygame is imported on first use, so headless code can import the game modules
+ without it.
+"""
+
+from config import BUBBLE_DIAMETER, COLOR_LEVELS
+
+RADIUS = BUBBLE_DIAMETER // 2
+
+sprites = {} # RGB tuple: Surface holding a bubble of that color
+
+def bubble_sprite(color):
+    """
+    Returns the cached surface of a bubble of the given RGB color, drawing it
+     the first time a color is asked for
+    """
+    sprite = sprites.get(color)
+    if sprite is None:
+        import pygame
+        # Color keyed rather than per pixel alpha, which blits much faster
+        sprite = pygame.Surface((2*RADIUS, 2*RADIUS))
+        key = (0, 0, 0) if color != (0, 0, 0) else (255, 255, 255)
+        sprite.fill(key)
+        pygame.draw.circle(sprite, color, (RADIUS, RADIUS), RADIUS)
+        sprite.set_colorkey(key, pygame.RLEACCEL)
+        sprites[color] = sprite
+    return sprite
+
+def preload():
+    """
+    Draw the sprite of every color in COLOR_LEVELS ahead of the first frame
+    """
+    for colors in COLOR_LEVELS:
+        for c in colors:
+            bubble_sprite(c)
+
+def draw_bubbles(screen, bubbles):
+    """
+    Given a PGZero screen object and an iterable of (x, y, color) bubble
+     centers, draw them all with one blits() call. Bubbles with no color are
+     skipped.
+    """
+    screen.surface.blits([(bubble_sprite(c),
+                           (round(x) - RADIUS, round(y) - RADIUS))
+                          for x, y, c in bubbles if c], False)
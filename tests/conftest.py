@@ -0,0 +1,9 @@
+"""
+Puts the game modules, which live at the top of the repository, on the path
+ of the tests
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,87 @@
+"""
+Tests that array_grid.Array_Grid plays the same game as bubble.Bubble_Grid
+"""
+
+import random
+
+import bubble
+import array_grid
+from session import GameSession, Controls
+from bubble import Bubble_Grid, GRID_SPACING
+from array_grid import Array_Grid, EMPTY
+from config import COLOR_LEVELS, BOARD_WIDTH
+
+def play(grid_type, seed, steps=3000):
+    """
+    Play a swept game from seed, aiming the ship's color at the lowest bubble
+     of a random column. Returns the (x, y, pts) of the alerts and the grid's
+     lowest index after each step.
+    """
+    game = GameSession(grid_type, swept=True, seed=seed)
+    rng = random.Random(seed)
+    states = []
+    for _ in range(steps):
+        shots, cycles = [], 0
+        if rng.random() < .1 and len(game.bubble_grid):
+            j = rng.randrange(len(game.bubble_grid[0]))
+            spots = [row[j] for row in game.bubble_grid if row[j].color]
+            if spots and spots[0].color == game.ship.get_color():
+                shots = [game.ship.get_angle((spots[0].x, spots[0].y + 30))]
+            else:
+                cycles = 1
+        if not game.step(16, Controls(shots=shots, cycles=cycles)):
+            break
+        states.append(([(a.x, a.y, a.pts) for a in game.score.alerts],
+                       list(game.bubble_grid.lowest)))
+    return states
+
+def test_alerts_match_bubble_grid():
+    for seed in range(4):
+        states = play(Bubble_Grid, seed)
+        assert any(alerts for alerts, _ in states)
+        assert play(Array_Grid, seed) == states
+
+def test_lowest_index():
+    grid = Array_Grid(COLOR_LEVELS[0], rng=random.Random(2))
+    for _ in range(6):
+        grid.addTopRow()
+        grid.scroll += GRID_SPACING
+    assert grid.lowest == [0] * BOARD_WIDTH
+    grid.cells[:2, 3] = EMPTY
+    grid.cells[:, 4] = EMPTY
+    grid.find_lowest()
+    assert grid.lowest[3] == 2 and grid.lowest[4] is None
+    grid.addGridBubble(0, 4, True, COLOR_LEVELS[0][0]) # New bottom row
+    assert grid.lowest[4] == -1
+
+def test_restore_empty_grid():
+    grid = Array_Grid(COLOR_LEVELS[0], rng=random.Random(2))
+    grid.addTopRow()
+    grid.restore(Array_Grid(COLOR_LEVELS[0]).snapshot())
+    assert grid.num_rows == 0
+    assert grid.lowest == [None] * BOARD_WIDTH
+
+def test_dirty_matches_agree_with_get_matches(monkeypatch):
+    grid = Bubble_Grid(COLOR_LEVELS[0], rng=random.Random(4))
+    for _ in range(30):
+        grid.addTopRow()
+        grid.scroll += GRID_SPACING
+    grid.mark_all_dirty()
+    grid.erase_matches() # Clear any runs the random rows made
+    color = COLOR_LEVELS[0][0]
+    for k in range(6):
+        grid[10][3+k].color = color
+    for k in range(5):
+        grid[12+k][20].color = color
+    grid.dirty = {(10, 5), (10, 6), (14, 20), (3, 3)}
+    other = Array_Grid(COLOR_LEVELS[0])
+    other.restore(grid.snapshot())
+
+    matches = grid.get_matches()
+    assert (10, 6) in matches and any(j == 20 for _, j in matches)
+    assert other.get_matches() == matches
+    for dense in (1, 10**6): # Always and never scan the whole grid
+        monkeypatch.setattr(bubble, 'DENSE_DIRTY', dense)
+        monkeypatch.setattr(array_grid, 'DENSE_DIRTY', dense)
+        assert grid.get_dirty_matches() == matches
+        assert other.get_dirty_matches() == matches
@@ -0,0 +1,26 @@
+"""
+Smoke tests of the benchmark harness on every backend
+"""
+
+import pytest
+
+import bench
+from bubble import Bubble_Grid, Bullet_List, Dropper_List
+from array_grid import Array_Grid
+from array_lists import Array_Bullet_List, Array_Dropper_List
+
+@pytest.mark.parametrize('grid_type', [Bubble_Grid, Array_Grid])
+@pytest.mark.parametrize('list_types', [(Bullet_List, Dropper_List),
+                                        (Array_Bullet_List, Array_Dropper_List)])
+def test_run(grid_type, list_types):
+    out = bench.run(grid_type, repeat=1, boards=['empty', 'full'],
+                    list_types=list_types)
+    assert out['grid'] == grid_type.__name__
+    for name in ('empty', 'full'):
+        assert set(out['results'][name]) == set(bench.STAGES)
+
+def test_stages_leave_the_board_as_built():
+    board = bench.build_board(Bubble_Grid, *bench.BOARDS['full'])
+    snap = board.snapshot()
+    bench.time_stage(board, bench.STAGES['step'][0], True, 2)
+    assert board.snapshot() == snap
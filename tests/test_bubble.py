@@ -0,0 +1,76 @@
+"""
+Tests of the Bubble classes and Bubble_Grid
+"""
+
+import random
+from math import pi
+
+from bubble import Free_Bubble, Bullet, Dropper, Grid_Bubble, Bubble_Row, \
+                   Bullet_List, Bubble_Grid, GRID_SPACING, COLUMN_X
+from ship import Ship, Cross
+from score import Alert
+from config import COLOR_LEVELS, BOARD_WIDTH, HEIGHT
+
+def test_slotted_classes():
+    color = COLOR_LEVELS[0][0]
+    row = Bubble_Row(Bubble_Grid(COLOR_LEVELS[0]), 0)
+    objects = [Free_Bubble(1, 2, color), Bullet(1, 2, color, .5),
+               Dropper(1, 2, color, .1, 3), Grid_Bubble(3, row, color, True),
+               Ship((1, 2), COLOR_LEVELS[0]), Cross(), Alert(1, 2, 4)]
+    for o in objects:
+        assert not hasattr(o, '__dict__'), type(o).__name__
+        str(o) # Every slot is set
+    assert objects[0].x == 1 and objects[0].y == 2
+    assert objects[3].y == row.y
+    assert not any('x' in getattr(cls, '__slots__', ())
+                   for cls in Grid_Bubble.__mro__)
+
+def test_setitem_takes_over_row():
+    grid = Bubble_Grid(COLOR_LEVELS[0], rng=random.Random(0))
+    other = Bubble_Grid(COLOR_LEVELS[0], rng=random.Random(1))
+    for g in (grid, other):
+        g.addTopRow()
+        g.scroll += GRID_SPACING # Make room for another row
+        g.addTopRow()
+    other.scroll += 100
+
+    row = other[0]
+    grid[1] = row
+    assert row.grid is grid
+    assert row.index == 1
+    assert all(b.row is row and b.column == j
+               for j, b in enumerate(row.contents))
+    assert grid[1][5].y == grid.scroll - GRID_SPACING
+
+    loose = Bubble_Row(other, 7)
+    for j in range(BOARD_WIDTH):
+        loose += Grid_Bubble(BOARD_WIDTH - 1 - j, other[1], None, False)
+    grid[0] = loose
+    assert loose.grid is grid
+    assert [b.column for b in loose] == list(range(BOARD_WIDTH))
+    assert all(b.row is loose for b in loose)
+
+def landed(swept, shots=100, delta=150):
+    """
+    Fire shots bullets up at a one row grid from random points below it,
+     moving delta ms per update. Returns how many hit the grid.
+    """
+    rng = random.Random(9)
+    hits = 0
+    for _ in range(shots):
+        grid = Bubble_Grid(COLOR_LEVELS[0], rng=rng)
+        grid.addTopRow()
+        grid.scroll = HEIGHT // 3
+        bullets = Bullet_List(swept)
+        bullets += Bullet(rng.choice(COLUMN_X[1:-1]) + rng.uniform(-8, 8),
+                          grid[0].y + 300 + rng.uniform(0, 100),
+                          COLOR_LEVELS[0][0], pi/2 + rng.uniform(-.05, .05))
+        for _ in range(20):
+            bullets.move(delta)
+            bullets.delete_strikers(grid)
+        hits += not len(bullets)
+    return hits
+
+def test_swept_bullets_never_pass_through_the_grid():
+    assert landed(swept=True) == 100
+    assert landed(swept=False) < 90 # Long steps skip over the row
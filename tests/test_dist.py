@@ -0,0 +1,18 @@
+"""
+Tests of the distance functions
+"""
+
+from dist import first_contact
+
+def test_first_contact():
+    # Starts within d
+    assert first_contact(3, 4, 30, 40, 0, 0, 6) == 0
+    # Head on, touches a quarter of the way along
+    assert first_contact(-20, 0, 20, 0, 0, 0, 10) == .25
+    # Tangent, grazes the point at the middle of the path
+    assert first_contact(-10, 5, 10, 5, 0, 0, 5) == .5
+    # Misses: passes wide, stops short, moves away, stands still
+    assert first_contact(-10, 5, 10, 5, 0, 0, 4.9) is None
+    assert first_contact(-20, 0, -15, 0, 0, 0, 10) is None
+    assert first_contact(-20, 0, -40, 0, 0, 0, 10) is None
+    assert first_contact(-20, 0, -20, 0, 0, 0, 10) is None
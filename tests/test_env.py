@@ -0,0 +1,31 @@
+"""
+Tests of VectorEnv played in worker processes and in this process
+"""
+
+import numpy as np
+
+from env import VectorEnv, OBSERVATION, ANGLES
+from shared_state import STATE
+
+def test_processes_play_the_same_games():
+    rng = np.random.default_rng(0)
+    with VectorEnv(4, processes=2, state=True) as sharded, \
+         VectorEnv(4, state=True) as local:
+        sharded.reset()
+        local.reset()
+        for step in range(30):
+            actions = np.stack([rng.integers(0, 16, 4),        # keys
+                                rng.integers(0, ANGLES + 1, 4), # shot
+                                rng.integers(0, 2, 4),          # cycle
+                                np.zeros(4, int)], axis=1)      # rush
+            sharded.step(actions)
+            local.step(actions)
+            for key in OBSERVATION:
+                assert np.array_equal(sharded.obs[key], local.obs[key]), key
+            assert np.array_equal(sharded.arrays['reward'],
+                                  local.arrays['reward'])
+            frame = sharded.state.arrays['frame']
+            assert (frame == step + 2).all() # Exported by reset and each step
+            for key in STATE:
+                assert np.array_equal(sharded.state.arrays[key],
+                                      local.state.arrays[key]), key
@@ -0,0 +1,41 @@
+"""
+Tests that DirtyRenderer draws the same frames as draw_frame()
+"""
+
+import os
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+from pgzero.screen import Screen
+
+from session import GameSession, FixedTimestep
+from renderer import draw_frame, DirtyRenderer
+from score import Alert
+from bubble import GRID_SPACING
+from config import WIDTH, HEIGHT, SIM_TICK
+
+def test_alert_at_left_edge():
+    pygame.init()
+    pygame.display.set_mode((WIDTH, HEIGHT)) # Needed to draw text
+    full = Screen(pygame.Surface((WIDTH, HEIGHT)))
+    dirty = Screen(pygame.Surface((WIDTH, HEIGHT)))
+    game = GameSession(seed=1)
+    loop = FixedTimestep(game)
+    loop.advance(SIM_TICK)
+    grid = game.bubble_grid
+    while len(grid) < 4: # Let a few rows in
+        grid.addTopRow()
+        grid.scroll += GRID_SPACING
+    grid.prev_scroll = grid.scroll
+    renderer = DirtyRenderer()
+    assert renderer.draw(dirty, game, loop.alpha) is None # First frame full
+
+    # The alert's box hangs off the left edge over the grid
+    game.score.alerts += Alert(0, grid[1].y, 8)
+    draw_frame(full, game, loop.alpha)
+    rects = renderer.draw(dirty, game, loop.alpha)
+    assert rects is not None
+    assert all(full.surface.get_rect().contains(r) for r in rects)
+    assert pygame.image.tobytes(full.surface, 'RGB') \
+           == pygame.image.tobytes(dirty.surface, 'RGB')
@@ -0,0 +1,124 @@
+"""
+Tests of the save file format and SaveFile
+"""
+
+import os
+
+import pytest
+
+from session import GameSession, Controls, SESSION_HEADER, PART_SIZE
+from savegame import save, load_game, SaveFile, FILE_HEADER, ENTRY, PARTS
+from bubble import BULLET_RECORD, DROPPER_RECORD
+from ship import SHIP_HEADER
+
+def open_files():
+    """
+    Returns the number of files this process has open, None if unknown
+    """
+    if os.path.isdir('/proc/self/fd'):
+        return len(os.listdir('/proc/self/fd'))
+    return None
+
+@pytest.fixture
+def saved(tmp_path):
+    """
+    Returns the path and bytes of a save file of two snapshots
+    """
+    game = GameSession(swept=True, seed=7)
+    snapshots = []
+    for k in range(1200):
+        game.step(16, Controls(shots=[.4 + k % 40 / 16] if k % 30 == 0 else []))
+        if k % 600 == 599:
+            snapshots.append(game.snapshot())
+    path = str(tmp_path / 'game.rls')
+    save(path, snapshots)
+    with open(path, 'rb') as f:
+        return path, f.read()
+
+def part_offsets(data, offset):
+    """
+    Given save file bytes and the offset of a snapshot in them, returns a
+     dict of the offset of each part's bytes by name
+    """
+    offsets = {}
+    offset += SESSION_HEADER.size
+    for name in PARTS:
+        size, = PART_SIZE.unpack_from(data, offset)
+        offsets[name] = offset + PART_SIZE.size
+        offset += PART_SIZE.size + size
+    return offsets
+
+def play(game, steps=300):
+    """
+    Step game, firing and cycling colors now and then
+    """
+    for k in range(steps):
+        game.step(16, Controls(shots=[.4 + k % 40 / 16] if k % 20 == 0 else [],
+                               cycles=int(k % 45 == 0)))
+
+def assert_load_fails(path, data):
+    """
+    Write data to path and check loading it raises ValueError, closes the
+     file and leaves the game as it was
+    """
+    with open(path, 'wb') as f:
+        f.write(data)
+    game = GameSession(seed=3)
+    game.step(16)
+    before = game.snapshot()
+    files = open_files()
+    with pytest.raises(ValueError):
+        load_game(path, game)
+    assert open_files() == files
+    assert game.snapshot() == before
+
+def test_round_trip(saved):
+    path, data = saved
+    game = GameSession()
+    with SaveFile(path) as f:
+        assert len(f) == 2
+        f.restore(game, 0)
+        assert f.info(1)['seed'] == 7
+        assert game.snapshot() == bytes(f[0])
+
+def test_truncated(saved):
+    path, data = saved
+    for end in list(range(0, 200, 7)) + list(range(200, len(data), 97)):
+        assert_load_fails(path, data[:end])
+
+def test_corrupt(saved):
+    path, data = saved
+    assert_load_fails(path, b'XXXX' + data[4:])
+    assert_load_fails(path, data[:4] + b'\xff' + data[5:]) # Version
+    count = FILE_HEADER.size - 4
+    assert_load_fails(path, data[:count] + b'\xff' * 4 + data[count + 4:])
+    size = FILE_HEADER.size + ENTRY.size - 8 # Last snapshot's size
+    assert_load_fails(path, data[:size] + b'\xff' * 8 + data[size + 8:])
+
+    # Well formed but meaningless: colors missing from the grid, unknown
+    # game state
+    offset = ENTRY.unpack_from(data, FILE_HEADER.size + ENTRY.size)[1]
+    parts = part_offsets(data, offset)
+    spots = [offset + 12, # game_state
+             parts['ship'] + SHIP_HEADER.size] # First ship color
+    for name, record, after in (('bullets', BULLET_RECORD, 'droppers'),
+                                ('droppers', DROPPER_RECORD, 'ship')):
+        if parts[after] - parts[name] > PART_SIZE.size: # Any records
+            spots.append(parts[name] + record.size - 3) # First one's color
+    assert len(spots) > 2
+    for k in spots:
+        assert_load_fails(path, data[:k] + bytes([data[k] ^ 0x10]) + data[k+1:])
+
+    # Flip every byte of the last snapshot, one at a time: each load either
+    # fails or restores a game that plays on
+    for k in range(offset, len(data), 13):
+        damaged = data[:k] + bytes([data[k] ^ 0xff]) + data[k+1:]
+        with open(path, 'wb') as f:
+            f.write(damaged)
+        game = GameSession(seed=3)
+        try:
+            load_game(path, game)
+        except ValueError:
+            continue
+        play(game)
+        game.snapshot()
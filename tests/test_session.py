@@ -0,0 +1,60 @@
+"""
+Tests of GameSession and FixedTimestep
+"""
+
+import copy
+
+from session import GameSession, Controls, FixedTimestep
+from config import SIM_TICK
+
+def test_queued_shot_waits_for_a_tick():
+    game = GameSession(seed=3)
+    loop = FixedTimestep(game)
+    loop.queue(Controls(shots=[1.5]))
+    assert not len(game.bullets)
+    assert loop.advance(SIM_TICK / 2) == 0
+    assert not len(game.bullets)
+    assert loop.advance(SIM_TICK / 2) == 1
+    assert len(game.bullets) == 1
+
+def test_reset_drops_banked_time_and_input():
+    game = GameSession(seed=3)
+    loop = FixedTimestep(game)
+    loop.advance(SIM_TICK * 1.5)
+    loop.queue(Controls(shots=[1.5], cycles=1))
+    game.reset(4)
+    loop.reset()
+    assert loop.accumulator == 0
+    assert loop.alpha == 1
+    assert loop.advance(SIM_TICK / 2) == 0
+    assert loop.advance(SIM_TICK / 2) == 1
+    assert not len(game.bullets)
+    assert game.ship.bullet_index == 0
+
+def test_replay_uses_the_list_types_given():
+    from array_grid import Array_Grid
+    from array_lists import Array_Bullet_List, Array_Dropper_List
+    types = {'grid_type': Array_Grid, 'bullet_type': Array_Bullet_List,
+             'dropper_type': Array_Dropper_List}
+    game = GameSession(swept=True, seed=5, record=True, **types)
+    for k in range(2000):
+        shots = [.3 + k % 50 / 20] if k % 25 == 0 else []
+        game.step(SIM_TICK, Controls(shots=shots, cycles=int(k % 70 == 0)))
+    again = GameSession.replay(game.log, **types)
+    assert isinstance(again.bullets, Array_Bullet_List)
+    assert isinstance(again.droppers, Array_Dropper_List)
+    assert again.log == game.log
+    assert again.snapshot() == game.snapshot()
+
+def test_deepcopy_of_a_populated_session():
+    game = GameSession(seed=7)
+    for k in range(400):
+        shots = [.4 + k % 40 / 16] if k % 10 == 0 else []
+        game.step(SIM_TICK, Controls(shots=shots))
+    assert len(game.bubble_grid) and len(game.bullets)
+    twin = copy.deepcopy(game)
+    assert twin.snapshot() == game.snapshot()
+    for k in range(50):
+        game.step(SIM_TICK)
+        twin.step(SIM_TICK)
+    assert twin.snapshot() == game.snapshot()
@@ -0,0 +1,95 @@
+"""
+Module contains the TextCache class. Text is rendered once per string and
+ style with pgzero's ptext, kept in a least recently used cache and blitted
+ on later frames, so score alerts, the score and the message screens aren't
+ laid out and rasterized again every frame. Pixels match screen.draw.text().
+pgzero is imported on first use, so headless code can import the game modules
+ without it.
+"""
+
+from collections import OrderedDict
+
+CAPACITY = 128 # Surfaces kept before the least recently used is dropped
+
+# Anchor keyword: fraction of the text's width, height the position sits at
+ANCHORS = {'topleft': (0, 0), 'midtop': (.5, 0), 'topright': (1, 0),
+           'midleft': (0, .5), 'center': (.5, .5), 'midright': (1, .5),
+           'bottomleft': (0, 1), 'midbottom': (.5, 1), 'bottomright': (1, 1)}
+
+class TextCache(object):
+    """
+    Represents a least recently used cache of rendered text surfaces.
+    surfaces: OrderedDict of (text, style) keys to Surfaces, least recently
+              used first
+    capacity: int most surfaces kept
+    hits, misses: int lookups found in and missing from the cache
+    """
+
+    def __init__(self, capacity=CAPACITY):
+        """
+        Initialize an empty cache holding up to capacity surfaces
+        """
+        self.surfaces = OrderedDict()
+        self.capacity = capacity
+        self.hits = 0
+        self.misses = 0
+
+    def __str__(self):
+        """
+        Return a formatted string for printing
+        """
+        return (f'{type(self).__name__}: {len(self.surfaces)}/{self.capacity}'
+                f' surfaces, {self.hits} hits, {self.misses} misses')
+
+    def __len__(self):
+        return len(self.surfaces)
+
+    def get(self, text, **style):
+        """
+        Returns the surface of text rendered with the given ptext.getsurf()
+         style keywords, rendering it on a miss
+        """
+        key = (text, tuple(sorted(style.items())))
+        surf = self.surfaces.get(key)
+        if surf is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surf
+
+        from pgzero import ptext
+        self.misses += 1
+        surf = ptext.getsurf(text, cache=False, **style)
+        self.surfaces[key] = surf
+        if len(self.surfaces) > self.capacity:
+            self.surfaces.popitem(last=False)
+        return surf
+
+    def draw(self, screen, text, **kwargs):
+        """
+        Given a PGZero screen object, draw text like screen.draw.text(). The
+         position is one anchor keyword from ANCHORS, or centerx and centery.
+         Other keywords are ptext style options such as fontsize or color.
+        """
+        hanchor = vanchor = None
+        for name in ANCHORS.keys() & kwargs.keys():
+            x, y = kwargs.pop(name)
+            hanchor, vanchor = ANCHORS[name]
+        if 'centerx' in kwargs:
+            x, hanchor = kwargs.pop('centerx'), .5
+        if 'centery' in kwargs:
+            y, vanchor = kwargs.pop('centery'), .5
+        if hanchor is None or vanchor is None:
+            raise ValueError('Unable to determine text position')
+        kwargs.setdefault('align', hanchor) # Lines align as ptext would
+
+        surf = self.get(text, **kwargs)
+        screen.surface.blit(surf, (int(round(x - hanchor*surf.get_width())),
+                                   int(round(y - vanchor*surf.get_height()))))
+
+cache = TextCache() # Shared by the game's text drawing
+
+def draw_text(screen, text, **kwargs):
+    """
+    Draw text through the shared cache, see TextCache.draw()
+    """
+    cache.draw(screen, text, **kwargs)